@@ -0,0 +1,55 @@
+"""
+Benchmark of dates_to_accounting_year against the former string round-trip, where end
+dates were formatted as YYYYMMDD integers and parsed again row by row.
+
+Usage: python -m benchmarks.benchmark_accounting_year [--n-dates N]
+"""
+
+import argparse
+import time
+
+
+import numpy as np
+import pandas as pd
+
+
+from pandas.testing import assert_series_equal
+
+
+from src.get_year_functions import dates_to_accounting_year, str_to_accounting_year
+
+
+def legacy_accounting_year(dates):
+    # Former implementation of preprocess_accounting_years
+    return dates.dt.strftime("%Y%m%d").astype("int64").apply(str_to_accounting_year)
+
+
+def make_dates(n_dates, seed=0):
+    """
+    Builds random reporting end dates between 2005 and 2027, partly out of the valid window.
+    """
+    rng = np.random.default_rng(seed)
+    days = rng.integers(0, 365 * 22, n_dates)
+    return pd.Series(pd.to_datetime("2005-01-01") + pd.to_timedelta(days, unit="D"))
+
+
+def timed(func, dates):
+    start = time.perf_counter()
+    result = func(dates)
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--n-dates", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    dates = make_dates(args.n_dates)
+    result, vectorized_time = timed(dates_to_accounting_year, dates)
+    expected, legacy_time = timed(legacy_accounting_year, dates)
+    assert_series_equal(result, expected)
+    print(
+        f"{args.n_dates} dates - vectorized {vectorized_time:.3f}s",
+        f"- string round-trip {legacy_time:.3f}s",
+        f"- speedup x{legacy_time / vectorized_time:.0f}",
+    )
@@ -0,0 +1,47 @@
+"""
+Benchmark of missing_value_imputation against the former loop over accounts.
+
+Usage: python -m benchmarks.benchmark_missing_value_imputation [--legacy-max-rows N]
+"""
+
+import argparse
+import time
+
+
+from pandas.testing import assert_frame_equal
+
+
+from src.utils import missing_value_imputation
+from test.test_utils import legacy_missing_value_imputation, make_panel
+
+
+def timed(func, df):
+    start = time.perf_counter()
+    result = func(df.copy())
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", nargs="*", type=int, default=[10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument(
+        "--legacy-max-rows",
+        type=int,
+        default=100_000,
+        help="largest panel on which the former implementation is run",
+    )
+    args = parser.parse_args()
+
+    for n_rows in args.sizes:
+        df = make_panel(n_rows)
+        result, vectorized_time = timed(missing_value_imputation, df)
+        line = f"{n_rows:>9} rows - vectorized {vectorized_time:8.3f}s"
+        if n_rows <= args.legacy_max_rows:
+            expected, legacy_time = timed(legacy_missing_value_imputation, df)
+            assert_frame_equal(result, expected)
+            line += f" - loop {legacy_time:8.3f}s - speedup x{legacy_time / vectorized_time:.0f}"
+        else:
+            line += " - loop skipped"
+        print(line)
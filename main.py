@@ -1,20 +1,143 @@
+import argparse
 import os
 
 
-from src.main_functions import create_CDP_clean_dataset
-
+from src.cache import invalidate_clean_years, read_clean_years_manifest
+from src.get_year_functions import compare_engines, get_raw_file_path
+from src.main_functions import (
+    build_CDP_pipeline,
+    create_CDP_clean_dataset,
+    run_CDP_pipeline,
+)
+from src.sheets_manifest import USEFUL_SHEETS
 
 path_raw_data = os.path.join("data", "raw_data")
 path_clean_data = os.path.join("data", "clean_data")
+path_cache_data = os.path.join("data", "cache_data")  # can be a path or None
 years = [year for year in range(2015, 2024)]
-save_format = "xlsx"  # can be "xlsx", "csv" or False
-save_years = "xlsx"  # can be "xlsx", "csv" or False
+save_format = "xlsx"  # can be "xlsx", "csv", "parquet", "feather" or False
+save_years = "xlsx"  # can be "xlsx", "csv", "parquet", "feather" or False
+save_compression = (
+    None  # e.g. "zstd" for parquet and feather files, "gzip" for csv files
+)
+partition_by_year = False  # save a parquet dataset partitioned by questionnaire_year
+covered_countries_format = (
+    "json"  # can be "json", "list" or "arrow" (parquet and feather)
+)
+emissions_dtype = "float64"  # can be "float64" or "float32"
+string_unique_id = False  # export unique_id as "[account_id]_[accounting_year]" strings
+stream_scope_3 = False  # aggregate Scope 3 sheets row by row to bound memory usage
+engine = (
+    "openpyxl"  # can be "openpyxl" or "calamine" (faster, requires python-calamine)
+)
+workers = 1  # number of years processed in parallel
+stack_years = False  # process the 2018+ years at once from their stacked sheets
+incremental = False  # only add the new questionnaire years to the previous panel
+sheet_workers = 1  # number of sheets of a year parsed concurrently
+pipeline = False  # run the stage graph, storing the output of every stage
 
 if __name__ == "__main__":
-    create_CDP_clean_dataset(
+    parser = argparse.ArgumentParser(description="Creates the clean CDP dataset.")
+    parser.add_argument(
+        "--rebuild",
+        nargs="*",
+        type=int,
+        metavar="YEAR",
+        help="ignore the cached clean datasets of the given years (all if none given)",
+    )
+    parser.add_argument(
+        "--invalidate",
+        nargs="*",
+        type=int,
+        metavar="YEAR",
+        help="remove the cached clean datasets of the given years (all if none given)",
+    )
+    parser.add_argument(
+        "--manifest", action="store_true", help="print the cache manifest and exit"
+    )
+    parser.add_argument(
+        "--compare-engines",
+        type=int,
+        metavar="YEAR",
+        help="print the parsing times of the year sheets with each Excel engine and exit",
+    )
+    parser.add_argument(
+        "--graph",
+        action="store_true",
+        help="print the stages of the pipeline with their cache state and exit",
+    )
+    args = parser.parse_args()
+
+    pipeline_kwargs = dict(
         path_raw_data=path_raw_data,
         path_clean_data=path_clean_data,
         years=years,
         save_format=save_format,
-        save_years=save_years,
+        path_cache_data=path_cache_data,
+        stream_scope_3=stream_scope_3,
+        engine=engine,
+        sheet_workers=sheet_workers,
+        save_compression=save_compression,
+        partition_by_year=partition_by_year,
+        covered_countries_format=covered_countries_format,
+        emissions_dtype=emissions_dtype,
+        string_unique_id=string_unique_id,
     )
+
+    path_year_cache = path_cache_data or path_clean_data
+    if args.compare_engines:
+        print(
+            compare_engines(
+                get_raw_file_path(args.compare_engines, path_raw_data),
+                USEFUL_SHEETS[args.compare_engines],
+            )
+        )
+    elif args.manifest:
+        print(read_clean_years_manifest(path_year_cache))
+    elif args.graph:
+        print(build_CDP_pipeline(**pipeline_kwargs).describe())
+    elif args.invalidate is not None:
+        invalidated = invalidate_clean_years(path_year_cache, args.invalidate or None)
+        print("Invalidated cached years:", invalidated)
+    elif pipeline:
+        # Settings of create_CDP_clean_dataset which the stage graph does not use
+        ignored_settings = {
+            "save_years": save_years,
+            "workers": workers > 1,
+            "stack_years": stack_years,
+            "incremental": incremental,
+        }
+        for setting, value in ignored_settings.items():
+            if value:
+                print(f"Warning: {setting} is ignored when pipeline is True")
+        # Rebuilt years are loaded and cleaned again (every year if none is given)
+        rebuild_years = years if args.rebuild == [] else args.rebuild or []
+        run_CDP_pipeline(
+            rebuild=[
+                f"{stage}_{year}"
+                for year in rebuild_years
+                for stage in ["load", "clean"]
+            ],
+            **pipeline_kwargs,
+        )
+    else:
+        create_CDP_clean_dataset(
+            path_raw_data=path_raw_data,
+            path_clean_data=path_clean_data,
+            years=years,
+            save_format=save_format,
+            save_years=save_years,
+            path_cache_data=path_cache_data,
+            rebuild=args.rebuild == [] or args.rebuild or False,
+            stream_scope_3=stream_scope_3,
+            engine=engine,
+            workers=workers,
+            stack_years=stack_years,
+            incremental=incremental,
+            sheet_workers=sheet_workers,
+            save_compression=save_compression,
+            partition_by_year=partition_by_year,
+            covered_countries_format=covered_countries_format,
+            emissions_dtype=emissions_dtype,
+            string_unique_id=string_unique_id,
+        )
@@ -0,0 +1,333 @@
+import hashlib
+import importlib
+import inspect
+import json
+import os
+
+
+import pandas as pd
+
+
+from datetime import datetime
+from functools import lru_cache
+
+
+def file_sha256(file_path):
+    """
+    Computes the SHA-256 digest of a file. Digests are memoized on the file path,
+    size and modification time, so a workbook is hashed once per process.
+
+    Parameters:
+    - file_path (str): Path to the file to hash.
+
+    Returns:
+    - str: The hexadecimal SHA-256 digest of the file content.
+    """
+    stat = os.stat(file_path)
+    return _file_sha256(os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+
+
+@lru_cache(maxsize=None)
+def _file_sha256(file_path, size, mtime_ns):
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def write_frame(df, file_path):
+    """
+    Writes a DataFrame to a binary file. Parquet is used whenever pyarrow is installed and
+    can represent the frame, otherwise the frame is pickled (e.g. object columns mixing
+    strings and numbers, which are frequent in raw CDP sheets).
+
+    Parameters:
+    - df (pandas.DataFrame): The DataFrame to write.
+    - file_path (str): Path of the file to write, without extension.
+
+    Returns:
+    - str: The path of the written file, with its extension.
+    """
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    try:
+        df.to_parquet(f"{file_path}.parquet")
+        return f"{file_path}.parquet"
+    except (ImportError, ValueError, TypeError, NotImplementedError):
+        # pyarrow conversion errors derive from these builtin exceptions
+        if os.path.exists(f"{file_path}.parquet"):
+            os.remove(f"{file_path}.parquet")
+        df.to_pickle(f"{file_path}.pkl")
+        return f"{file_path}.pkl"
+
+
+def write_absent_marker(file_path):
+    """
+    Writes the marker of a sheet absent from its workbook, so that the workbook is not
+    parsed again to look for it.
+
+    Parameters:
+    - file_path (str): Cache path of the sheet, without extension.
+
+    Returns:
+    - str: The path of the written marker.
+    """
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    open(f"{file_path}.absent", "w").close()
+    return f"{file_path}.absent"
+
+
+def read_frame(file_path):
+    """
+    Reads a DataFrame written by write_frame.
+
+    Parameters:
+    - file_path (str): Path of the file to read, without extension.
+
+    Returns:
+    - pandas.DataFrame or None: The DataFrame, or None if no file exists for this path.
+    """
+    if os.path.exists(f"{file_path}.parquet"):
+        return pd.read_parquet(f"{file_path}.parquet")
+    if os.path.exists(f"{file_path}.pkl"):
+        return pd.read_pickle(f"{file_path}.pkl")
+    return None
+
+
+def raw_sheet_cache_path(
+    path_cache_data, workbook_hash, sheet_name, columns, engine=None
+):
+    """
+    Builds the cache path of a raw sheet, keyed by the workbook content hash, the sheet
+    name, the columns kept when reading it and the Excel engine used to parse it.
+
+    Parameters:
+    - path_cache_data (str): Path to the cache directory.
+    - workbook_hash (str): SHA-256 digest of the workbook.
+    - sheet_name (str): Name of the sheet.
+    - columns (list or None): Columns read from the sheet (None for every column).
+    - engine (str, optional): Excel engine used to parse the sheet. Defaults to None.
+
+    Returns:
+    - str: The cache path of the sheet, without extension.
+    """
+    sheet_key = repr((sheet_name, None if columns is None else sorted(columns), engine))
+    sheet_hash = hashlib.sha256(sheet_key.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(path_cache_data, "raw_sheets", workbook_hash, sheet_hash)
+
+
+def sources_sha256(modules):
+    """
+    Computes a SHA-256 digest of the source code of several modules.
+
+    Parameters:
+    - modules (list): The modules (or module names) whose source code is hashed.
+
+    Returns:
+    - str: The hexadecimal SHA-256 digest of the concatenated source files.
+    """
+    sha256 = hashlib.sha256()
+    for module in modules:
+        if isinstance(module, str):
+            module = importlib.import_module(module)
+        with open(inspect.getsourcefile(module), "rb") as f:
+            sha256.update(f.read())
+    return sha256.hexdigest()
+
+
+def clean_year_fingerprint(raw_file_path, modules, options=None, data_files=()):
+    """
+    Computes the fingerprint of a cleaned year dataset, from the raw workbook content,
+    the source code of the modules building it, the options used and the pandas version.
+
+    Parameters:
+    - raw_file_path (str): Path to the raw CDP workbook of the year.
+    - modules (list): The modules (or module names) used to build the cleaned dataset.
+    - options (dict, optional): JSON serializable options used to build the dataset.
+    - data_files (iterable, optional): Other files used to build the dataset (e.g. the
+      corrections table of the year), hashed if they exist.
+
+    Returns:
+    - str: The fingerprint of the cleaned dataset.
+    """
+    fingerprint = {
+        "raw_file": file_sha256(raw_file_path),
+        "sources": sources_sha256(modules),
+        "pandas": pd.__version__,
+        "options": options or {},
+        "data_files": {
+            os.path.basename(file_path): file_sha256(file_path)
+            for file_path in data_files
+            if os.path.exists(file_path)
+        },
+    }
+    fingerprint = json.dumps(fingerprint, sort_keys=True)
+    return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+
+def load_clean_year(path_cache_data, year, fingerprint):
+    """
+    Loads a cached cleaned year dataset if its fingerprint is up to date, and records the
+    cache hit or miss in the manifest of the year.
+
+    Parameters:
+    - path_cache_data (str): Path to the cache directory.
+    - year (int): The questionnaire year.
+    - fingerprint (str): The current fingerprint of the cleaned year dataset.
+
+    Returns:
+    - pandas.DataFrame or None: The cached dataset, or None on a cache miss.
+    """
+    entry = _read_manifest_entry(path_cache_data, year)
+    df_year_clean = None
+    if entry.get("fingerprint") == fingerprint:
+        df_year_clean = read_frame(_clean_year_path(path_cache_data, year))
+
+    status = "hit" if df_year_clean is not None else "miss"
+    counter = {"hit": "hits", "miss": "misses"}[status]
+    entry[counter] = entry.get(counter, 0) + 1
+    entry["last_status"] = status
+    entry["last_access"] = datetime.now().isoformat(timespec="seconds")
+    _write_manifest_entry(path_cache_data, year, entry)
+    return df_year_clean
+
+
+def save_clean_year(path_cache_data, year, fingerprint, df_year_clean):
+    """
+    Stores a cleaned year dataset in the cache along with its fingerprint.
+
+    Parameters:
+    - path_cache_data (str): Path to the cache directory.
+    - year (int): The questionnaire year.
+    - fingerprint (str): The fingerprint of the cleaned year dataset.
+    - df_year_clean (pandas.DataFrame): The cleaned year dataset.
+    """
+    file_path = _clean_year_path(path_cache_data, year)
+    for extension in ["parquet", "pkl"]:
+        if os.path.exists(f"{file_path}.{extension}"):
+            os.remove(f"{file_path}.{extension}")
+    write_frame(df_year_clean, file_path)
+
+    entry = _read_manifest_entry(path_cache_data, year)
+    entry["fingerprint"] = fingerprint
+    entry["built"] = datetime.now().isoformat(timespec="seconds")
+    _write_manifest_entry(path_cache_data, year, entry)
+
+
+def invalidate_clean_years(path_cache_data, years=None):
+    """
+    Removes cached cleaned year datasets, so that they are rebuilt on the next run.
+    Hit and miss counters of the manifest are kept.
+
+    Parameters:
+    - path_cache_data (str): Path to the cache directory.
+    - years (list, optional): Years to invalidate. Defaults to None (every cached year).
+
+    Returns:
+    - list: The invalidated years.
+    """
+    if years is None:
+        years = read_clean_years_manifest(path_cache_data).index.tolist()
+    for year in years:
+        file_path = _clean_year_path(path_cache_data, year)
+        for extension in ["parquet", "pkl"]:
+            if os.path.exists(f"{file_path}.{extension}"):
+                os.remove(f"{file_path}.{extension}")
+        entry = _read_manifest_entry(path_cache_data, year)
+        entry.pop("fingerprint", None)
+        if entry:
+            _write_manifest_entry(path_cache_data, year, entry)
+    return list(years)
+
+
+def read_clean_years_manifest(path_cache_data):
+    """
+    Reads the manifest of the cleaned years cache.
+
+    Parameters:
+    - path_cache_data (str): Path to the cache directory.
+
+    Returns:
+    - pandas.DataFrame: One row per year with its fingerprint, hit and miss counters,
+      last cache status and last build and access times.
+    """
+    path_manifest = os.path.join(path_cache_data, "clean_years", "manifest")
+    entries = {}
+    if os.path.isdir(path_manifest):
+        for file_name in sorted(os.listdir(path_manifest)):
+            year = int(os.path.splitext(file_name)[0])
+            entries[year] = _read_manifest_entry(path_cache_data, year)
+    df_manifest = pd.DataFrame.from_dict(entries, orient="index")
+    df_manifest.index.name = "year"
+    return df_manifest
+
+
+def save_panel_state(path_cache_data, state, df_deduplicated, df_imputed):
+    """
+    Stores the state of the concatenated panel, from which an incremental build adds new
+    questionnaire years without reprocessing the previous ones. The frames are pickled to
+    keep the exact dtypes of the concatenated years.
+
+    Parameters:
+    - path_cache_data (str): Path to the cache directory.
+    - state (dict): JSON serializable description of the panel (fingerprints of its years
+      and of the code building it).
+    - df_deduplicated (pandas.DataFrame): The panel after handle_duplicates.
+    - df_imputed (pandas.DataFrame): The panel after missing_value_imputation.
+    """
+    path_panel = os.path.join(path_cache_data, "panel")
+    os.makedirs(path_panel, exist_ok=True)
+    df_deduplicated.to_pickle(os.path.join(path_panel, "deduplicated.pkl"))
+    df_imputed.to_pickle(os.path.join(path_panel, "imputed.pkl"))
+    file_path = os.path.join(path_panel, "state.json")
+    with open(f"{file_path}.tmp", "w") as f:
+        json.dump(
+            dict(state, built=datetime.now().isoformat(timespec="seconds")),
+            f,
+            indent=2,
+        )
+    os.replace(f"{file_path}.tmp", file_path)
+
+
+def load_panel_state(path_cache_data):
+    """
+    Loads the state of the concatenated panel stored by save_panel_state.
+
+    Parameters:
+    - path_cache_data (str): Path to the cache directory.
+
+    Returns:
+    - tuple or None: (state, deduplicated panel, imputed panel), None if no state is stored.
+    """
+    path_panel = os.path.join(path_cache_data, "panel")
+    file_paths = [
+        os.path.join(path_panel, file_name)
+        for file_name in ["state.json", "deduplicated.pkl", "imputed.pkl"]
+    ]
+    if not all(os.path.exists(file_path) for file_path in file_paths):
+        return None
+    with open(file_paths[0]) as f:
+        state = json.load(f)
+    return state, pd.read_pickle(file_paths[1]), pd.read_pickle(file_paths[2])
+
+
+def _clean_year_path(path_cache_data, year):
+    return os.path.join(path_cache_data, "clean_years", f"cdp_clean_{year}")
+
+
+def _read_manifest_entry(path_cache_data, year):
+    # One manifest file per year, so that years processed concurrently never share a file
+    file_path = os.path.join(path_cache_data, "clean_years", "manifest", f"{year}.json")
+    if not os.path.exists(file_path):
+        return {}
+    with open(file_path) as f:
+        return json.load(f)
+
+
+def _write_manifest_entry(path_cache_data, year, entry):
+    path_manifest = os.path.join(path_cache_data, "clean_years", "manifest")
+    os.makedirs(path_manifest, exist_ok=True)
+    file_path = os.path.join(path_manifest, f"{year}.json")
+    with open(f"{file_path}.tmp", "w") as f:
+        json.dump(entry, f, indent=2)
+    os.replace(f"{file_path}.tmp", file_path)
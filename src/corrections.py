@@ -0,0 +1,183 @@
+import os
+
+
+import numpy as np
+import pandas as pd
+
+# Directory of the corrections tables, one corrections_[year].csv file per questionnaire year
+PATH_CORRECTIONS = os.path.join(os.path.dirname(__file__), "corrections")
+# Keys identifying the records of a correction, an empty key matching any value
+CORRECTIONS_KEYS = ["account_id", "row", "accounting_year"]
+CORRECTIONS_OPERATIONS = ("drop", "override", "insert")
+CORRECTIONS_COLUMNS = ["operation"] + CORRECTIONS_KEYS + ["column", "value"]
+
+
+def corrections_path(year, path_corrections=PATH_CORRECTIONS):
+    """
+    Builds the path of the corrections table of a given year.
+
+    Parameters:
+    - year (int): The questionnaire year.
+    - path_corrections (str, optional): Path to the corrections directory.
+      Defaults to src/corrections.
+
+    Returns:
+    - str: The path of the corrections_[year].csv table.
+    """
+    return os.path.join(path_corrections, f"corrections_{year}.csv")
+
+
+def load_corrections(year, path_corrections=PATH_CORRECTIONS):
+    """
+    Loads the manual corrections of a given year. Each line of the table is an operation on
+    the records matching its (account_id, row, accounting_year) keys:
+    - "drop" removes the matching records,
+    - "override" sets the value of a column of the matching records,
+    - "insert" sets a column of a new record, the lines sharing the same keys building one
+      record whose keys are taken from the line.
+
+    Parameters:
+    - year (int): The questionnaire year.
+    - path_corrections (str, optional): Path to the corrections directory.
+      Defaults to src/corrections.
+
+    Returns:
+    - pandas.DataFrame: The corrections table, empty if the year has no table.
+    """
+    file_path = corrections_path(year, path_corrections)
+    if not os.path.exists(file_path):
+        return pd.DataFrame(columns=CORRECTIONS_COLUMNS)
+    df_corrections = pd.read_csv(
+        file_path,
+        dtype={"operation": str, "column": str, "value": str},
+        skipinitialspace=True,
+    )
+    for key in CORRECTIONS_KEYS:
+        df_corrections[key] = df_corrections[key].astype("Int64")
+    unknown = set(df_corrections["operation"]) - set(CORRECTIONS_OPERATIONS)
+    if unknown:
+        raise ValueError(
+            f"Unknown correction operations {sorted(unknown)} in {file_path}, "
+            f"expected one of {list(CORRECTIONS_OPERATIONS)}"
+        )
+    return df_corrections[CORRECTIONS_COLUMNS]
+
+
+def apply_corrections(df_clean, df_corrections, keys=None):
+    """
+    Applies a corrections table to a year dataset: the dropped records are removed with a
+    single anti-join, then the overridden values are updated in one pass per column, and
+    the inserted records are appended.
+
+    Parameters:
+    - df_clean (pandas.DataFrame): The year dataset.
+    - df_corrections (pandas.DataFrame): The corrections table (see load_corrections).
+    - keys (dict, optional): Dictionary mapping the correction keys to the columns of the
+      dataset, e.g. {"account_id": "Account number", "row": "Row"}. Defaults to None
+      (the keys are columns of the dataset with the same name).
+
+    Returns:
+    - pandas.DataFrame: Returns the corrected DataFrame.
+    """
+    keys = {
+        **{key: key for key in CORRECTIONS_KEYS if key in df_clean.columns},
+        **(keys or {}),
+    }
+    df_corrections = df_corrections.reset_index(drop=True)
+    used_keys = [key for key in CORRECTIONS_KEYS if df_corrections[key].notna().any()]
+    missing_keys = set(used_keys) - set(keys)
+    if missing_keys:
+        raise ValueError(
+            f"Corrections keyed on {sorted(missing_keys)}, missing from the dataset"
+        )
+
+    df_drop = df_corrections[df_corrections["operation"] == "drop"]
+    if len(df_drop):
+        positions, _ = _match_corrections(df_clean, df_drop, keys)
+        is_kept = np.ones(len(df_clean), dtype=bool)
+        is_kept[positions] = False
+        df_clean = df_clean[is_kept]
+
+    df_override = df_corrections[df_corrections["operation"] == "override"]
+    if len(df_override):
+        df_clean = df_clean.copy()
+        positions, matches = _match_corrections(df_clean, df_override, keys)
+        columns = df_override["column"].to_numpy()[matches]
+        values = df_override["value"].to_numpy()[matches]
+        for column in pd.unique(columns):
+            is_column = columns == column
+            df_clean.iloc[positions[is_column], df_clean.columns.get_loc(column)] = (
+                _cast_values(values[is_column], df_clean[column])
+            )
+
+    df_insert = df_corrections[df_corrections["operation"] == "insert"]
+    if len(df_insert):
+        # Lines sharing the same keys make up one record
+        df_insert = df_insert.assign(
+            record=df_insert.groupby(CORRECTIONS_KEYS, dropna=False, sort=False)
+            .ngroup()
+            .to_numpy()
+        )
+        df_records = df_insert.pivot(
+            index="record", columns="column", values="value"
+        ).reindex(columns=df_clean.columns)
+        df_records_keys = df_insert.groupby("record")[CORRECTIONS_KEYS].first()
+        for key, column in keys.items():
+            df_records[column] = df_records_keys[key]
+        for column in df_records.columns:
+            df_records[column] = _cast_values(
+                df_records[column].to_numpy(), df_clean[column]
+            )
+        df_records.index = pd.RangeIndex(
+            df_clean.index.max() + 1, df_clean.index.max() + 1 + len(df_records)
+        )
+        df_clean = pd.concat([df_clean, df_records])
+    return df_clean
+
+
+def _match_corrections(df_clean, df_corrections, keys):
+    """
+    Joins the records of a dataset with the corrections whose keys they match, each
+    combination of given (non empty) keys being joined at once.
+
+    Returns:
+    - tuple: (positions of the matched records, positions of the matching corrections).
+    """
+    lst_positions, lst_matches = [], []
+    given_keys = df_corrections[CORRECTIONS_KEYS].notna()
+    for pattern, df_pattern in df_corrections.groupby(
+        [given_keys[key] for key in CORRECTIONS_KEYS], sort=False
+    ):
+        pattern_keys = [key for key, given in zip(CORRECTIONS_KEYS, pattern) if given]
+        df_records = pd.DataFrame(
+            {
+                key: df_clean[keys[key]].to_numpy(dtype="float64", na_value=np.nan)
+                for key in pattern_keys
+            }
+        )
+        df_records["position"] = np.arange(len(df_clean))
+        df_pattern_keys = pd.DataFrame(
+            {
+                key: df_pattern[key].to_numpy(dtype="float64", na_value=np.nan)
+                for key in pattern_keys
+            }
+        )
+        df_pattern_keys["match"] = df_corrections.index.get_indexer(df_pattern.index)
+        df_matched = df_records.merge(df_pattern_keys, on=pattern_keys)
+        lst_positions.append(df_matched["position"].to_numpy())
+        lst_matches.append(df_matched["match"].to_numpy())
+    if not lst_positions:
+        return np.array([], dtype=int), np.array([], dtype=int)
+    return np.concatenate(lst_positions), np.concatenate(lst_matches)
+
+
+def _cast_values(values, target):
+    """
+    Casts correction values (strings) to the dtype family of the target column: numbers for
+    numeric columns, strings otherwise.
+    """
+    if pd.api.types.is_numeric_dtype(target.dtype) and not pd.api.types.is_bool_dtype(
+        target.dtype
+    ):
+        return pd.to_numeric(pd.Series(values, dtype=object)).to_numpy()
+    return values
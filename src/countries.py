@@ -0,0 +1,132 @@
+import json
+import os
+
+
+import numpy as np
+import pandas as pd
+
+# Table of the canonical country names with their ISO 3166-1 codes and spelling variants
+PATH_COUNTRIES = os.path.join(os.path.dirname(__file__), "countries.csv")
+
+
+def normalize_country_name(name):
+    """
+    Normalizes a country name for lookups: case and repeated whitespaces are ignored.
+
+    Parameters:
+    - name (str): A country name.
+
+    Returns:
+    - str: The normalized name.
+    """
+    return " ".join(str(name).split()).casefold()
+
+
+def load_country_lookup(path_countries=PATH_COUNTRIES):
+    """
+    Compiles the countries table into lookups from any known spelling (canonical name,
+    variants, ISO alpha-2 and alpha-3 codes) to the canonical name, and from the canonical
+    names to the ISO alpha-3 codes.
+
+    Parameters:
+    - path_countries (str, optional): Path to the countries table. Defaults to
+      src/countries.csv.
+
+    Returns:
+    - tuple: (dict normalized spelling -> canonical name, dict canonical name -> ISO code).
+    """
+    # "NA" is the ISO code of Namibia, not a missing value
+    df_countries = pd.read_csv(path_countries, keep_default_na=False, dtype=str)
+    dict_names = {}
+    for country, iso_alpha2, iso_alpha3, variants in df_countries.itertuples(
+        index=False
+    ):
+        spellings = [country, iso_alpha2, iso_alpha3] + variants.split("|")
+        for spelling in filter(None, spellings):
+            dict_names[normalize_country_name(spelling)] = country
+    dict_iso_codes = dict(zip(df_countries["country"], df_countries["iso_alpha3"]))
+    return dict_names, dict_iso_codes
+
+
+COUNTRY_NAMES, COUNTRY_ISO_CODES = load_country_lookup()
+
+
+def _map_values(series, mapper):
+    """
+    Maps each distinct value of a Series once, through its categorical codes, and returns
+    a Series of the same dtype (categories being merged for categorical Series).
+    """
+    is_categorical = isinstance(series.dtype, pd.CategoricalDtype)
+    values = series if is_categorical else series.astype("category")
+    mapped = pd.Index([mapper(value) for value in values.cat.categories], dtype=object)
+    categories = mapped.dropna().unique()
+    codes = values.cat.codes.to_numpy()
+    new_codes = categories.get_indexer(mapped)
+    new_codes = np.where(codes >= 0, new_codes[codes], -1)
+    result = pd.Series(
+        pd.Categorical.from_codes(new_codes, categories),
+        index=series.index,
+        name=series.name,
+    )
+    return result if is_categorical else result.astype(series.dtype)
+
+
+def canonicalize_countries(series):
+    """
+    Replaces the country names of a Series with their canonical names, e.g. "USA" with
+    "United States of America". Unknown names are kept as they are.
+
+    Parameters:
+    - series (pandas.Series): Country names, categorical or not.
+
+    Returns:
+    - pandas.Series: Returns the canonical country names, with the dtype of the input.
+    """
+    return _map_values(
+        series,
+        lambda value: COUNTRY_NAMES.get(normalize_country_name(value), value),
+    )
+
+
+def canonicalize_covered_countries(series):
+    """
+    Replaces the country names of covered countries (JSON lists or single countries)
+    with their canonical names.
+
+    Parameters:
+    - series (pandas.Series): Covered countries, JSON-like lists of countries
+      (2015 to 2017) or single countries.
+
+    Returns:
+    - pandas.Series: Returns the covered countries with canonical names, in the same format.
+    """
+
+    def canonicalize(value):
+        if not str(value).startswith("["):
+            return COUNTRY_NAMES.get(normalize_country_name(value), value)
+        countries = json.loads(value)
+        canonical = [
+            COUNTRY_NAMES.get(normalize_country_name(country), country)
+            for country in countries
+        ]
+        if canonical == countries:
+            return value
+        return json.dumps(canonical, ensure_ascii=False, separators=(",", ":"))
+
+    return _map_values(series, canonicalize)
+
+
+def country_iso_codes(series):
+    """
+    Gets the ISO 3166-1 alpha-3 codes of canonical country names.
+
+    Parameters:
+    - series (pandas.Series): Canonical country names (see canonicalize_countries).
+
+    Returns:
+    - pandas.Series: Returns the categorical ISO codes, missing for unknown countries.
+    """
+    iso_codes = _map_values(
+        series.astype("category"), lambda value: COUNTRY_ISO_CODES.get(value)
+    )
+    return iso_codes.rename("country_iso")
@@ -1,13 +1,16 @@
-import pandas as pd
 import numpy as np
 
 
+from src.corrections import apply_corrections, load_corrections
 from src.get_year import GetGivenYear
 from src.get_year_functions import (
+    get_raw_file_path,
     load_useful_sheets,
     preprocess_covered_countries,
     common_final_cleaning,
-    dict_to_relevance,
+    counts_to_relevance,
+    filter_complete_scope_3,
+    stream_scope_3,
 )
 
 
@@ -20,32 +23,42 @@ class Get2016(GetGivenYear):
     as well as year specific methods/operations to format the data.
     The get_year_dataset method can be used to get the clean dataset."""
 
+    col_CF3_metric = "CC14.1 C3 - Please account for your organization’s Scope 3 emissions, disclosing and explaining any exclusions - metric tonnes CO2e"
+    col_CF3_evaluation = "CC14.1 C2 - Please account for your organization’s Scope 3 emissions, disclosing and explaining any exclusions - Evaluation status"
+
     def get_useful_sheets(self, path_raw_data):
         year = 2016
-        return load_useful_sheets(year, path_raw_data)
+        return load_useful_sheets(year, path_raw_data, **self.read_options)
 
     def get_covered_countries(self, df_countries):
         return preprocess_covered_countries(df_countries)
 
     def get_scopes_3(self, df_CF3):
-        df_CF3_filtered = df_CF3[
-            df_CF3["account_name"].map(df_CF3["account_name"].value_counts()) == 17
-        ]
-        emission_column = "CC14.1 C3 - Please account for your organization’s Scope 3 emissions, disclosing and explaining any exclusions - metric tonnes CO2e"
+        df_CF3_filtered, _ = filter_complete_scope_3(df_CF3, label=2016)
         df_CF3_calc = (
-            df_CF3_filtered.groupby(["account_id", "accounting_year"])[emission_column]
+            df_CF3_filtered.groupby(["account_id", "accounting_year"])[
+                self.col_CF3_metric
+            ]
             .sum()
             .to_frame("CDP_CF3")
         )
 
-        evaluation_column = "CC14.1 C2 - Please account for your organization’s Scope 3 emissions, disclosing and explaining any exclusions - Evaluation status"
         evaluation_counts = df_CF3_filtered.groupby(["account_id", "accounting_year"])[
-            evaluation_column
+            self.col_CF3_evaluation
         ].value_counts()
         evaluation_counts_pivot = evaluation_counts.unstack().fillna(0)
 
-        df_CF3_calc["CF3_relevance"] = evaluation_counts_pivot.apply(
-            lambda row: dict_to_relevance(row.to_dict()), axis=1
+        df_CF3_calc["CF3_relevance"] = counts_to_relevance(evaluation_counts_pivot)
+        return df_CF3_calc.reset_index()
+
+    def stream_scopes_3(self, path_raw_data):
+        df_CF3_calc = stream_scope_3(
+            get_raw_file_path(2016, path_raw_data),
+            "CC14.1",
+            ["account_id", "accounting_year"],
+            self.col_CF3_metric,
+            self.col_CF3_evaluation,
+            col_count="account_id",
         )
         return df_CF3_calc.reset_index()
 
@@ -83,10 +96,12 @@ class Get2016(GetGivenYear):
         ]
         return df_CF2
 
-    def get_year_dataset(self, path_raw_data):
-        (df_countries, df_CF1, df_CF2, df_CF3) = self.get_useful_sheets(path_raw_data)
+    def get_year_dataset(self, path_raw_data, sheets=None):
+        if sheets is None:
+            sheets = self.get_useful_sheets(path_raw_data)
+        df_countries, df_CF1, df_CF2, df_CF3 = sheets
         df_covered_countries = self.get_covered_countries(df_countries)
-        df_CF3_calc = self.get_scopes_3(df_CF3)
+        df_CF3_calc = self.compute_scopes_3(df_CF3, path_raw_data)
         df_clean = self.preprocess_CF1(df_CF1)
         df_CF2 = self.preprocess_CF2(df_CF2)
 
@@ -108,34 +123,7 @@ class Get2016(GetGivenYear):
         df_clean["sector"] = np.nan
         df_clean["industry"] = np.nan
 
-        df_clean = df_clean[
-            ~((df_clean.account_id == 6532) & (df_clean.accounting_year == 2016))
-        ]
-        duplicate = pd.DataFrame(
-            [
-                [
-                    6532,
-                    "Firstsource Solutions",
-                    "India",
-                    np.nan,
-                    np.nan,
-                    2016,
-                    "Operational control",
-                    35.75,
-                    "United Kingdom|India",
-                    np.nan,
-                    np.nan,
-                    0.0,
-                    0.3333333333333333,
-                    np.nan,
-                    np.nan,
-                    np.nan,
-                ]
-            ],
-            columns=df_clean.columns,
-            index=[max(df_clean.index) + 1],
-        )
-        df_clean = pd.concat([df_clean, duplicate])
+        df_clean = apply_corrections(df_clean, load_corrections(2016))
 
         df_clean = common_final_cleaning(df_clean)
         return df_clean
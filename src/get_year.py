@@ -3,9 +3,15 @@ from abc import ABC, abstractmethod
 
 class GetGivenYear(ABC):
     """
-    This is an abstract class that serves as a template for every years
+    This is an abstract class that serves as a template for every years.
+    Keyword arguments given at instantiation (e.g. path_cache_data) are stored
+    in read_options and forwarded to load_useful_sheets. get_year_dataset also accepts
+    the sheets already loaded by get_useful_sheets, e.g. from a pipeline stage.
     """
 
+    def __init__(self, **read_options):
+        self.read_options = read_options
+
     @abstractmethod
     def get_useful_sheets(self):
         pass
@@ -17,3 +23,12 @@ class GetGivenYear(ABC):
     @abstractmethod
     def get_year_dataset(self):
         pass
+
+    def compute_scopes_3(self, df_CF3, path_raw_data):
+        """
+        Aggregates Scope 3 emissions from the loaded Scope 3 sheet or, if the stream_scope_3
+        read option is set, by streaming the sheet from the raw workbook.
+        """
+        if self.read_options.get("stream_scope_3"):
+            return self.stream_scopes_3(path_raw_data)
+        return self.get_scopes_3(df_CF3)
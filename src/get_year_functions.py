@@ -1,20 +1,324 @@
+import importlib.util
 import os
+import time
 
 
 import numpy as np
+import openpyxl
 import pandas as pd
 
 
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime
 
 
-def load_useful_sheets(year, path_raw_data):
+from src.cache import (
+    file_sha256,
+    read_frame,
+    write_frame,
+    write_absent_marker,
+    raw_sheet_cache_path,
+)
+from src.schema import apply_sheet_schema
+from src.sheets_manifest import (
+    USEFUL_SHEETS,
+    OPTIONAL_SHEETS,
+    SCOPE_3_SHEETS,
+    SCHEMA_COLUMNS,
+)
+
+# Supported Excel parsing engines and the module each of them requires
+EXCEL_ENGINES = {"openpyxl": "openpyxl", "calamine": "python_calamine"}
+# Engines parsing in native code, whose sheets can be parsed concurrently in threads
+THREADED_ENGINES = ("calamine",)
+
+
+def get_raw_file_path(year, path_raw_data):
+    """
+    Builds the path of the raw CDP workbook of a given year.
+
+    Parameters:
+    - year (int): The questionnaire year.
+    - path_raw_data (str): Path to the raw data directory.
+
+    Returns:
+    - str: The path of the CDP_CC_emissions data_year.xlsx workbook.
+    """
+    return os.path.join(path_raw_data, f"CDP_CC_emissions data_{year}.xlsx")
+
+
+def resolve_engine(engine=None):
+    """
+    Returns the Excel parsing engine to use, falling back on openpyxl when the requested
+    engine is not installed.
+
+    Parameters:
+    - engine (str, optional): The requested engine, one of EXCEL_ENGINES ("openpyxl" or
+      "calamine"). Defaults to None (openpyxl, the pandas default for xlsx files).
+
+    Returns:
+    - str: The name of an available engine.
+    """
+    if engine is None:
+        return "openpyxl"
+    if engine not in EXCEL_ENGINES:
+        raise ValueError(
+            f"Unknown Excel engine {engine}, expected one of {list(EXCEL_ENGINES)}"
+        )
+    if not engine_available(engine):
+        print(f"{engine} engine is not available, falling back on openpyxl")
+        return "openpyxl"
+    return engine
+
+
+def engine_available(engine):
+    """
+    Checks whether an Excel parsing engine can be used with the installed packages.
+
+    Parameters:
+    - engine (str): The engine name, one of EXCEL_ENGINES.
+
+    Returns:
+    - bool: True if the engine module is installed (and pandas>=2.2 for calamine).
+    """
+    pandas_version = tuple(int(x) for x in pd.__version__.split(".")[:2])
+    if engine == "calamine" and pandas_version < (2, 2):
+        return False
+    return importlib.util.find_spec(EXCEL_ENGINES[engine]) is not None
+
+
+def parse_sheet(xls, sheet_name, columns=None):
+    """
+    Parses a sheet of an opened Excel workbook, keeping only some of its columns.
+
+    Parameters:
+    - xls (pandas.ExcelFile): The opened workbook.
+    - sheet_name (str): Name of the sheet.
+    - columns (list, optional): Columns to keep. Defaults to None (every column).
+
+    Returns:
+    - pandas.DataFrame: The parsed sheet.
+    """
+    if columns is None:
+        return xls.parse(sheet_name)
+    columns = set(columns)
+    return xls.parse(sheet_name, usecols=lambda column: column in columns)
+
+
+def read_sheets(
+    file_path,
+    sheets_columns,
+    optional_sheets=(),
+    path_cache_data=None,
+    engine=None,
+    sheet_workers=1,
+):
+    """
+    Reads several sheets of an Excel workbook while opening the workbook only once.
+    Only the listed columns of each sheet are kept, so that the unused question
+    columns are never held in memory.
+
+    Parameters:
+    - file_path (str): Path to the Excel workbook.
+    - sheets_columns (dict): Dictionary mapping the names of the sheets to be read, in the
+      desired order, to the list of columns to keep (None keeps every column).
+    - optional_sheets (iterable, optional): Sheets that may be absent from the workbook.
+      Missing optional sheets are returned as None instead of raising a ValueError.
+    - path_cache_data (str, optional): Path to the cache directory. If provided, parsed sheets
+      are stored in a binary columnar format keyed by the workbook SHA-256 and the sheet name,
+      and are loaded from there as long as the workbook content is unchanged.
+    - engine (str, optional): Excel parsing engine, "openpyxl" or "calamine" (see
+      resolve_engine). Defaults to None (openpyxl).
+    - sheet_workers (int, optional): Number of sheets parsed concurrently (see
+      parse_sheets_concurrently). Defaults to 1 (sheets parsed one after another).
+
+    Returns:
+    - dict: A dictionary mapping each requested sheet name to its DataFrame (or None).
+    """
+    engine = resolve_engine(engine)
+    dict_sheets = {}
+    dict_cache_paths = {}
+    if path_cache_data:
+        workbook_hash = file_sha256(file_path)
+        for sheet_name, columns in sheets_columns.items():
+            cache_path = raw_sheet_cache_path(
+                path_cache_data, workbook_hash, sheet_name, columns, engine
+            )
+            dict_cache_paths[sheet_name] = cache_path
+            if os.path.exists(f"{cache_path}.absent"):
+                dict_sheets[sheet_name] = None
+            else:
+                df_sheet = read_frame(cache_path)
+                if df_sheet is not None:
+                    dict_sheets[sheet_name] = df_sheet
+        if dict_sheets:
+            print(
+                f"{len(dict_sheets)}/{len(sheets_columns)} sheets of",
+                os.path.basename(file_path),
+                "loaded from cache",
+            )
+
+    sheets_to_parse = {
+        sheet_name: columns
+        for sheet_name, columns in sheets_columns.items()
+        if sheet_name not in dict_sheets
+    }
+    if not sheets_to_parse:
+        parsed_sheets = []
+    elif sheet_workers > 1 and len(sheets_to_parse) > 1:
+        parsed_sheets = parse_sheets_concurrently(
+            file_path, sheets_to_parse, optional_sheets, engine, sheet_workers
+        )
+    else:
+        parsed_sheets = parse_sheets(
+            file_path, sheets_to_parse, optional_sheets, engine
+        )
+
+    # Sheets are stored (and cached) as soon as they are parsed
+    for sheet_name, df_sheet, parse_time in parsed_sheets:
+        dict_sheets[sheet_name] = df_sheet
+        if df_sheet is not None:
+            print(f"{sheet_name} parsed with {engine} in {parse_time:.2f}s")
+        if path_cache_data:
+            cache_path = dict_cache_paths[sheet_name]
+            if df_sheet is None:
+                write_absent_marker(cache_path)
+            else:
+                write_frame(df_sheet, cache_path)
+
+    return {sheet_name: dict_sheets[sheet_name] for sheet_name in sheets_columns}
+
+
+def parse_sheets(file_path, sheets_columns, optional_sheets=(), engine=None):
+    """
+    Parses several sheets of a workbook one after another, opening the workbook once.
+
+    Parameters:
+    - file_path (str): Path to the Excel workbook.
+    - sheets_columns (dict): Dictionary mapping sheet names to the list of columns to keep
+      (None keeps every column).
+    - optional_sheets (iterable, optional): Sheets returned as None when absent.
+    - engine (str, optional): Excel parsing engine. Defaults to None (openpyxl).
+
+    Yields:
+    - tuple: (sheet name, DataFrame or None, parsing time in seconds) for each sheet.
+    """
+    with pd.ExcelFile(file_path, engine=resolve_engine(engine)) as xls:
+        for sheet_name, columns in sheets_columns.items():
+            start = time.perf_counter()
+            if sheet_name in optional_sheets and sheet_name not in xls.sheet_names:
+                df_sheet = None
+            else:
+                df_sheet = parse_sheet(xls, sheet_name, columns)
+            yield sheet_name, df_sheet, time.perf_counter() - start
+
+
+def parse_sheets_concurrently(
+    file_path, sheets_columns, optional_sheets=(), engine=None, sheet_workers=2
+):
+    """
+    Parses several sheets of a workbook concurrently, each worker opening the workbook.
+    Threads are used for engines parsing in native code (THREADED_ENGINES) and processes
+    for pure Python engines such as openpyxl, which would otherwise be serialized by the GIL.
+
+    Parameters:
+    - file_path (str): Path to the Excel workbook.
+    - sheets_columns (dict): Dictionary mapping sheet names to the list of columns to keep
+      (None keeps every column).
+    - optional_sheets (iterable, optional): Sheets returned as None when absent.
+    - engine (str, optional): Excel parsing engine. Defaults to None (openpyxl).
+    - sheet_workers (int, optional): Number of sheets parsed at the same time. Defaults to 2.
+
+    Yields:
+    - tuple: (sheet name, DataFrame or None, parsing time in seconds), in order of completion.
+    """
+    engine = resolve_engine(engine)
+    if engine in THREADED_ENGINES:
+        executor_class = ThreadPoolExecutor
+    else:
+        executor_class = ProcessPoolExecutor
+    with executor_class(max_workers=sheet_workers) as executor:
+        futures = [
+            executor.submit(
+                _parse_workbook_sheet,
+                file_path,
+                sheet_name,
+                columns,
+                sheet_name in optional_sheets,
+                engine,
+            )
+            for sheet_name, columns in sheets_columns.items()
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def _parse_workbook_sheet(file_path, sheet_name, columns, optional, engine):
+    start = time.perf_counter()
+    with pd.ExcelFile(file_path, engine=engine) as xls:
+        if optional and sheet_name not in xls.sheet_names:
+            df_sheet = None
+        else:
+            df_sheet = parse_sheet(xls, sheet_name, columns)
+    return sheet_name, df_sheet, time.perf_counter() - start
+
+
+def compare_engines(file_path, sheets_columns, engines=None):
+    """
+    Times the parsing of the sheets of a workbook with several Excel engines, to pick the
+    fastest reader for a given deployment.
+
+    Parameters:
+    - file_path (str): Path to the Excel workbook.
+    - sheets_columns (dict): Dictionary mapping sheet names to the list of columns to keep
+      (None keeps every column), e.g. USEFUL_SHEETS[year].
+    - engines (list, optional): Engines to compare. Defaults to every installed engine.
+
+    Returns:
+    - pandas.DataFrame: Parsing times in seconds, with one row per sheet (plus a 'total'
+      row) and one column per engine.
+    """
+    if engines is None:
+        engines = [engine for engine in EXCEL_ENGINES if engine_available(engine)]
+    dict_times = {}
+    for engine in engines:
+        dict_times[engine] = {}
+        with pd.ExcelFile(file_path, engine=engine) as xls:
+            for sheet_name, columns in sheets_columns.items():
+                if sheet_name in xls.sheet_names:
+                    start = time.perf_counter()
+                    parse_sheet(xls, sheet_name, columns)
+                    dict_times[engine][sheet_name] = time.perf_counter() - start
+    df_times = pd.DataFrame(dict_times)
+    df_times.loc["total"] = df_times.sum()
+    return df_times
+
+
+def load_useful_sheets(
+    year,
+    path_raw_data,
+    path_cache_data=None,
+    stream_scope_3=False,
+    engine=None,
+    sheet_workers=1,
+):
     """
     Loads relevant sheets from the CDP_CC_emissions_year.xlsx data for a given year.
+    The workbook is opened a single time and only the columns listed in the
+    sheets manifest (src/sheets_manifest.py) are kept, with the dtypes of the output
+    schema (see apply_sheet_schema).
 
     Parameters:
     - year (int): The year for which the relevant data sheets are to be loaded.
     - path_raw_data (str): Path to the raw data directory. Defaults to data/raw_data.
+    - path_cache_data (str, optional): Path to the raw sheets cache directory. Defaults to None
+      (no cache).
+    - stream_scope_3 (bool, optional): If True, the Scope 3 sheet is not loaded and None is
+      returned in its place, Scope 3 being aggregated with stream_scope_3. Defaults to False.
+    - engine (str, optional): Excel parsing engine, "openpyxl" or "calamine". Defaults to None
+      (openpyxl).
+    - sheet_workers (int, optional): Number of sheets parsed concurrently. Defaults to 1.
 
     Returns:
     - tuple: Depending on the year provided, returns a tuple containing DataFrames for
@@ -22,71 +326,196 @@ def load_useful_sheets(year, path_raw_data):
       a tuple with DataFrames for different sheets related to emissions and summary
       data (reporting years, countries, boundaries).
     """
-    file_path = os.path.join(path_raw_data, f"CDP_CC_emissions data_{year}.xlsx")
-    if year in [2015, 2016, 2017]:
-        df_countries = pd.read_excel(file_path, sheet_name="CC0.3")
-        df_CF1 = pd.read_excel(file_path, sheet_name="CC8. Emissions Data")
-        df_CF3 = pd.read_excel(file_path, sheet_name="CC14.1")
-        if year == 2015:
-            return (df_countries, df_CF1, df_CF3)
-        else:
-            df_CF2 = pd.read_excel(file_path, sheet_name="CC8.3a")
-            return (df_countries, df_CF1, df_CF2, df_CF3)
+    file_path = get_raw_file_path(year, path_raw_data)
+    sheets_columns = USEFUL_SHEETS[year]
+    if stream_scope_3:
+        sheets_columns = {
+            sheet_name: columns
+            for sheet_name, columns in sheets_columns.items()
+            if sheet_name not in SCOPE_3_SHEETS
+        }
+
+    start = time.perf_counter()
+    dict_sheets = read_sheets(
+        file_path,
+        sheets_columns,
+        optional_sheets=OPTIONAL_SHEETS,
+        path_cache_data=path_cache_data,
+        engine=engine,
+        sheet_workers=sheet_workers,
+    )
+    if sheet_workers > 1:
+        openings = f"with {sheet_workers} sheets parsed concurrently"
+    else:
+        openings = f"with at most one workbook opening ({len(sheets_columns) - 1} openings saved)"
+    print(
+        year,
+        f"- {len(sheets_columns)} sheets loaded in {time.perf_counter() - start:.1f}s",
+        openings,
+    )
+    bytes_before, bytes_after = 0, 0
+    for sheet_name, df_sheet in dict_sheets.items():
+        if df_sheet is not None:
+            bytes_before += df_sheet.memory_usage(index=False, deep=True).sum()
+            dict_sheets[sheet_name] = apply_sheet_schema(
+                df_sheet, SCHEMA_COLUMNS, label=year
+            )
+            bytes_after += (
+                dict_sheets[sheet_name].memory_usage(index=False, deep=True).sum()
+            )
+    print(year, f"- schema dtypes of the sheets: {bytes_before} -> {bytes_after} bytes")
+    return tuple(dict_sheets.get(sheet_name) for sheet_name in USEFUL_SHEETS[year])
+
+
+# Number of Scope 3 category rows of a complete submission in the legacy CC14.1 sheets
+LEGACY_SCOPE_3_CATEGORIES = 17
+
+
+def filter_complete_scope_3(
+    df_CF3, col_account="account_id", n_categories=LEGACY_SCOPE_3_CATEGORIES, label=None
+):
+    """
+    Keeps the Scope 3 rows of the accounts with a complete submission, i.e. exactly one row
+    per Scope 3 category, in legacy CC14.1 sheets (2015 to 2017).
 
-    elif year in [2018, 2019, 2020, 2021, 2022, 2023]:
-        if year == 2022 | year == 2023:
-            df_base = pd.read_excel(file_path, sheet_name="Summary Data")
+    Parameters:
+    - df_CF3 (pandas.DataFrame): The Scope 3 sheet, one row per account and category.
+    - col_account (str, optional): Column identifying the accounts. Defaults to "account_id".
+    - n_categories (int, optional): Expected number of rows of an account.
+      Defaults to LEGACY_SCOPE_3_CATEGORIES (17).
+    - label (str or int, optional): Label of the printed number of ignored accounts (e.g.
+      the year). Defaults to None (nothing printed).
+
+    Returns:
+    - tuple: (the rows of complete accounts, a report of the incomplete accounts indexed
+      by account with their number of rows 'n_rows' and the number of 'missing_rows',
+      negative when rows are in excess). Rows without account are dropped.
+    """
+    n_rows = df_CF3.groupby(col_account)[col_account].transform("size")
+    is_complete = n_rows == n_categories
+    df_report = (
+        pd.DataFrame({col_account: df_CF3[col_account], "n_rows": n_rows})[
+            ~is_complete & n_rows.notna()
+        ]
+        .drop_duplicates(col_account)
+        .set_index(col_account)
+        .sort_index()
+        .astype("int64")
+    )
+    df_report["missing_rows"] = n_categories - df_report["n_rows"]
+    if label is not None:
+        print(
+            label,
+            "-",
+            len(df_report),
+            "accounts with an incomplete Scope 3 submission ignored",
+        )
+    return df_CF3[is_complete], df_report
+
+
+def stream_scope_3(
+    file_path,
+    sheet_name,
+    group_columns,
+    col_metric,
+    col_evaluation,
+    col_count=None,
+    n_rows=LEGACY_SCOPE_3_CATEGORIES,
+):
+    """
+    Computes Scope 3 aggregates by streaming the rows of a Scope 3 sheet (C6.5 or CC14.1)
+    with openpyxl in read-only mode. Rows are folded one at a time into per-group sums and
+    evaluation status counts, so the sheet is never loaded as a DataFrame and memory only
+    depends on the number of accounts.
+
+    Parameters:
+    - file_path (str): Path to the CDP workbook.
+    - sheet_name (str): Name of the Scope 3 sheet.
+    - group_columns (list): Columns identifying an aggregate (e.g. ["Account number"]).
+      Rows with a missing group value are ignored.
+    - col_metric (str): Column of the Scope 3 emissions, summed for each group.
+      'Question not applicable' counts as 0.
+    - col_evaluation (str): Column of the evaluation status, used to derive the relevance.
+    - col_count (str, optional): If provided, only rows whose value in this column occurs
+      exactly n_rows times in the sheet are kept (legacy completeness filter). Defaults to None.
+    - n_rows (int, optional): Expected number of rows for col_count.
+      Defaults to LEGACY_SCOPE_3_CATEGORIES (17).
+
+    Returns:
+    - pandas.DataFrame: A DataFrame indexed by group_columns with 'CDP_CF3' and 'CF3_relevance'
+      columns. 'CF3_relevance' is NaN for groups without any evaluation status.
+    """
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet_name].iter_rows(values_only=True)
+        header = list(next(rows))
+        idx_group = [header.index(col) for col in group_columns]
+        idx_metric = header.index(col_metric)
+        idx_evaluation = header.index(col_evaluation)
+        idx_count = header.index(col_count) if col_count else None
+
+        occurrences = Counter()
+        sums = defaultdict(float)
+        evaluations = defaultdict(Counter)
+        for row in rows:
+            count_key = ()
+            if idx_count is not None:
+                if row[idx_count] is None:
+                    continue
+                occurrences[row[idx_count]] += 1
+                count_key = (row[idx_count],)
+            keys = tuple(row[i] for i in idx_group)
+            if any(key is None for key in keys):
+                continue
+            metric = row[idx_metric]
+            sums[count_key + keys] += (
+                0.0
+                if metric is None or metric == "Question not applicable"
+                else float(metric)
+            )
+            if row[idx_evaluation] is not None:
+                evaluations[count_key + keys][row[idx_evaluation]] += 1
+    finally:
+        workbook.close()
+
+    # Merge partial aggregates of the rows passing the completeness filter
+    group_sums = defaultdict(float)
+    group_evaluations = defaultdict(Counter)
+    for partial_key, partial_sum in sums.items():
+        if idx_count is not None:
+            if occurrences[partial_key[0]] != n_rows:
+                continue
+            keys = partial_key[1:]
         else:
-            df_base = pd.read_excel(file_path, sheet_name="C0 - Introduction")
-            
-
-        df_years = pd.read_excel(file_path, sheet_name="C0.2")
-
-        try:
-            df_countries = pd.read_excel(file_path, sheet_name="C0.3")
-        except ValueError:
-            df_countries = None
-
-        try:
-            df_boundaries = pd.read_excel(file_path, sheet_name="C0.5")
-        except ValueError:
-            df_boundaries = None
-
-        df_CF1 = pd.read_excel(file_path, sheet_name="C6.1")
-        df_CF2 = pd.read_excel(file_path, sheet_name="C6.3")
-        df_CF3 = pd.read_excel(file_path, sheet_name="C6.5")
-
-        dict_to_return = {
-            2018: (df_base, df_years, df_countries, df_CF1, df_CF2, df_CF3),
-            2019: (df_base, df_years, df_countries, df_CF1, df_CF2, df_CF3),
-            2020: (df_base, df_years, df_CF1, df_CF2, df_CF3),
-            2021: (df_base, df_years, df_CF1, df_CF2, df_CF3),
-            2022: (
-                df_base,
-                df_years,
-                df_countries,
-                df_boundaries,
-                df_CF1,
-                df_CF2,
-                df_CF3,
-            ),
-            2023: (
-                df_base,
-                df_years,
-                df_countries,
-                df_boundaries,
-                df_CF1,
-                df_CF2,
-                df_CF3,
-            ),
-        }
-    return dict_to_return[year]
+            keys = partial_key
+        group_sums[keys] += partial_sum
+        group_evaluations[keys].update(evaluations[partial_key])
+
+    index = pd.MultiIndex.from_tuples(list(group_sums), names=group_columns)
+    if len(group_columns) == 1:
+        index = index.get_level_values(0)
+    df_CF3_calc = pd.DataFrame(
+        {
+            "CDP_CF3": list(group_sums.values()),
+            "CF3_relevance": [
+                (
+                    dict_to_relevance(group_evaluations[keys])
+                    if group_evaluations[keys]
+                    else np.nan
+                )
+                for keys in group_sums
+            ],
+        },
+        index=index,
+    )
+    return df_CF3_calc.sort_index()
 
 
 def preprocess_covered_countries(df_countries):
     """
     Preprocesses covered countries data in a DataFrame.
-    Data can the be loaded in lists using: lambda x: json.loads(x)
+    Data can the be loaded in lists using: lambda x: json.loads(x), or stored as lists in the
+    final dataset with format_covered_countries.
 
     Parameters:
     - df_countries (pandas.DataFrame): A DataFrame containing information about covered countries,
@@ -99,8 +528,10 @@ def preprocess_covered_countries(df_countries):
       and aggregates this information for each 'account_id', resulting in a DataFrame with 'account_id'
       and concatenated 'covered_countries' information.
     """
-    df_countries["covered_countries"] = df_countries.apply(
-        lambda x: "".join(filter(None, x[-2:].fillna(""))), axis=1
+    # Country information of each row is spread over the last two columns
+    country_columns = df_countries.iloc[:, -2:].fillna("")
+    df_countries["covered_countries"] = (
+        country_columns.iloc[:, 0] + country_columns.iloc[:, 1]
     )
     df_covered_countries = (
         df_countries.groupby("account_id")["covered_countries"]
@@ -108,11 +539,8 @@ def preprocess_covered_countries(df_countries):
         .reset_index()
     )
     df_covered_countries["covered_countries"] = (
-        df_covered_countries.covered_countries.apply(lambda x: f'["{x}"]')
-    )
-    df_covered_countries["covered_countries"] = df_covered_countries[
-        "covered_countries"
-    ].replace('[""]', "[]")
+        '["' + df_covered_countries["covered_countries"] + '"]'
+    ).replace('[""]', "[]")
     return df_covered_countries
 
 
@@ -144,19 +572,45 @@ def str_to_accounting_year(reporting_date):
         return year
 
 
-def preprocess_accounting_years(df_years):
+def dates_to_accounting_year(dates, cutoff_month=7, min_year=2009, max_year=2024):
+    """
+    Get the accounting years of reporting end dates: a year ending before the cutoff month
+    is attributed to the previous year.
+
+    Parameters:
+    - dates (pandas.Series): End dates of the reporting years, as datetime64 values.
+    - cutoff_month (int, optional): First month of an accounting year. Defaults to 7 (July).
+    - min_year (int, optional): First valid accounting year. Defaults to 2009.
+    - max_year (int, optional): Last valid accounting year. Defaults to 2024.
+
+    Returns:
+    - pandas.Series: The accounting years, NaN for missing or out-of-range dates. The series
+      has an int64 dtype when every accounting year is valid.
+    """
+    accounting_year = dates.dt.year - (dates.dt.month < cutoff_month)
+    accounting_year = accounting_year.where(
+        (accounting_year >= min_year) & (accounting_year <= max_year)
+    )
+    if accounting_year.notna().all():
+        return accounting_year.astype("int64")
+    return accounting_year.astype("float64")
+
+
+def preprocess_accounting_years(df_years, cutoff_month=7, min_year=2009, max_year=2024):
     """
     Preprocesses accounting year data from a DataFrame by filtering and formatting date columns.
 
     Parameters:
     - df_years (pandas.DataFrame): A DataFrame containing accounting year data with columns
       specifying start and end dates for reporting data.
+    - cutoff_month, min_year, max_year (int, optional): Accounting year cutoff month and
+      validity window (see dates_to_accounting_year).
 
     Returns:
     - pandas.DataFrame: Returns a preprocessed DataFrame where rows with 'Question not applicable'
       or NaN values in start_date or end_date columns are filtered out. The start_date and end_date
-      columns are converted to yyyyMMdd string format, and a new 'accounting_year' column is added
-      containing the derived accounting years using the 'str_to_accounting_year' function.
+      columns are converted to datetime64, and a new 'accounting_year' column is added
+      containing the derived accounting years using the 'dates_to_accounting_year' function.
     """
     start_date_col = "C0.2_C1_State the start and end date of the year for which you are reporting data. - Start date"
     end_date_col = "C0.2_C2_State the start and end date of the year for which you are reporting data. - End date"
@@ -167,25 +621,23 @@ def preprocess_accounting_years(df_years):
         & (df_years[end_date_col] != "Question not applicable")
     ].dropna()
 
-    # Convert date columns to yyyyMMdd string format
-    df_years_filtered["start_date"] = (
-        pd.to_datetime(df_years_filtered[start_date_col])
-        .dt.strftime("%Y%m%d")
-        .astype("int64")
-    )
-    df_years_filtered["end_date"] = (
-        pd.to_datetime(df_years_filtered[end_date_col])
-        .dt.strftime("%Y%m%d")
-        .astype("int64")
-    )
-
-    # Apply str_to_accounting_year to the end_date column
-    df_years_filtered["accounting_year"] = df_years_filtered["end_date"].apply(
-        str_to_accounting_year
+    df_years_filtered["start_date"] = pd.to_datetime(df_years_filtered[start_date_col])
+    df_years_filtered["end_date"] = pd.to_datetime(df_years_filtered[end_date_col])
+    df_years_filtered["accounting_year"] = dates_to_accounting_year(
+        df_years_filtered["end_date"], cutoff_month, min_year, max_year
     )
     return df_years_filtered.reset_index(drop=True)
 
 
+# Evaluation statuses counted in the denominator of the scope 3 relevance ratio
+RELEVANCE_STATUSES = [
+    "Not evaluated",
+    "Relevant, calculated",
+    "Relevant, not yet calculated",
+    "Not relevant, calculated",
+]
+
+
 def dict_to_relevance(dict_relevance):
     """
     Derives the relevance of disclosed scope 3 based on a specific ratio:
@@ -246,7 +698,180 @@ def calculate_relevance(group, col):
     return dict_to_relevance(dict_relevance)
 
 
-def attribute_CF3_to_last_year(df_clean):
+def counts_to_relevance(df_counts):
+    """
+    Matrix form of dict_to_relevance: derives the relevance ratio of every row of a table
+    of evaluation status counts at once, with the same zero and NaN handling.
+
+    Parameters:
+    - df_counts (pandas.DataFrame): Counts of scope 3 categories, one row per group and one
+      column per evaluation status. Missing statuses are counted as 0.
+
+    Returns:
+    - pandas.Series: The relevance ratio of each row, 0 when the row sums to zero, when the
+      denominator is zero or when NaN values are encountered in the ratio terms.
+    """
+
+    def status_counts(status):
+        if status in df_counts.columns:
+            return df_counts[status].to_numpy(dtype=float)
+        return np.zeros(len(df_counts))
+
+    total = df_counts.to_numpy(dtype=float).sum(axis=1)
+    relevance_numerator = status_counts("Relevant, calculated") + status_counts(
+        "Not relevant, calculated"
+    )
+    relevance_denominator = sum(status_counts(status) for status in RELEVANCE_STATUSES)
+    is_valid = (
+        (total != 0)
+        & ~np.isnan(relevance_numerator)
+        & ~np.isnan(relevance_denominator)
+        & (relevance_denominator != 0)
+    )
+    relevance = np.divide(
+        relevance_numerator,
+        relevance_denominator,
+        out=np.zeros(len(df_counts)),
+        where=is_valid,
+    )
+    return pd.Series(relevance, index=df_counts.index)
+
+
+def scope_3_relevance(df_CF3, group_columns, col_evaluation):
+    """
+    Computes the relevance ratio of disclosed scope 3 (see dict_to_relevance) for every
+    group of a Scope 3 sheet at once, from a single crosstab of the groups against the
+    evaluation statuses.
+
+    Parameters:
+    - df_CF3 (pandas.DataFrame): The Scope 3 sheet, one row per scope 3 category.
+    - group_columns (list): Columns identifying a group (e.g. ["Account number"]).
+    - col_evaluation (str): The column containing the evaluation status of each category.
+
+    Returns:
+    - pandas.Series: The relevance ratio of each group, indexed by group_columns. Groups
+      without any evaluation status have a relevance of 0.
+    """
+    df_counts = pd.crosstab(
+        [df_CF3[col] for col in group_columns], df_CF3[col_evaluation]
+    )
+    groups = df_CF3.groupby(group_columns).size().index
+    return counts_to_relevance(df_counts).reindex(groups, fill_value=0.0)
+
+
+def join_sheets(df_left, sources, label=None):
+    """
+    Left joins several sheets on their keys in a single pass, with the result of the
+    equivalent chain of DataFrame.merge calls (row order, duplicated keys and column
+    suffixes included). Only the key columns and row positions are joined, each source
+    being looked up once, and the columns of every sheet are gathered at the end, so the
+    growing frame is never copied.
+
+    Parameters:
+    - df_left (pandas.DataFrame): The left DataFrame, containing the keys of every join.
+    - sources (list): (DataFrame, keys) pairs joined in order, each DataFrame holding its
+      keys and the columns to add.
+    - label (str or int, optional): Label of the printed join report (e.g. the year).
+      Defaults to None (no report).
+
+    Returns:
+    - pandas.DataFrame: The joined DataFrame, with a default index.
+    """
+    positions = {"left": np.arange(len(df_left))}
+    df_keys = df_left.reset_index(drop=True)
+    columns = [("left", col, col) for col in df_left.columns]
+    n_rows = [len(df_left)]
+    for i, (df_right, keys) in enumerate(sources):
+        keys = [keys] if isinstance(keys, str) else list(keys)
+        right_positions = _lookup_positions(df_keys[keys], df_right[keys])
+        if right_positions is None:
+            # Duplicated keys in the source: rows are expanded as merge does
+            df_rows = pd.merge(
+                df_keys[keys].assign(_left_position=np.arange(len(df_keys))),
+                df_right[keys].assign(_right_position=np.arange(len(df_right))),
+                on=keys,
+                how="left",
+            )
+            rows = df_rows["_left_position"].to_numpy()
+            right_positions = (
+                df_rows["_right_position"].fillna(-1).to_numpy(dtype="int64")
+            )
+            positions = {source: pos[rows] for source, pos in positions.items()}
+            df_keys = df_keys.iloc[rows].reset_index(drop=True)
+        positions[i] = right_positions
+        n_rows.append(len(right_positions))
+
+        # Overlapping columns are suffixed as merge does
+        names = {name for _, _, name in columns}
+        right_columns = [col for col in df_right.columns if col not in keys]
+        overlap = names.intersection(right_columns)
+        columns = [
+            (source, col, f"{name}_x" if name in overlap else name)
+            for source, col, name in columns
+        ]
+        columns += [
+            (i, col, f"{col}_y" if col in overlap else col) for col in right_columns
+        ]
+
+    dict_frames = {"left": df_left}
+    dict_frames.update({i: df_right for i, (df_right, _) in enumerate(sources)})
+    df_joined = pd.DataFrame(
+        {
+            name: pd.api.extensions.take(
+                dict_frames[source][col].array, positions[source], allow_fill=True
+            )
+            for source, col, name in columns
+        }
+    )
+    if label is not None:
+        chain_peak, join_peak = _join_peaks(df_joined, columns, n_rows)
+        print(
+            label,
+            f"- {len(sources)} joins in one pass ({max(len(sources) - 1, 0)} intermediate",
+            f"copies avoided), estimated peak memory {join_peak / 1e6:.1f} MB instead of",
+            f"{chain_peak / 1e6:.1f} MB ({1 - join_peak / max(chain_peak, 1):.0%} less)",
+        )
+    return df_joined
+
+
+def _lookup_positions(df_left_keys, df_right_keys):
+    # Positions of the left keys in a source with unique keys, None if keys are duplicated
+    if df_right_keys.duplicated().any():
+        return None
+    if list(df_left_keys.dtypes) != list(df_right_keys.dtypes):
+        df_left_keys = df_left_keys.astype(object)
+        df_right_keys = df_right_keys.astype(object)
+    if df_right_keys.shape[1] == 1:
+        index = pd.Index(df_right_keys.iloc[:, 0])
+        return index.get_indexer(df_left_keys.iloc[:, 0])
+    index = pd.MultiIndex.from_frame(df_right_keys)
+    return index.get_indexer(pd.MultiIndex.from_frame(df_left_keys))
+
+
+def _join_peaks(df_joined, columns, n_rows):
+    # Estimated peak bytes of a chain of merges, which holds the frames before and after
+    # each join, and of join_sheets, which holds the joined frame and the row positions
+    bytes_per_row = df_joined.memory_usage(index=False, deep=True) / max(
+        len(df_joined), 1
+    )
+    step_bytes = []
+    for step, rows in enumerate(n_rows):
+        sources = {"left"} | set(range(step))
+        step_bytes.append(
+            rows
+            * sum(
+                bytes_per_row[name] for source, _, name in columns if source in sources
+            )
+        )
+    chain_peak = max(
+        [before + after for before, after in zip(step_bytes, step_bytes[1:])]
+        or step_bytes
+    )
+    join_peak = step_bytes[-1] + 8 * len(df_joined) * len(n_rows)
+    return chain_peak, join_peak
+
+
+def attribute_CF3_to_last_year(df_clean, group_columns="account_id"):
     """
     Attributes NaN values to 'CDP_CF3' and 'CF3_relevance' columns in a DataFrame
     based on accounting year for each unique account ID except for the last year.
@@ -254,26 +879,20 @@ def attribute_CF3_to_last_year(df_clean):
     Parameters:
     - df_clean (pandas.DataFrame): A dataframe with 'account_id' and 'accounting_year', 'CDP_CF3' and 'CF3_relevance'
     columns, that need to be modified.
+    - group_columns (str or list, optional): Columns identifying an account, e.g.
+      ["questionnaire_year", "account_id"] for several stacked years. Defaults to "account_id".
 
     Returns:
     - pandas.DataFrame: Returns the modified DataFrame where for each account ID,
       all entries except those corresponding to the last accounting year are assigned
       NaN values in 'CDP_CF3' and 'CF3_relevance' columns.
     """
-    occurrences = df_clean.account_id.value_counts()
-    no_unique_corpo = df_clean[
-        df_clean.account_id.isin(occurrences[occurrences > 1].index)
-    ]
-    for idd in no_unique_corpo.account_id:
-        last_year = df_clean[df_clean.account_id == idd].accounting_year.max()
-        df_clean.loc[
-            (df_clean.accounting_year != last_year) & (df_clean.account_id == idd),
-            "CDP_CF3",
-        ] = np.nan
-        df_clean.loc[
-            (df_clean.accounting_year != last_year) & (df_clean.account_id == idd),
-            "CF3_relevance",
-        ] = np.nan
+    account_groups = df_clean.groupby(group_columns)["accounting_year"]
+    last_year = account_groups.transform("max")
+    is_not_last_year = (account_groups.transform("size") > 1) & (
+        df_clean.accounting_year != last_year
+    )
+    df_clean.loc[is_not_last_year, ["CDP_CF3", "CF3_relevance"]] = np.nan
     return df_clean
 
 
@@ -294,71 +913,92 @@ def keep_main_boundary(boundary):
         return np.nan
 
 
-def common_final_cleaning(df_clean):
+# Multiplier of the account_id in integer composite keys, larger than any year or row number
+COMPOSITE_KEY_FACTOR = 10000
+
+
+def composite_key(account_ids, values):
+    """
+    Builds an integer composite key from account ids and years (or row numbers), hashed and
+    compared much faster than "[account_id]_[value]" strings.
+
+    Parameters:
+    - account_ids (pandas.Series): The account ids, without missing values.
+    - values (pandas.Series): The second part of the key, integers lower than
+      COMPOSITE_KEY_FACTOR without missing values.
+
+    Returns:
+    - pandas.Series: Returns the int64 keys account_id * COMPOSITE_KEY_FACTOR + value.
+    """
+    return account_ids.astype("int64") * COMPOSITE_KEY_FACTOR + values.astype("int64")
+
+
+# Renaming of the sheets columns to the columns of the clean dataset
+FINAL_COLUMNS_RENAMES = {
+    "Country/Areas_x": "country",
+    "Primary activity_x": "activity",
+    "Primary sector_x": "sector",
+    "Primary industry_x": "industry",
+    "tickers": "ticker",
+    "Account number": "account_id",
+    "Organization": "account_name",
+    "Organization_x": "account_name",
+    "Country": "country",
+    "Primary activity": "activity",
+    "Primary sector": "sector",
+    "Primary industry": "industry",
+    "ISINs": "isin",
+    "Tickers": "ticker",
+    "C0.3_Select the countries/areas in which you operate.": "covered_countries",
+    "C0.5_Select the option that describes the reporting boundary for which climate-related impacts on your business are being reported. Note that this option should align with your consolidation approach to your Scope 1 and Scope 2 greenhouse gas inventory.": "boundary",
+    "C0.5_Select the option that describes the reporting boundary for which climate-related impacts on your business are being reported. Note that this option should align with your chosen approach for consolidating your GHG inventory.": "boundary",
+    "C0.3_Select the countries/regions for which you will be supplying data.": "covered_countries",
+    "C6.1_C1_What were your organization’s gross global Scope 1 emissions in metric tons CO2e? - Gross global Scope 1 emissions (metric tons CO2e)": "CDP_CF1",
+    "C6.3_C1_What were your organization’s gross global Scope 2 emissions in metric tons CO2e? - Scope 2, location-based": "CDP_CF2_location",
+    "C6.3_C2_What were your organization’s gross global Scope 2 emissions in metric tons CO2e? - Scope 2, market-based (if applicable)": "CDP_CF2_market",
+}
+# Columns of the clean dataset, before the unique_id key
+FINAL_COLUMNS = [
+    "account_id",
+    "account_name",
+    "country",
+    "activity",
+    "sector",
+    "industry",
+    "isin",
+    "ticker",
+    "accounting_year",
+    "boundary",
+    "covered_countries",
+    "CDP_CF1",
+    "CDP_CF2_location",
+    "CDP_CF2_market",
+    "CDP_CF3",
+    "CF3_relevance",
+]
+
+
+def common_final_cleaning(df_clean, extra_columns=()):
     """
     Performs columns filtering and final cleaning on a DataFrame.
 
     Parameters:
     - df_clean (pandas.DataFrame): The input DataFrame containing various columns.
+    - extra_columns (list, optional): Columns kept after the final columns, e.g.
+      questionnaire_year for several stacked years. Defaults to ().
 
     Returns:
     - pandas.DataFrame: Returns a modified DataFrame after performing specific cleaning operations.
     """
     # Final formating (columns renaming and filtering)
-    df_clean = df_clean.rename(
-        columns={
-            "Country/Areas_x": "country",
-            "Primary activity_x": "activity",
-            "Primary sector_x": "sector",
-            "Primary industry_x": "industry",
-            "tickers": "ticker",
-            "Account number": "account_id",
-            "Organization": "account_name",
-            "Organization_x": "account_name",
-            "Country": "country",
-            "Primary activity": "activity",
-            "Primary sector": "sector",
-            "Primary industry": "industry",
-            "ISINs": "isin",
-            "Tickers": "ticker",
-            "C0.3_Select the countries/areas in which you operate.": "covered_countries",
-            "C0.5_Select the option that describes the reporting boundary for which climate-related impacts on your business are being reported. Note that this option should align with your consolidation approach to your Scope 1 and Scope 2 greenhouse gas inventory.": "boundary",
-            "C0.5_Select the option that describes the reporting boundary for which climate-related impacts on your business are being reported. Note that this option should align with your chosen approach for consolidating your GHG inventory.": "boundary",
-            "C0.3_Select the countries/regions for which you will be supplying data.": "covered_countries",
-            "C6.1_C1_What were your organization’s gross global Scope 1 emissions in metric tons CO2e? - Gross global Scope 1 emissions (metric tons CO2e)": "CDP_CF1",
-            "C6.3_C1_What were your organization’s gross global Scope 2 emissions in metric tons CO2e? - Scope 2, location-based": "CDP_CF2_location",
-            "C6.3_C2_What were your organization’s gross global Scope 2 emissions in metric tons CO2e? - Scope 2, market-based (if applicable)": "CDP_CF2_market",
-        }
-        
-    )
-    df_clean = df_clean[
-        [
-            "account_id",
-            "account_name",
-            "country",
-            "activity",
-            "sector",
-            "industry",
-            "isin",
-            "ticker",
-            "accounting_year",
-            "boundary",
-            "covered_countries",
-            "CDP_CF1",
-            "CDP_CF2_location",
-            "CDP_CF2_market",
-            "CDP_CF3",
-            "CF3_relevance",
-        ]
-    ]
-    df_clean["unique_id"] = (
-        df_clean["account_id"].astype(str)
-        + "_"
-        + df_clean["accounting_year"].astype(int).astype(str)
-    )
+    df_clean = df_clean.rename(columns=FINAL_COLUMNS_RENAMES)
+    df_clean = df_clean[FINAL_COLUMNS + list(extra_columns)]
 
     # Final cleaning
     df_clean = df_clean.dropna(subset=["account_id", "accounting_year"])
+    df_clean["unique_id"] = composite_key(
+        df_clean["account_id"], df_clean["accounting_year"]
+    )
     df_clean["boundary"] = df_clean["boundary"].apply(keep_main_boundary)
     for col in ["CDP_CF2_location", "CDP_CF2_market"]:
         df_clean[col] = (
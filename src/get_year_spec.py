@@ -0,0 +1,366 @@
+import numpy as np
+import pandas as pd
+
+
+from src.corrections import apply_corrections, load_corrections
+from src.get_year import GetGivenYear
+from src.get_year_functions import (
+    get_raw_file_path,
+    load_useful_sheets,
+    preprocess_accounting_years,
+    scope_3_relevance,
+    attribute_CF3_to_last_year,
+    common_final_cleaning,
+    join_sheets,
+    FINAL_COLUMNS,
+    FINAL_COLUMNS_RENAMES,
+    stream_scope_3,
+)
+
+
+class GetYear(GetGivenYear):
+    """
+    Creates the clean dataset of a C-format questionnaire year (2018 onwards) from its
+    YearSpec (src/year_specs.py).
+
+    This class is based on abstract class GetGivenYear.
+    Every year goes through the same pipeline: the accounting years of C0.2 are joined in
+    a single pass with the accounts, boundary, countries, Scope 1, Scope 2 and Scope 3
+    sheets, then the corrections table of the year and the treatments described by the
+    spec are applied before the common final cleaning.
+    The get_year_dataset method can be used to get the clean dataset.
+    """
+
+    def __init__(self, spec, **read_options):
+        super().__init__(**read_options)
+        self.spec = spec
+
+    @property
+    def col_CF3_metric(self):
+        return self.spec.col_CF3_metric
+
+    @property
+    def col_CF3_evaluation(self):
+        return self.spec.col_CF3_evaluation
+
+    def get_useful_sheets(self, path_raw_data):
+        """
+        Loads the sheets of the year, as a dictionary of DataFrames by sheet name.
+        """
+        sheets = load_useful_sheets(self.spec.year, path_raw_data, **self.read_options)
+        return dict(zip(self.spec.useful_sheets, sheets))
+
+    def get_all_accounting_year(self, df_years):
+        return preprocess_accounting_years(df_years)
+
+    def get_scopes_3(self, df_CF3):
+        if self.spec.CF3_not_applicable_as_zero:
+            df_CF3[self.col_CF3_metric] = (
+                df_CF3[self.col_CF3_metric]
+                .replace("Question not applicable", 0)
+                .astype(float)
+            )
+        df_CF3_calc = (
+            df_CF3.groupby("Account number")[self.col_CF3_metric]
+            .sum()
+            .to_frame("CDP_CF3")
+        )
+        df_CF3_calc["CF3_relevance"] = scope_3_relevance(
+            df_CF3, ["Account number"], self.col_CF3_evaluation
+        )
+        return df_CF3_calc
+
+    def stream_scopes_3(self, path_raw_data):
+        df_CF3_calc = stream_scope_3(
+            get_raw_file_path(self.spec.year, path_raw_data),
+            self.spec.CF3_sheet,
+            ["Account number"],
+            self.col_CF3_metric,
+            self.col_CF3_evaluation,
+        )
+        df_CF3_calc["CF3_relevance"] = df_CF3_calc["CF3_relevance"].fillna(0)
+        return df_CF3_calc
+
+    def get_account_sources(self, dict_sheets):
+        """
+        Lists the (DataFrame, keys) pairs of the accounts sheets, in join order: accounts,
+        boundary and covered countries.
+        """
+        spec = self.spec
+        df_base = dict_sheets[spec.base_sheet]
+        if not spec.join_base_sheet:
+            df_base = df_base[spec.useful_sheets[spec.base_sheet]]
+        sources = [(df_base, "Account number")]
+        if spec.boundary_sheet:
+            df_boundaries = dict_sheets[spec.boundary_sheet]
+            sources.append(
+                (df_boundaries[["Account number", spec.col_boundary]], "Account number")
+            )
+        if spec.countries_sheet:
+            df_countries = dict_sheets[spec.countries_sheet]
+            sources.append(
+                (df_countries[["Account number", spec.col_countries]], "Account number")
+            )
+        return sources
+
+    def get_emissions_sources(self, dict_sheets, df_CF3_calc):
+        """
+        Lists the (DataFrame, keys) pairs of the emissions sheets, in join order: Scope 1,
+        Scope 2 and Scope 3.
+        """
+        spec = self.spec
+        df_CF1 = dict_sheets[spec.CF1_sheet]
+        df_CF2 = dict_sheets[spec.CF2_sheet]
+        return [
+            (
+                df_CF1[["Account number", "Row", spec.col_CF1]],
+                ["Account number", "Row"],
+            ),
+            (
+                df_CF2[
+                    [
+                        "Account number",
+                        "Row",
+                        spec.col_CF2_location,
+                        spec.col_CF2_market,
+                    ]
+                ],
+                ["Account number", "Row"],
+            ),
+            (
+                df_CF3_calc.reset_index()[
+                    ["Account number", "CDP_CF3", "CF3_relevance"]
+                ],
+                "Account number",
+            ),
+        ]
+
+    def get_join_sources(self, dict_sheets, df_CF3_calc):
+        """
+        Lists the (DataFrame, keys) pairs joined to the accounting years, in order:
+        accounts, boundary, covered countries, Scope 1, Scope 2 and Scope 3.
+        """
+        return self.get_account_sources(dict_sheets) + self.get_emissions_sources(
+            dict_sheets, df_CF3_calc
+        )
+
+    def get_year_dataset(self, path_raw_data, sheets=None):
+        spec = self.spec
+        dict_sheets = (
+            self.get_useful_sheets(path_raw_data) if sheets is None else sheets
+        )
+        df_years_filtered = self.get_all_accounting_year(dict_sheets[spec.years_sheet])
+        df_CF3_calc = self.compute_scopes_3(dict_sheets[spec.CF3_sheet], path_raw_data)
+
+        # Merging part
+        df_clean = join_sheets(
+            df_years_filtered,
+            self.get_join_sources(dict_sheets, df_CF3_calc),
+            label=spec.year,
+        )
+
+        # Year specific treatments
+        df_clean = apply_corrections(
+            df_clean,
+            load_corrections(spec.year),
+            keys={"account_id": "Account number", "row": "Row"},
+        )
+        df_clean = df_clean.rename(columns=spec.renames)
+        for col in spec.missing_columns:
+            df_clean[col] = np.nan
+
+        df_clean = common_final_cleaning(df_clean)
+        if spec.attribute_CF3_to_last_year:
+            df_clean = attribute_CF3_to_last_year(df_clean)
+        return df_clean
+
+
+class GetStackedYears:
+    """
+    Creates the clean datasets of several C-format questionnaire years at once, with the
+    results of GetYear.
+
+    The workbooks are still read and their accounts sheets joined year by year, since
+    their columns differ between questionnaires. The accounts are then aligned on the
+    columns of the clean dataset and stacked with a questionnaire_year key, so that the
+    Scope 1, Scope 2 and Scope 3 joins, the Scope 3 aggregation, the final cleaning and
+    the Scope 3 attribution run once over all the years instead of once per year.
+    Years with a corrections table are built by GetYear on their own, since corrected
+    values are cast to the dtypes of the year.
+    The get_years_dataset method can be used to get the clean datasets.
+    """
+
+    def __init__(self, specs, **read_options):
+        self.specs = list(specs)
+        self.read_options = read_options
+        self.dict_year_getters = {
+            spec.year: GetYear(spec, **read_options) for spec in self.specs
+        }
+
+    @staticmethod
+    def align_accounts(spec, df_accounts):
+        """
+        Applies the renames and missing columns of a year to its joined accounts sheets and
+        keeps the columns of the clean dataset, the Row key and the questionnaire_year key.
+        """
+        df_accounts = df_accounts.rename(columns=spec.renames)
+        for col in spec.missing_columns:
+            df_accounts[col] = np.nan
+        df_accounts = df_accounts.rename(
+            columns={
+                **FINAL_COLUMNS_RENAMES,
+                spec.col_boundary: "boundary",
+                spec.col_countries: "covered_countries",
+            }
+        )
+        columns = [col for col in FINAL_COLUMNS if col in df_accounts.columns]
+        return df_accounts[columns + ["Row"]].assign(questionnaire_year=spec.year)
+
+    def stack_scopes_3(self, specs, dict_CF3, path_raw_data):
+        """
+        Aggregates the Scope 3 emissions and relevance of every year at once, indexed by
+        questionnaire_year and account_id. With the stream_scope_3 read option, the sheets
+        are streamed year by year and their results stacked.
+        """
+        if self.read_options.get("stream_scope_3"):
+            return pd.concat(
+                {
+                    spec.year: self.dict_year_getters[spec.year].stream_scopes_3(
+                        path_raw_data
+                    )
+                    for spec in specs
+                },
+                names=["questionnaire_year", "account_id"],
+            )
+
+        df_CF3 = pd.concat(
+            [
+                dict_CF3[spec.year][
+                    ["Account number", spec.col_CF3_evaluation, spec.col_CF3_metric]
+                ]
+                .set_axis(["account_id", "CF3_evaluation", "CF3_metric"], axis=1)
+                .assign(questionnaire_year=spec.year)
+                for spec in specs
+            ],
+            ignore_index=True,
+        )
+        not_applicable_years = [
+            spec.year for spec in specs if spec.CF3_not_applicable_as_zero
+        ]
+        is_not_applicable = df_CF3["questionnaire_year"].isin(not_applicable_years) & (
+            df_CF3["CF3_metric"] == "Question not applicable"
+        )
+        df_CF3["CF3_metric"] = (
+            df_CF3["CF3_metric"].mask(is_not_applicable, 0).astype(float)
+        )
+        group_columns = ["questionnaire_year", "account_id"]
+        df_CF3_calc = (
+            df_CF3.groupby(group_columns)["CF3_metric"].sum().to_frame("CDP_CF3")
+        )
+        df_CF3_calc["CF3_relevance"] = scope_3_relevance(
+            df_CF3, group_columns, "CF3_evaluation"
+        )
+        return df_CF3_calc
+
+    def get_stacked_dataset(self, specs, path_raw_data):
+        """
+        Creates the clean datasets of years without corrections from their stacked sheets.
+
+        Parameters:
+        - specs (list): The YearSpecs of the years.
+        - path_raw_data (str): Path to the raw data directory.
+
+        Returns:
+        - dict: The clean dataset of every year.
+        """
+        lst_accounts, lst_CF1, lst_CF2, dict_CF3 = [], [], [], {}
+        for spec in specs:
+            getter = self.dict_year_getters[spec.year]
+            dict_sheets = getter.get_useful_sheets(path_raw_data)
+            df_years_filtered = getter.get_all_accounting_year(
+                dict_sheets[spec.years_sheet]
+            )
+            df_accounts = join_sheets(
+                df_years_filtered, getter.get_account_sources(dict_sheets)
+            )
+            lst_accounts.append(self.align_accounts(spec, df_accounts))
+            df_CF1 = dict_sheets[spec.CF1_sheet]
+            lst_CF1.append(
+                df_CF1[["Account number", "Row", spec.col_CF1]]
+                .set_axis(["account_id", "Row", "CDP_CF1"], axis=1)
+                .assign(questionnaire_year=spec.year)
+            )
+            df_CF2 = dict_sheets[spec.CF2_sheet]
+            lst_CF2.append(
+                df_CF2[
+                    [
+                        "Account number",
+                        "Row",
+                        spec.col_CF2_location,
+                        spec.col_CF2_market,
+                    ]
+                ]
+                .set_axis(
+                    ["account_id", "Row", "CDP_CF2_location", "CDP_CF2_market"],
+                    axis=1,
+                )
+                .assign(questionnaire_year=spec.year)
+            )
+            dict_CF3[spec.year] = dict_sheets[spec.CF3_sheet]
+
+        # Merging part, once for all the years
+        keys = ["questionnaire_year", "account_id", "Row"]
+        df_CF3_calc = self.stack_scopes_3(specs, dict_CF3, path_raw_data)
+        df_clean = join_sheets(
+            pd.concat(lst_accounts, ignore_index=True),
+            [
+                (pd.concat(lst_CF1, ignore_index=True), keys),
+                (pd.concat(lst_CF2, ignore_index=True), keys),
+                (df_CF3_calc.reset_index(), ["questionnaire_year", "account_id"]),
+            ],
+            label=", ".join(str(spec.year) for spec in specs),
+        )
+
+        # Year specific treatments, once for all the years
+        df_clean = common_final_cleaning(df_clean, extra_columns=["questionnaire_year"])
+        attributed_years = [
+            spec.year for spec in specs if spec.attribute_CF3_to_last_year
+        ]
+        is_attributed = df_clean["questionnaire_year"].isin(attributed_years)
+        df_attributed = attribute_CF3_to_last_year(
+            df_clean[is_attributed].copy(), ["questionnaire_year", "account_id"]
+        )
+        df_clean.loc[is_attributed, ["CDP_CF3", "CF3_relevance"]] = df_attributed[
+            ["CDP_CF3", "CF3_relevance"]
+        ]
+
+        # The stacked dataset is split back into years, with the dtypes of each year
+        dict_df_years = {}
+        for spec in specs:
+            df_year = df_clean[df_clean["questionnaire_year"] == spec.year]
+            df_year = df_year.drop(columns="questionnaire_year").reset_index(drop=True)
+            df_year = df_year.infer_objects()
+            for col in spec.missing_columns:
+                df_year[FINAL_COLUMNS_RENAMES.get(col, col)] = np.nan
+            dict_df_years[spec.year] = df_year
+        return dict_df_years
+
+    def get_years_dataset(self, path_raw_data):
+        """
+        Creates the clean datasets of the years.
+
+        Parameters:
+        - path_raw_data (str): Path to the raw data directory.
+
+        Returns:
+        - dict: The clean dataset of every year, identical to GetYear.get_year_dataset.
+        """
+        dict_df_years = {
+            spec.year: self.dict_year_getters[spec.year].get_year_dataset(path_raw_data)
+            for spec in self.specs
+            if len(load_corrections(spec.year))
+        }
+        stacked_specs = [spec for spec in self.specs if spec.year not in dict_df_years]
+        if stacked_specs:
+            dict_df_years.update(self.get_stacked_dataset(stacked_specs, path_raw_data))
+        return {spec.year: dict_df_years[spec.year] for spec in self.specs}
@@ -4,102 +4,498 @@ import os
 import pandas as pd
 
 
+from concurrent.futures import ProcessPoolExecutor
+
+
 from src.get_2015 import Get2015
 from src.get_2016 import Get2016
 from src.get_2017 import Get2017
-from src.get_2018 import Get2018
-from src.get_2019 import Get2019
-from src.get_2020 import Get2020
-from src.get_2021 import Get2021
-from src.get_2022 import Get2022
-from src.get_2023 import Get2023
-from src.utils import handle_duplicates, missing_value_imputation, clean_country_names
+from src.get_year_spec import GetYear, GetStackedYears
+from src.get_year_functions import composite_key, get_raw_file_path
+from src.corrections import corrections_path
+from src.countries import PATH_COUNTRIES
+from src.year_specs import YEAR_SPECS
+from src.cache import (
+    clean_year_fingerprint,
+    load_clean_year,
+    save_clean_year,
+    sources_sha256,
+    load_panel_state,
+    save_panel_state,
+)
+from src.pipeline import Pipeline
+from src.schema import apply_schema, memory_report
+from src.utils import (
+    handle_duplicates,
+    missing_value_imputation,
+    update_duplicates_and_imputation,
+    clean_country_names,
+    format_covered_countries,
+    unique_id_to_string,
+    save_dataset,
+    load_dataset,
+    dataset_file_path,
+    DATASET_COMPRESSIONS,
+)
+
+# Modules shared by every year pipeline, part of the cleaned years fingerprint
+YEAR_PIPELINE_MODULES = [
+    "src.corrections",
+    "src.get_year",
+    "src.get_year_functions",
+    "src.sheets_manifest",
+    "src.schema",
+    "src.year_specs",
+]
+# Modules deduplicating and imputing the concatenated panel, part of the panel state
+PANEL_MODULES = ["src.utils"]
+# Parameters of clean_CDP_year, the other ones being read options of the year classes
+CLEAN_YEAR_PARAMETERS = (
+    "path_raw_data",
+    "path_clean_data",
+    "save_years",
+    "path_cache_data",
+    "save_compression",
+    "emissions_dtype",
+)
+
+
+def get_year_class(year, **read_options):
+    """
+    Gets the object creating the clean dataset of a given year.
+
+    Parameters:
+    - year (int): The questionnaire year.
+    - **read_options: Options of the year class (e.g. path_cache_data or stream_scope_3).
+
+    Returns:
+    - GetGivenYear or None: The year object, None if the year is not supported.
+    """
+    dict_legacy_years = {2015: Get2015, 2016: Get2016, 2017: Get2017}
+    if year in dict_legacy_years:
+        return dict_legacy_years[year](**read_options)
+    if year in YEAR_SPECS:
+        return GetYear(YEAR_SPECS[year], **read_options)
+    return None
 
 
-def clean_CDP_year(path_raw_data, path_clean_data, year, save_years):
+def print_unsupported_year(year):
+    """
+    Reports a year without year class, which is left out of the clean dataset.
+    """
+    print(
+        year,
+        " is not in predifined classes, please add its YearSpec to src/year_specs.py.",
+    )
+
+
+def find_saved_clean_year(year, path_raw_data, path_clean_data):
+    """
+    Finds the previously saved cleaned dataset of a year whose raw workbook is missing,
+    loaded instead of creating the dataset.
+
+    Parameters:
+    - year (int): The questionnaire year.
+    - path_raw_data (str): The path to the directory where raw datasets are stored.
+    - path_clean_data (str): The path to the directory where cleaned datasets are saved.
+
+    Returns:
+    - tuple or None: (file path without extension, save format, compression) of the saved
+      dataset (see load_dataset), None if the raw workbook exists or no cleaned dataset was
+      saved.
+    """
+    if os.path.exists(get_raw_file_path(year, path_raw_data)):
+        return None
+    file_path = os.path.join(path_clean_data, f"cdp_clean_{year}")
+    candidates = [("parquet", None), ("feather", None), ("xlsx", None), ("csv", None)]
+    candidates += [("csv", codec) for codec in DATASET_COMPRESSIONS["csv"]]
+    for save_format, compression in candidates:
+        if os.path.exists(dataset_file_path(file_path, save_format, compression)):
+            return file_path, save_format, compression
+    return None
+
+
+def load_saved_clean_year(
+    file_path, save_format, compression=None, emissions_dtype="float64", label=None
+):
+    """
+    Loads a cleaned year saved by save_years (see find_saved_clean_year) in the format of
+    the years cleaned now, so that they can be concatenated and deduplicated together:
+    unique_id is rebuilt as the integer composite key, older files storing
+    "[account_id]_[accounting_year]" strings, and the output schema is applied.
+
+    Parameters:
+    - file_path (str): Path of the saved dataset, without extension.
+    - save_format (str): "csv", "xlsx", "parquet" or "feather".
+    - compression (str, optional): Compression codec of CSV files. Defaults to None.
+    - emissions_dtype (str, optional): The dtype of emissions columns. Defaults to "float64".
+    - label (optional): Prefix of the coerced emissions report, e.g. the year.
+
+    Returns:
+    - pandas.DataFrame: Returns the cleaned dataset of the year.
+    """
+    df_year_clean = load_dataset(file_path, save_format, compression=compression)
+    if {"unique_id", "account_id", "accounting_year"} <= set(df_year_clean.columns):
+        df_year_clean["unique_id"] = composite_key(
+            df_year_clean["account_id"], df_year_clean["accounting_year"]
+        )
+    return apply_schema(df_year_clean, emissions_dtype, label=label)
+
+
+def get_clean_year_fingerprint(
+    year, path_raw_data, emissions_dtype="float64", **read_options
+):
+    """
+    Computes the fingerprint of the clean dataset of a given year (see
+    clean_year_fingerprint).
+
+    Parameters:
+    - year (int): The questionnaire year.
+    - path_raw_data (str): The path to the directory where raw datasets are stored.
+    - emissions_dtype (str, optional): The dtype of emissions columns. Defaults to "float64".
+    - **read_options: Options of the year class (e.g. stream_scope_3 or engine).
+
+    Returns:
+    - str or None: The fingerprint, None if the year is not supported or its raw workbook
+      is missing.
+    """
+    year_class = get_year_class(year)
+    raw_file_path = get_raw_file_path(year, path_raw_data)
+    if year_class is None or not os.path.exists(raw_file_path):
+        return None
+    return clean_year_fingerprint(
+        raw_file_path,
+        [type(year_class).__module__] + YEAR_PIPELINE_MODULES,
+        # The number of sheet workers changes how sheets are parsed, not the dataset
+        options={
+            **{
+                option: value
+                for option, value in read_options.items()
+                if option != "sheet_workers"
+            },
+            "emissions_dtype": emissions_dtype,
+        },
+        data_files=[corrections_path(year)],
+    )
+
+
+def clean_CDP_year(
+    path_raw_data,
+    path_clean_data,
+    year,
+    save_years,
+    path_cache_data=None,
+    rebuild=False,
+    save_compression=None,
+    emissions_dtype="float64",
+    year_dataset=None,
+    cache_only=False,
+    **read_options,
+):
     """
     Loads or creates the clean CDP dataset for a given year.
 
+    Cleaned years are cached in a binary format under [path_cache_data]/clean_years.
+    A cached dataset is reused only if its fingerprint (raw workbook hash, source code of
+    the year pipeline and pandas version) is unchanged, and every hit or miss is recorded
+    in the cache manifest.
+    Without raw workbook, a previously saved cleaned dataset is loaded instead, and a
+    FileNotFoundError is raised if there is none.
+
     Parameters:
     - path_raw_data (str): The path to the directory where raw datasets are stored.
     - path_clean_data (str): The path to the directory where cleaned datasets are stored.
     - year (int): The specific year for which the dataset is being processed.
     - save_years (str): Flag indicating whether to save the cleaned dataset for the specific year.
-      If "csv" or "xlsx", saves the file in CSV or EXCEL format.
+      If "csv", "xlsx", "parquet" or "feather", saves the file in this format.
+    - path_cache_data (str, optional): Path to the directory where parsed raw sheets and
+      cleaned years are cached. Defaults to None (raw sheets are not cached and cleaned
+      years are cached in path_clean_data).
+    - rebuild (bool, optional): If True, ignores the cached dataset and rebuilds it.
+      Defaults to False.
+    - save_compression (str, optional): Compression codec of the saved dataset (see
+      save_dataset). Defaults to None.
+    - emissions_dtype (str, optional): "float32" or "float64", the dtype of emissions columns
+      in the output schema (see apply_schema). Defaults to "float64".
+    - year_dataset (pandas.DataFrame, optional): The year dataset already created (e.g. by
+      GetStackedYears), used instead of creating it from the raw data. Defaults to None.
+    - cache_only (bool, optional): If True, returns None instead of creating the dataset
+      when it is not cached. Defaults to False.
+    - **read_options: Additional options forwarded to load_useful_sheets
+      (e.g. stream_scope_3=True or engine="calamine").
 
     Returns:
     - pandas.DataFrame: Returns the cleaned dataset for the specified year as a DataFrame.
       If the dataset is successfully loaded or created, returns the DataFrame. If the year is not present
       in predefined classes returns an empty DataFrame.
     """
-    try:
-        print(year, "- trying to load pre cleaned dataset")
-        df_year_clean = pd.read_excel(
-            os.path.join(path_clean_data, f"cdp_clean_{year}.xlsx")
+    year_class = get_year_class(year, path_cache_data=path_cache_data, **read_options)
+    if year_class is None:
+        print_unsupported_year(year)
+        df_empty = pd.DataFrame(
+            [],
+            columns=[
+                "account_id",
+                "account_name",
+                "country",
+                "activity",
+                "sector",
+                "industry",
+                "isin",
+                "ticker",
+                "accounting_year",
+                "boundary",
+                "covered_countries",
+                "CDP_CF1",
+                "CDP_CF2_location",
+                "CDP_CF2_market",
+                "CDP_CF3",
+                "CF3_relevance",
+                "unique_id",
+                "questionnaire_year",
+            ],
         )
-        print(year, "- pre cleaned dataset successfully loaded")
+        return df_empty
 
-    except FileNotFoundError:
-        print(year, "- loading of pre cleaned dataset failed, reconstructing it")
-        dict_year_to_func = {
-            2015: Get2015(),
-            2016: Get2016(),
-            2017: Get2017(),
-            2018: Get2018(),
-            2019: Get2019(),
-            2020: Get2020(),
-            2021: Get2021(),
-            2022: Get2022(),
-            2023: Get2023(),
-        }
-        try:
-            df_year_clean = dict_year_to_func[year].get_year_dataset(path_raw_data)
-
-        except KeyError:
-            print(year, " is not in predifined classes, please implement a new one.")
-            df_empty = pd.DataFrame(
-                [],
-                columns=[
-                    "account_id",
-                    "account_name",
-                    "country",
-                    "activity",
-                    "sector",
-                    "industry",
-                    "isin",
-                    "ticker",
-                    "accounting_year",
-                    "boundary",
-                    "covered_countries",
-                    "CDP_CF1",
-                    "CDP_CF2_location",
-                    "CDP_CF2_market",
-                    "CDP_CF3",
-                    "CF3_relevance",
-                    "unique_id",
-                    "questionnaire_year",
-                ],
-            )
-            return df_empty
+    path_year_cache = path_cache_data or path_clean_data
+    raw_file_path = get_raw_file_path(year, path_raw_data)
+    saved_clean_year = find_saved_clean_year(year, path_raw_data, path_clean_data)
+    if saved_clean_year is not None:
+        # Without raw data, fall back on a previously saved cleaned dataset
+        file_path, save_format, compression = saved_clean_year
+        print(
+            year,
+            "- raw data not found, loading",
+            dataset_file_path(file_path, save_format, compression),
+        )
+        return load_saved_clean_year(
+            file_path, save_format, compression, emissions_dtype, label=year
+        )
+
+    fingerprint = get_clean_year_fingerprint(
+        year, path_raw_data, emissions_dtype, **read_options
+    )
+    if fingerprint is None:
+        # Nothing to look up in the cache without the raw workbook
+        raise FileNotFoundError(
+            f"{year} - no raw data ({raw_file_path}) nor saved cleaned dataset"
+        )
+    print(year, "- trying to load pre cleaned dataset")
+    df_year_clean = None
+    if not rebuild:
+        df_year_clean = load_clean_year(path_year_cache, year, fingerprint)
+
+    if df_year_clean is not None:
+        print(year, "- pre cleaned dataset successfully loaded")
+    elif cache_only:
+        return None
+    else:
+        print(year, "- no up to date pre cleaned dataset, reconstructing it")
+        if year_dataset is not None:
+            df_year_raw = year_dataset
+        else:
+            df_year_raw = year_class.get_year_dataset(path_raw_data)
+        df_year_raw["questionnaire_year"] = year
+        df_year_clean = apply_schema(df_year_raw, emissions_dtype, label=year)
+        print(year, "- memory usage of the output schema (bytes):")
+        print(memory_report(df_year_raw, df_year_clean))
+        save_clean_year(path_year_cache, year, fingerprint, df_year_clean)
 
-        df_year_clean["questionnaire_year"] = year
         if save_years:
-            file_path = os.path.join(path_clean_data, f"cdp_clean_{year}.{save_years}")
-            dict_attr = {"csv": "csv", "xlsx": "excel"}
-            getattr(df_year_clean, f"to_{dict_attr[save_years]}")(
-                file_path, index=False
+            save_dataset(
+                df_year_clean,
+                os.path.join(path_clean_data, f"cdp_clean_{year}"),
+                save_years,
+                compression=save_compression,
             )
             print("Saving cleaned dataset: Done")
 
     return df_year_clean
 
 
+def clean_CDP_years(years, workers=1, stack_years=False, **kwargs):
+    """
+    Loads or creates the clean CDP datasets of several years, possibly in parallel.
+
+    Parameters:
+    - years (list): The years to process.
+    - workers (int, optional): Number of worker processes. Years are processed one after
+      another in the current process if workers <= 1. Defaults to 1.
+    - stack_years (bool, optional): If True, the C-format years (2018 onwards) missing from
+      the cache are created at once from their stacked sheets (see GetStackedYears), in the
+      current process. The datasets are identical to the ones created year by year.
+      Defaults to False.
+    - **kwargs: Keyword arguments forwarded to clean_CDP_year (path_raw_data,
+      path_clean_data, save_years, path_cache_data, rebuild and read options). rebuild may
+      be a boolean or a list of years.
+
+    Returns:
+    - list: The cleaned datasets, in the order of the given years. If the cleaning of some
+      years fails, every failure is reported and a RuntimeError is raised once all the other
+      years are done.
+    """
+    rebuild = kwargs.pop("rebuild", False)
+
+    def year_kwargs(year):
+        year_rebuild = rebuild is True or year in (rebuild or [])
+        return dict(kwargs, year=year, rebuild=year_rebuild)
+
+    if stack_years:
+        stacked_years = [year for year in years if year in YEAR_SPECS]
+        dict_df_years = {
+            year: clean_CDP_year(**year_kwargs(year), cache_only=True)
+            for year in stacked_years
+        }
+        missing_years = [year for year in stacked_years if dict_df_years[year] is None]
+        if missing_years:
+            read_options = {
+                option: value
+                for option, value in kwargs.items()
+                if option not in CLEAN_YEAR_PARAMETERS
+            }
+            dict_datasets = GetStackedYears(
+                [YEAR_SPECS[year] for year in missing_years],
+                path_cache_data=kwargs.get("path_cache_data"),
+                **read_options,
+            ).get_years_dataset(kwargs["path_raw_data"])
+            for year in missing_years:
+                dict_df_years[year] = clean_CDP_year(
+                    **dict(year_kwargs(year), rebuild=True),
+                    year_dataset=dict_datasets[year],
+                )
+        other_years = [year for year in years if year not in dict_df_years]
+        dict_df_years.update(
+            zip(
+                other_years,
+                clean_CDP_years(
+                    other_years, workers=workers, rebuild=rebuild, **kwargs
+                ),
+            )
+        )
+        return [dict_df_years[year] for year in years]
+
+    if workers is None or workers <= 1:
+        return [clean_CDP_year(**year_kwargs(year)) for year in years]
+
+    dict_errors = {}
+    lst_df_years = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        dict_futures = {
+            year: executor.submit(clean_CDP_year, **year_kwargs(year)) for year in years
+        }
+        for year, future in dict_futures.items():
+            try:
+                lst_df_years.append(future.result())
+            except Exception as e:
+                print(year, "- cleaning failed:", repr(e))
+                dict_errors[year] = e
+
+    if dict_errors:
+        first_error = next(iter(dict_errors.values()))
+        raise RuntimeError(
+            f"Cleaning failed for years {list(dict_errors)}"
+        ) from first_error
+    return lst_df_years
+
+
+def load_incremental_panel(path_cache_data, dict_fingerprints):
+    """
+    Loads the panel state stored by a previous incremental build, if new years can be added
+    to it with the result of a full rebuild: the panel must have been built by the current
+    code, from years which are all requested and unchanged, and every new year must be
+    later than the years of the panel. Years without fingerprint (e.g. loaded from a saved
+    cleaned dataset, without raw workbook) cannot be compared and count as changed.
+
+    Parameters:
+    - path_cache_data (str): Path to the cache directory.
+    - dict_fingerprints (dict): Current fingerprint of each requested year (see
+      get_clean_year_fingerprint).
+
+    Returns:
+    - tuple or None: (years of the panel, deduplicated panel, imputed panel), None if the
+      panel has to be fully rebuilt.
+    """
+    panel_state = load_panel_state(path_cache_data)
+    if panel_state is None:
+        print("Incremental build: no panel state found, full build")
+        return None
+    state, df_deduplicated, df_imputed = panel_state
+    panel_fingerprints = {int(year): value for year, value in state["years"].items()}
+    new_years = [year for year in dict_fingerprints if year not in panel_fingerprints]
+    if state["sources"] != sources_sha256(PANEL_MODULES) or state["pandas"] != (
+        pd.__version__
+    ):
+        reason = "the panel code changed"
+    elif not set(panel_fingerprints) <= set(dict_fingerprints):
+        reason = "some years of the panel are not requested"
+    elif any(
+        value is None or dict_fingerprints[year] != value
+        for year, value in panel_fingerprints.items()
+    ):
+        reason = "some years of the panel changed"
+    elif new_years and min(new_years) <= max(panel_fingerprints):
+        reason = "some new years are not later than the panel"
+    else:
+        print(
+            "Incremental build: adding years",
+            new_years,
+            "to the panel of years",
+            list(panel_fingerprints),
+        )
+        return list(panel_fingerprints), df_deduplicated, df_imputed
+    print(f"Incremental build: {reason}, full build")
+    return None
+
+
+def format_clean_dataset(
+    df_cdp_clean,
+    emissions_dtype="float64",
+    covered_countries_format="json",
+    string_unique_id=False,
+):
+    """
+    Applies the output schema and formats to the cleaned concatenated dataset.
+
+    Parameters:
+    - df_cdp_clean (pandas.DataFrame): The cleaned concatenated dataset.
+    - emissions_dtype (str, optional): The dtype of emissions columns (see apply_schema).
+      Defaults to "float64".
+    - covered_countries_format (str, optional): Storage of the covered countries (see
+      format_covered_countries). Defaults to "json".
+    - string_unique_id (bool, optional): If True, unique_id is exported as strings (see
+      unique_id_to_string). Defaults to False.
+
+    Returns:
+    - pandas.DataFrame: Returns the formatted dataset.
+    """
+    # Categories of the concatenated years are merged
+    df_cdp_clean = apply_schema(df_cdp_clean, emissions_dtype)
+    df_cdp_clean = format_covered_countries(df_cdp_clean, covered_countries_format)
+    df_cdp_clean = df_cdp_clean.reset_index(drop=True)
+    if string_unique_id:
+        df_cdp_clean = unique_id_to_string(df_cdp_clean)
+    return df_cdp_clean
+
+
 def create_CDP_clean_dataset(
     path_raw_data=os.path.join("data", "raw_data"),
     path_clean_data=os.path.join("data", "clean_data"),
     years=[year for year in range(2015, 2023)],
     save_years=False,
     save_format=False,
+    path_cache_data=None,
+    rebuild=False,
+    stream_scope_3=False,
+    engine=None,
+    workers=1,
+    sheet_workers=1,
+    save_compression=None,
+    partition_by_year=False,
+    covered_countries_format="json",
+    emissions_dtype="float64",
+    string_unique_id=False,
+    stack_years=False,
+    incremental=False,
 ):
     """
     Creates a clean dataset by aggregating and cleaning data from multiple years.
@@ -109,36 +505,343 @@ def create_CDP_clean_dataset(
     - path_clean_data (str, optional): Path to the clean data directory. Defaults to data/clean_data.
     - years (list, optional): A list of years to process. Defaults to range from 2015 to 2022.
     - save_years (bool or str, optional): Flag indicating whether to save separate years' datasets.
-      Defaults to False. If "csv" or "xlsx", saves the file in CSV or EXCEL format.
-    - save_format (bool or str, optional): Flag indicating whether to save separate years' datasets.
-      Defaults to False. If "csv" or "xlsx", saves the file in CSV or EXCEL format.
+      Defaults to False. If "csv", "xlsx", "parquet" or "feather", saves the files in this format.
+    - save_format (bool or str, optional): Flag indicating whether to save the concatenated dataset.
+      Defaults to False. If "csv", "xlsx", "parquet" or "feather", saves the file in this format.
+    - save_compression (str, optional): Compression codec of the saved datasets, e.g. "zstd" for
+      parquet or feather files, "gzip" for csv files. Defaults to None (format default).
+    - partition_by_year (bool, optional): If True, the concatenated dataset is saved as a parquet
+      dataset partitioned by questionnaire_year. Defaults to False.
+    - covered_countries_format (str, optional): Storage of the covered countries: "json" strings,
+      Python "list"s or an "arrow" list<dictionary<string>> column (see
+      format_covered_countries). List formats are meant for parquet and feather outputs.
+      Defaults to "json".
+    - emissions_dtype (str, optional): "float32" or "float64", the dtype of emissions columns.
+      Low-cardinality text columns are stored as categoricals and ids and years as nullable
+      small integers (see apply_schema). Defaults to "float64".
+    - string_unique_id (bool, optional): If True, unique_id is exported as
+      "[account_id]_[accounting_year]" strings instead of the integer composite key
+      account_id * 10000 + accounting_year. Defaults to False.
+    - stack_years (bool, optional): If True, the C-format years (2018 onwards) are created at
+      once from their stacked sheets, each groupby and join running once over all of them
+      (see GetStackedYears). The result is identical. Defaults to False.
+    - incremental (bool, optional): If True, the deduplicated and imputed panel is stored in
+      [path_cache_data]/panel, and the next incremental builds only process the years missing
+      from it: duplicates and missing values are only handled again for the accounts of the
+      new years. The result is identical to a full rebuild, which is done instead whenever
+      the stored panel cannot be updated (changed years or code, new years not later than
+      the panel, rebuild requested). Defaults to False.
+    - path_cache_data (str, optional): Path to the directory where parsed raw sheets are cached,
+      keyed by the workbook content hash, and where cleaned years are cached. Defaults to None
+      (raw sheets are not cached and cleaned years are cached in path_clean_data).
+    - rebuild (bool or list, optional): Years whose cached cleaned dataset is ignored and
+      rebuilt. True rebuilds every year. Defaults to False.
+    - stream_scope_3 (bool, optional): If True, Scope 3 sheets are aggregated while streaming
+      their rows instead of being loaded as DataFrames, which bounds memory usage.
+      Defaults to False.
+    - engine (str, optional): Excel parsing engine, "openpyxl" or "calamine" (pandas>=2.2).
+      Falls back on openpyxl if the requested engine is not installed. Defaults to None
+      (openpyxl).
+    - workers (int, optional): Number of processes used to clean the years in parallel. The
+      result is identical to the serial processing (workers=1). Defaults to 1.
+    - sheet_workers (int, optional): Number of sheets of a year workbook parsed concurrently
+      (threads with calamine, processes with openpyxl). Defaults to 1.
 
     Returns:
     - pandas.DataFrame: Returns a cleaned and concatenated DataFrame comprising data from
       specified years (default: 2015 to 2022). If specified, the resulting DataFrame is also saved
       as a CSV or Excel file based on the 'save' parameter.
     """
+    path_year_cache = path_cache_data or path_clean_data
+    panel = None
+    if incremental:
+        dict_fingerprints = {
+            year: get_clean_year_fingerprint(
+                year,
+                path_raw_data,
+                emissions_dtype,
+                stream_scope_3=stream_scope_3,
+                engine=engine,
+            )
+            for year in years
+        }
+        if not rebuild:
+            panel = load_incremental_panel(path_year_cache, dict_fingerprints)
+    new_years = years if panel is None else [y for y in years if y not in panel[0]]
+
     print("Loading of year specific datasets: Start")
-    lst_df_years = []
-    for year in years:
-        lst_df_years.append(
-            clean_CDP_year(path_raw_data, path_clean_data, year, save_years)
-        )
+    lst_df_years = clean_CDP_years(
+        new_years,
+        workers=workers,
+        stack_years=stack_years,
+        path_raw_data=path_raw_data,
+        path_clean_data=path_clean_data,
+        save_years=save_years,
+        save_compression=save_compression,
+        emissions_dtype=emissions_dtype,
+        path_cache_data=path_cache_data,
+        rebuild=rebuild,
+        stream_scope_3=stream_scope_3,
+        engine=engine,
+        sheet_workers=sheet_workers,
+    )
     print("Loading of year specific datasets: Done")
-    
+
     print("Cleaning of the concatenated dataset: Start")
-    df_cdp_concatenated = pd.concat(lst_df_years)
-    df_cdp_clean = handle_duplicates(df_cdp_concatenated)
-    df_cdp_clean = missing_value_imputation(df_cdp_clean)
-    df_cdp_clean = clean_country_names(df_cdp_clean)
-    df_cdp_clean = df_cdp_clean.reset_index(drop=True)
+    if panel is None:
+        df_cdp_concatenated = pd.concat(lst_df_years)
+        df_deduplicated = handle_duplicates(df_cdp_concatenated)
+        df_imputed = missing_value_imputation(df_deduplicated)
+    elif new_years:
+        df_deduplicated, df_imputed = update_duplicates_and_imputation(
+            panel[1], panel[2], pd.concat(lst_df_years)
+        )
+    else:
+        df_deduplicated, df_imputed = panel[1], panel[2]
+    if incremental:
+        state = {
+            "years": dict_fingerprints,
+            "sources": sources_sha256(PANEL_MODULES),
+            "pandas": pd.__version__,
+        }
+        save_panel_state(path_year_cache, state, df_deduplicated, df_imputed)
+    df_cdp_clean = format_clean_dataset(
+        clean_country_names(df_imputed),
+        emissions_dtype,
+        covered_countries_format,
+        string_unique_id,
+    )
     print("Cleaning of the concatenated dataset: Done")
 
     if save_format:
         print("Saving cleaned dataset: Start")
-        file_path = os.path.join(path_clean_data, f"cdp_clean_dataset.{save_format}")
-        dict_attr = {"csv": "csv", "xlsx": "excel"}
-        getattr(df_cdp_clean, f"to_{dict_attr[save_format]}")(file_path, index=False)
-        print("Saving cleaned dataset: Done")
+        save_clean_dataset(
+            df_cdp_clean,
+            path_clean_data,
+            save_format,
+            compression=save_compression,
+            partition_cols=["questionnaire_year"] if partition_by_year else None,
+        )
+
+    return df_cdp_clean
+
+
+def load_year_sheets(year, path_raw_data, **read_options):
+    """
+    Loads the useful sheets of a given year (see get_useful_sheets of the year classes).
+
+    Parameters:
+    - year (int): The questionnaire year.
+    - path_raw_data (str): The path to the directory where raw datasets are stored.
+    - **read_options: Options of the year class (e.g. stream_scope_3 or engine).
 
+    Returns:
+    - tuple or dict: The sheets of the year, in the format of its year class.
+    """
+    return get_year_class(year, **read_options).get_useful_sheets(path_raw_data)
+
+
+def clean_year_sheets(
+    sheets, year, path_raw_data, emissions_dtype="float64", **read_options
+):
+    """
+    Creates the clean dataset of a given year from its loaded sheets.
+
+    Parameters:
+    - sheets (tuple or dict): The sheets of the year (see load_year_sheets).
+    - year (int): The questionnaire year.
+    - path_raw_data (str): The path to the directory where raw datasets are stored, read
+      again when Scope 3 is streamed.
+    - emissions_dtype (str, optional): The dtype of emissions columns. Defaults to "float64".
+    - **read_options: Options of the year class (e.g. stream_scope_3 or engine).
+
+    Returns:
+    - pandas.DataFrame: Returns the cleaned dataset of the year, in the output schema.
+    """
+    year_class = get_year_class(year, **read_options)
+    df_year_raw = year_class.get_year_dataset(path_raw_data, sheets=sheets)
+    df_year_raw["questionnaire_year"] = year
+    return apply_schema(df_year_raw, emissions_dtype, label=year)
+
+
+def concat_years(*lst_df_years):
+    """
+    Concatenates the cleaned datasets of several years.
+    """
+    return pd.concat(lst_df_years)
+
+
+def save_clean_dataset(df_cdp_clean, path_clean_data, save_format, **save_options):
+    """
+    Saves the clean dataset as [path_clean_data]/cdp_clean_dataset (see save_dataset).
+
+    Returns:
+    - str: The path of the saved dataset.
+    """
+    file_path = save_dataset(
+        df_cdp_clean,
+        os.path.join(path_clean_data, "cdp_clean_dataset"),
+        save_format,
+        **save_options,
+    )
+    print("Saving cleaned dataset: Done", f"({file_path})")
+    return file_path
+
+
+def build_CDP_pipeline(
+    path_raw_data=os.path.join("data", "raw_data"),
+    path_clean_data=os.path.join("data", "clean_data"),
+    years=[year for year in range(2015, 2023)],
+    save_format=False,
+    path_cache_data=None,
+    stream_scope_3=False,
+    engine=None,
+    sheet_workers=1,
+    save_compression=None,
+    partition_by_year=False,
+    covered_countries_format="json",
+    emissions_dtype="float64",
+    string_unique_id=False,
+):
+    """
+    Builds the stage graph creating the clean CDP dataset (see Pipeline): for each year,
+    load_[year] loads its sheets and clean_[year] cleans them, then concat,
+    handle_duplicates, missing_value_imputation, clean_country_names, format and save.
+    Each stage is keyed by its code, parameters and data files (raw workbooks, corrections
+    and countries tables) and by the keys of its inputs, e.g. changing clean_country_names
+    only invalidates clean_country_names, format and save.
+
+    Parameters: see create_CDP_clean_dataset. Stage outputs are stored in
+    [path_cache_data]/stages (path_clean_data if path_cache_data is None).
+
+    Returns:
+    - Pipeline: The stage graph.
+    """
+    pipeline = Pipeline(path_cache_data or path_clean_data)
+    read_options = {"stream_scope_3": stream_scope_3, "engine": engine}
+    clean_stages = []
+    for year in years:
+        year_class = get_year_class(year)
+        if year_class is None:
+            print_unsupported_year(year)
+            continue
+        raw_file_path = get_raw_file_path(year, path_raw_data)
+        saved_clean_year = find_saved_clean_year(year, path_raw_data, path_clean_data)
+        if saved_clean_year is not None:
+            # Without raw data, fall back on a previously saved cleaned dataset
+            file_path, save_format, compression = saved_clean_year
+            pipeline.add_stage(
+                f"clean_{year}",
+                load_saved_clean_year,
+                params={
+                    "save_format": save_format,
+                    "compression": compression,
+                    "emissions_dtype": emissions_dtype,
+                    "label": year,
+                },
+                context={"file_path": file_path},
+                code=(load_saved_clean_year, "src.schema"),
+                data_files=(dataset_file_path(file_path, save_format, compression),),
+            )
+            clean_stages.append(f"clean_{year}")
+            continue
+        if not os.path.exists(raw_file_path):
+            raise FileNotFoundError(
+                f"{year} - no raw data ({raw_file_path}) nor saved cleaned dataset"
+            )
+
+        year_module = type(year_class).__module__
+        pipeline.add_stage(
+            f"load_{year}",
+            load_year_sheets,
+            params=dict(read_options, year=year),
+            context={"path_raw_data": path_raw_data, "sheet_workers": sheet_workers},
+            code=(
+                load_year_sheets,
+                year_module,
+                "src.get_year_functions",
+                "src.schema",
+                "src.sheets_manifest",
+                "src.year_specs",
+            ),
+            data_files=(raw_file_path,),
+        )
+        pipeline.add_stage(
+            f"clean_{year}",
+            clean_year_sheets,
+            inputs=[f"load_{year}"],
+            params=dict(read_options, year=year, emissions_dtype=emissions_dtype),
+            context={"path_raw_data": path_raw_data},
+            code=[clean_year_sheets, year_module] + YEAR_PIPELINE_MODULES,
+            data_files=(corrections_path(year),),
+        )
+        clean_stages.append(f"clean_{year}")
+
+    pipeline.add_stage("concat", concat_years, inputs=clean_stages)
+    pipeline.add_stage("handle_duplicates", handle_duplicates, inputs=["concat"])
+    pipeline.add_stage(
+        "missing_value_imputation",
+        missing_value_imputation,
+        inputs=["handle_duplicates"],
+    )
+    pipeline.add_stage(
+        "clean_country_names",
+        clean_country_names,
+        inputs=["missing_value_imputation"],
+        code=(clean_country_names, "src.countries"),
+        data_files=(PATH_COUNTRIES,),
+    )
+    pipeline.add_stage(
+        "format",
+        format_clean_dataset,
+        inputs=["clean_country_names"],
+        params={
+            "emissions_dtype": emissions_dtype,
+            "covered_countries_format": covered_countries_format,
+            "string_unique_id": string_unique_id,
+        },
+        code=(
+            format_clean_dataset,
+            format_covered_countries,
+            unique_id_to_string,
+            "src.schema",
+        ),
+    )
+    if save_format:
+        pipeline.add_stage(
+            "save",
+            save_clean_dataset,
+            inputs=["format"],
+            params={
+                "save_format": save_format,
+                "compression": save_compression,
+                "partition_cols": (
+                    ["questionnaire_year"] if partition_by_year else None
+                ),
+            },
+            context={"path_clean_data": path_clean_data},
+            persist=False,
+        )
+    return pipeline
+
+
+def run_CDP_pipeline(rebuild=(), **kwargs):
+    """
+    Creates the clean CDP dataset with the stage graph of build_CDP_pipeline, running only
+    the stages whose stored output is missing or out of date, and prints the status and
+    duration of every stage.
+
+    Parameters:
+    - rebuild (list, optional): Names of the stages run again, with the stages downstream
+      of them, even if their outputs are stored. Defaults to ().
+    - **kwargs: Keyword arguments of build_CDP_pipeline.
+
+    Returns:
+    - pandas.DataFrame: Returns the cleaned and concatenated dataset.
+    """
+    pipeline = build_CDP_pipeline(**kwargs)
+    print(pipeline.describe())
+    targets = [name for name in ["format", "save"] if name in pipeline.stages]
+    df_cdp_clean = pipeline.run(targets, rebuild)["format"]
+    print(pipeline.report())
     return df_cdp_clean
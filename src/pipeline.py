@@ -0,0 +1,230 @@
+import hashlib
+import importlib
+import inspect
+import os
+import pickle
+import time
+
+
+import pandas as pd
+
+
+from dataclasses import dataclass, field
+
+from src.cache import file_sha256
+
+
+@dataclass
+class Stage:
+    """
+    A node of a Pipeline: a function computing an output from the outputs of other stages.
+
+    Attributes:
+    - name (str): Name of the stage, unique in the pipeline.
+    - func (callable): Function called with the outputs of the input stages, in order,
+      followed by the params and context keyword arguments.
+    - inputs (tuple, optional): Names of the stages whose outputs are given to func.
+    - params (dict, optional): Keyword arguments of func, part of the stage key.
+    - context (dict, optional): Keyword arguments of func which do not change its output
+      (e.g. paths or number of workers), not part of the stage key.
+    - code (tuple, optional): Functions and modules (or module names) whose source code is
+      part of the stage key. Defaults to func alone.
+    - data_files (tuple, optional): Files whose content is part of the stage key, e.g. the
+      raw workbook of a year or a reference table.
+    - persist (bool, optional): If False, the output is never stored and the stage runs
+      whenever it is needed, e.g. for stages writing files.
+    """
+
+    name: str
+    func: callable
+    inputs: tuple = ()
+    params: dict = field(default_factory=dict)
+    context: dict = field(default_factory=dict)
+    code: tuple = ()
+    data_files: tuple = ()
+    persist: bool = True
+
+    def own_key(self):
+        """
+        Hashes what the stage computes by itself: its code, params, data files and the
+        pandas version.
+        """
+        sha256 = hashlib.sha256()
+        sha256.update(repr((self.name, pd.__version__)).encode("utf-8"))
+        for obj in self.code or (self.func,):
+            if isinstance(obj, str):
+                obj = importlib.import_module(obj)
+            sha256.update(inspect.getsource(obj).encode("utf-8"))
+        sha256.update(repr(sorted(self.params.items())).encode("utf-8"))
+        for file_path in self.data_files:
+            if os.path.exists(file_path):
+                sha256.update(file_sha256(file_path).encode("utf-8"))
+            else:
+                sha256.update(f"missing:{os.path.basename(file_path)}".encode("utf-8"))
+        return sha256.hexdigest()
+
+
+class Pipeline:
+    """
+    Graph of stages whose outputs are stored under [path_cache]/stages, keyed by a content
+    hash of the stage and of the keys of its inputs. A stage only runs if its output is not
+    stored under its current key, and the stages upstream of a stored output are not run at
+    all: changing the code of the last stage only recomputes the last stage.
+    """
+
+    def __init__(self, path_cache=None):
+        self.path_cache = path_cache
+        self.stages = {}
+        self.timings = {}
+        self.status = {}
+
+    def add_stage(self, name, func, inputs=(), **options):
+        """
+        Adds a stage to the pipeline (see Stage for the options).
+
+        Parameters:
+        - name (str): Name of the stage.
+        - func (callable): Function of the stage.
+        - inputs (tuple, optional): Names of the input stages, already in the pipeline.
+
+        Returns:
+        - Stage: The added stage.
+        """
+        if name in self.stages:
+            raise ValueError(f"Stage {name} is already in the pipeline")
+        missing_inputs = [
+            input_name for input_name in inputs if input_name not in self.stages
+        ]
+        if missing_inputs:
+            raise ValueError(f"Unknown inputs {missing_inputs} of stage {name}")
+        self.stages[name] = Stage(name, func, tuple(inputs), **options)
+        return self.stages[name]
+
+    def stage_keys(self):
+        """
+        Computes the key of every stage, which changes whenever the stage or any stage
+        upstream of it changes.
+
+        Returns:
+        - dict: The key of every stage, in the order of the stages.
+        """
+        dict_keys = {}
+        # Stages are added after their inputs, so they are in topological order
+        for name, stage in self.stages.items():
+            sha256 = hashlib.sha256(stage.own_key().encode("utf-8"))
+            for input_name in stage.inputs:
+                sha256.update(dict_keys[input_name].encode("utf-8"))
+            dict_keys[name] = sha256.hexdigest()
+        return dict_keys
+
+    def _artifact_path(self, name, key):
+        return os.path.join(self.path_cache, "stages", name, f"{key[:16]}.pkl")
+
+    def _is_stored(self, name, key):
+        return (
+            self.path_cache is not None
+            and self.stages[name].persist
+            and os.path.exists(self._artifact_path(name, key))
+        )
+
+    def describe(self):
+        """
+        Describes the graph as text: one line per stage, with its inputs, its key and
+        whether its output is stored.
+
+        Returns:
+        - str: The description of the pipeline.
+        """
+        dict_keys = self.stage_keys()
+        lines = []
+        for name, stage in self.stages.items():
+            if not stage.persist:
+                state = "not persisted"
+            elif self._is_stored(name, dict_keys[name]):
+                state = "stored"
+            else:
+                state = "to compute"
+            inputs = ", ".join(stage.inputs) or "-"
+            lines.append(f"{name} <- {inputs} [{dict_keys[name][:12]}] {state}")
+        return "\n".join(lines)
+
+    def report(self):
+        """
+        Reports the status and duration of every stage of the last run.
+
+        Returns:
+        - pandas.DataFrame: Status ("run", "loaded" or "skipped" if the stage was not
+          needed) and time in seconds of every stage.
+        """
+        return pd.DataFrame(
+            {
+                "status": [self.status.get(name, "skipped") for name in self.stages],
+                "seconds": [self.timings.get(name, 0.0) for name in self.stages],
+            },
+            index=pd.Index(list(self.stages), name="stage"),
+        ).round({"seconds": 3})
+
+    def run(self, targets=None, rebuild=()):
+        """
+        Computes the outputs of the target stages, running only the stages whose output is
+        not stored and which are needed by a target.
+
+        Parameters:
+        - targets (list, optional): Names of the stages to compute. Defaults to None
+          (stages which are the input of no other stage).
+        - rebuild (list, optional): Names of the stages run again, with the stages
+          downstream of them, even if their outputs are stored. Defaults to ().
+
+        Returns:
+        - dict: The output of every target stage.
+        """
+        if targets is None:
+            inputs = {
+                input_name
+                for stage in self.stages.values()
+                for input_name in stage.inputs
+            }
+            targets = [name for name in self.stages if name not in inputs]
+        rebuild = set(rebuild)
+        for name, stage in self.stages.items():
+            if rebuild.intersection(stage.inputs):
+                rebuild.add(name)
+        dict_keys = self.stage_keys()
+        self.timings, self.status = {}, {}
+        outputs = {}
+
+        def compute(name):
+            if name in outputs:
+                return outputs[name]
+            stage, key = self.stages[name], dict_keys[name]
+            if name not in rebuild and self._is_stored(name, key):
+                start = time.perf_counter()
+                with open(self._artifact_path(name, key), "rb") as f:
+                    outputs[name] = pickle.load(f)
+                self.status[name] = "loaded"
+            else:
+                args = [compute(input_name) for input_name in stage.inputs]
+                start = time.perf_counter()
+                outputs[name] = stage.func(*args, **stage.params, **stage.context)
+                if self.path_cache is not None and stage.persist:
+                    self._store(name, key, outputs[name])
+                self.status[name] = "run"
+            self.timings[name] = time.perf_counter() - start
+            print(f"Stage {name}: {self.status[name]} in {self.timings[name]:.1f}s")
+            return outputs[name]
+
+        return {name: compute(name) for name in targets}
+
+    def _store(self, name, key, output):
+        """
+        Stores the output of a stage under its key, replacing its previous outputs. Outputs
+        are pickled to keep their exact dtypes.
+        """
+        file_path = self._artifact_path(name, key)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(f"{file_path}.tmp", "wb") as f:
+            pickle.dump(output, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{file_path}.tmp", file_path)
+        for file_name in os.listdir(os.path.dirname(file_path)):
+            if file_name != os.path.basename(file_path):
+                os.remove(os.path.join(os.path.dirname(file_path), file_name))
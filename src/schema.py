@@ -0,0 +1,136 @@
+import numpy as np
+import pandas as pd
+
+# Output schema of the clean CDP dataset
+CATEGORICAL_COLUMNS = [
+    "country",
+    "country_iso",
+    "activity",
+    "sector",
+    "industry",
+    "boundary",
+]
+INTEGER_COLUMNS = {
+    "account_id": "Int32",
+    "accounting_year": "Int16",
+    "questionnaire_year": "Int16",
+}
+EMISSIONS_COLUMNS = ["CDP_CF1", "CDP_CF2_location", "CDP_CF2_market", "CDP_CF3"]
+EMISSIONS_DTYPES = ("float32", "float64")
+
+
+def coerce_emissions(emissions, emissions_dtype="float64", label=None):
+    """
+    Converts emissions to floats. 'Question not applicable' becomes NaN, as do the values
+    which are not numbers, which are reported instead of failing the whole year.
+
+    Parameters:
+    - emissions (pandas.Series): The emissions, numbers or strings.
+    - emissions_dtype (str, optional): The float dtype of the result. Defaults to "float64".
+    - label (optional): Prefix of the report, e.g. the questionnaire year.
+
+    Returns:
+    - pandas.Series: The emissions as floats.
+    """
+    emissions = emissions.replace("Question not applicable", np.nan)
+    numbers = pd.to_numeric(emissions, errors="coerce")
+    is_coerced = numbers.isna() & emissions.notna()
+    if is_coerced.any():
+        print(
+            label,
+            f"- {is_coerced.sum()} {emissions.name} values are not numbers and set to NaN:",
+            emissions[is_coerced].unique()[:5].tolist(),
+        )
+    return numbers.astype(emissions_dtype)
+
+
+def apply_sheet_schema(df_sheet, schema_columns, label=None):
+    """
+    Applies the output schema to the columns of a raw sheet as soon as it is loaded, so that
+    the joins and preprocessing of the year work on compact dtypes: categoricals for
+    low-cardinality text columns and float64 for emissions (cast to the emissions dtype by
+    apply_schema). Ids and years are only cast by apply_schema, once the composite key is
+    built.
+
+    Parameters:
+    - df_sheet (pandas.DataFrame): The raw sheet.
+    - schema_columns (dict): Dictionary mapping raw columns to the columns of the clean
+      dataset (see SCHEMA_COLUMNS in src/sheets_manifest.py). Other columns are unchanged.
+    - label (optional): Prefix of the coerced emissions report.
+
+    Returns:
+    - pandas.DataFrame: Returns the sheet with the schema dtypes.
+    """
+    converted = {}
+    for col in df_sheet.columns:
+        if schema_columns.get(col) in CATEGORICAL_COLUMNS:
+            converted[col] = df_sheet[col].astype("category")
+        elif schema_columns.get(col) in EMISSIONS_COLUMNS:
+            converted[col] = coerce_emissions(df_sheet[col], label=label)
+    return df_sheet.assign(**converted)
+
+
+def apply_schema(df_clean, emissions_dtype="float64", label=None):
+    """
+    Applies the output schema to a clean CDP dataset: categoricals for low-cardinality text
+    columns, nullable small integers for ids and years and floats for emissions (see
+    coerce_emissions). Columns missing from the dataset are ignored.
+
+    Parameters:
+    - df_clean (pandas.DataFrame): The clean CDP dataset.
+    - emissions_dtype (str, optional): "float32" or "float64", the dtype of emissions
+      columns. Defaults to "float64".
+    - label (optional): Prefix of the coerced emissions report, e.g. the questionnaire year.
+
+    Returns:
+    - pandas.DataFrame: Returns a DataFrame with the schema dtypes. Categories are rebuilt
+      from the values of the dataset, so concatenated datasets can be passed again.
+    """
+    if emissions_dtype not in EMISSIONS_DTYPES:
+        raise ValueError(
+            f"Unknown emissions dtype {emissions_dtype}, expected one of {list(EMISSIONS_DTYPES)}"
+        )
+    df_clean = df_clean.copy()
+    for col in CATEGORICAL_COLUMNS:
+        if col not in df_clean.columns:
+            continue
+        if isinstance(df_clean[col].dtype, pd.CategoricalDtype):
+            df_clean[col] = df_clean[col].cat.remove_unused_categories()
+        else:
+            df_clean[col] = df_clean[col].astype("category")
+    for col, dtype in INTEGER_COLUMNS.items():
+        if col in df_clean.columns:
+            df_clean[col] = df_clean[col].astype(dtype)
+    for col in EMISSIONS_COLUMNS:
+        if col in df_clean.columns:
+            df_clean[col] = coerce_emissions(df_clean[col], emissions_dtype, label)
+    return df_clean
+
+
+def memory_report(df_before, df_after):
+    """
+    Compares the memory usage of a dataset before and after a dtype conversion.
+
+    Parameters:
+    - df_before (pandas.DataFrame): The dataset before conversion.
+    - df_after (pandas.DataFrame): The dataset after conversion.
+
+    Returns:
+    - pandas.DataFrame: Returns the dtypes and bytes (including object contents) of each
+      column before and after conversion, with a 'total' row.
+    """
+    df_report = pd.DataFrame(
+        {
+            "dtype_before": df_before.dtypes.astype(str),
+            "bytes_before": df_before.memory_usage(index=False, deep=True),
+            "dtype_after": df_after.dtypes.astype(str),
+            "bytes_after": df_after.memory_usage(index=False, deep=True),
+        }
+    )
+    df_report.loc["total"] = [
+        "",
+        df_report["bytes_before"].sum(),
+        "",
+        df_report["bytes_after"].sum(),
+    ]
+    return df_report
@@ -0,0 +1,91 @@
+# Manifest of the sheets read for every CDP questionnaire year, with the columns
+# each of them actually needs. A None value keeps every column of the sheet: it is
+# used for sheets that are merged or renamed as a whole (C0.2 is also filtered
+# with a frame-wide dropna), where projecting columns would change the output.
+
+from src.year_specs import (
+    YEAR_SPECS,
+    BOUNDARY_COLUMN_2018,
+    BOUNDARY_COLUMN_2020,
+    COUNTRIES_COLUMN_2018,
+    COUNTRIES_COLUMN_2022,
+    CF1_COLUMN,
+    CF2_LOCATION_COLUMN,
+    CF2_MARKET_COLUMN,
+    CF3_COLUMNS_2018,
+    CF3_COLUMNS_2020,
+    CF3_COLUMNS_2022,
+)
+
+LEGACY_CF1_COLUMNS = [
+    "account_id",
+    "account_name",
+    "incorporated_country",
+    "ticker",
+    "isin",
+    "accounting_year",
+    "CC8.1 - Please select the boundary you are using for your Scope 1 and 2 greenhouse gas inventory",
+    "CC8.2 - Please provide your gross global Scope 1 emissions figures in metric tonnes CO2e",
+]
+LEGACY_CF2_COLUMNS = [
+    "account_id",
+    "accounting_year",
+    "CC8.3a C1 - Please provide your gross global Scope 2 emissions figures in metric tonnes CO2e\xa0 - Scope 2, location-based?",
+    "CC8.3a C2 - Please provide your gross global Scope 2 emissions figures in metric tonnes CO2e\xa0 - Scope 2, market-based (if applicable)?",
+]
+LEGACY_CF3_COLUMNS = [
+    "account_id",
+    "accounting_year",
+    "CC14.1 C2 - Please account for your organization’s Scope 3 emissions, disclosing and explaining any exclusions - Evaluation status",
+    "CC14.1 C3 - Please account for your organization’s Scope 3 emissions, disclosing and explaining any exclusions - metric tonnes CO2e",
+]
+
+# Raw columns converted to the dtypes of the output schema as soon as their sheet is
+# loaded (see apply_sheet_schema), mapped to their column in the clean dataset
+SCHEMA_COLUMNS = {
+    "Country": "country",
+    "Country/Areas": "country",
+    "Country/Area": "country",
+    "Primary activity": "activity",
+    "Primary sector": "sector",
+    "Primary industry": "industry",
+    BOUNDARY_COLUMN_2018: "boundary",
+    BOUNDARY_COLUMN_2020: "boundary",
+    CF1_COLUMN: "CDP_CF1",
+    CF2_LOCATION_COLUMN: "CDP_CF2_location",
+    CF2_MARKET_COLUMN: "CDP_CF2_market",
+    LEGACY_CF1_COLUMNS[2]: "country",
+    LEGACY_CF1_COLUMNS[6]: "boundary",
+    LEGACY_CF1_COLUMNS[7]: "CDP_CF1",
+    LEGACY_CF2_COLUMNS[2]: "CDP_CF2_location",
+    LEGACY_CF2_COLUMNS[3]: "CDP_CF2_market",
+}
+
+# Sheets which are missing from some workbooks, returned as None when absent
+OPTIONAL_SHEETS = ("C0.3", "C0.5")
+
+# Scope 3 sheets, which can be aggregated while streaming instead of being loaded
+SCOPE_3_SHEETS = ("C6.5", "CC14.1")
+
+USEFUL_SHEETS = {
+    2015: {
+        "CC0.3": None,
+        "CC8. Emissions Data": None,
+        "CC14.1": LEGACY_CF3_COLUMNS,
+    },
+    2016: {
+        "CC0.3": None,
+        "CC8. Emissions Data": LEGACY_CF1_COLUMNS,
+        "CC8.3a": LEGACY_CF2_COLUMNS,
+        "CC14.1": LEGACY_CF3_COLUMNS,
+    },
+    2017: {
+        "CC0.3": None,
+        "CC8. Emissions Data": LEGACY_CF1_COLUMNS,
+        "CC8.3a": LEGACY_CF2_COLUMNS,
+        "CC14.1": LEGACY_CF3_COLUMNS,
+    },
+}
+
+# C-format years (2018 onwards) are described by their YearSpec
+USEFUL_SHEETS.update({year: spec.useful_sheets for year, spec in YEAR_SPECS.items()})
@@ -1,3 +1,37 @@
+import json
+import os
+import shutil
+
+
+import numpy as np
+import pandas as pd
+
+from src.countries import (
+    canonicalize_countries,
+    canonicalize_covered_countries,
+    country_iso_codes,
+)
+
+# Storage formats of the covered_countries column
+COVERED_COUNTRIES_FORMATS = ("json", "list", "arrow")
+
+# Compression codecs supported by each output format (None writes uncompressed files)
+DATASET_COMPRESSIONS = {
+    "csv": ("gzip", "bz2", "zip", "xz", "zstd"),
+    "xlsx": (),
+    "parquet": ("snappy", "gzip", "brotli", "lz4", "zstd"),
+    "feather": ("lz4", "zstd"),
+}
+# Extensions of compressed CSV files, from which pandas infers the codec when reading them
+CSV_COMPRESSION_EXTENSIONS = {
+    "gzip": "gz",
+    "bz2": "bz2",
+    "zip": "zip",
+    "xz": "xz",
+    "zstd": "zst",
+}
+
+
 def handle_duplicates(df_cdp_concatenated):
     """
     Handles duplicated records in the concatenated CDP dataset.
@@ -10,16 +44,13 @@ def handle_duplicates(df_cdp_concatenated):
     - pandas.DataFrame: Returns a DataFrame with duplicates handled by keeping the last available
       questionnaire values when several option are available for a given account and year.
     """
-    df_cdp_concatenated["final_id"] = (
-        df_cdp_concatenated["unique_id"].astype(str)
-        + "_"
-        + df_cdp_concatenated["questionnaire_year"].astype(str)
+    # A stable sort keeps the order of the concatenated years for a same questionnaire
+    df_cdp_concatenated = df_cdp_concatenated.sort_values(
+        by=["questionnaire_year"], kind="stable"
     )
-    df_cdp_concatenated = df_cdp_concatenated.sort_values(by=["questionnaire_year"])
     df_cdp_concatenated = df_cdp_concatenated.drop_duplicates(
         subset="unique_id", keep="last"
     )
-    del df_cdp_concatenated["final_id"]
     return df_cdp_concatenated
 
 
@@ -48,30 +79,310 @@ def missing_value_imputation(df_cdp_clean):
     ]
 
     print("Imputing some missing categorical values: Start")
-    for acc in df_cdp_clean.account_id.unique():
-        df_acc = df_cdp_clean[df_cdp_clean.account_id == acc]
-        for col in cols_to_impute:
-            if df_acc[col].notna().any():
-                curr_col_value = df_acc[col].loc[df_acc[col].last_valid_index()]
-                df_cdp_clean.loc[
-                    (df_cdp_clean[col].isna()) & (df_cdp_clean.account_id == acc), col
-                ] = curr_col_value
+    # Last valid observation of each account, rows without account_id are left as they are
+    df_last_values = df_cdp_clean.groupby("account_id")[cols_to_impute].transform(
+        "last"
+    )
+    df_cdp_clean[cols_to_impute] = df_cdp_clean[cols_to_impute].fillna(df_last_values)
     print("Imputing some missing categorical values: Done")
     return df_cdp_clean
 
 
+def update_duplicates_and_imputation(df_deduplicated, df_imputed, df_cdp_new):
+    """
+    Adds new questionnaire years to a panel already deduplicated and imputed, with the
+    result of handle_duplicates and missing_value_imputation on the whole concatenated
+    dataset. Duplicates are only handled for the records of the new years, and missing
+    values only imputed again for the accounts present in the new years.
+
+    Parameters:
+    - df_deduplicated (pandas.DataFrame): The panel returned by handle_duplicates.
+    - df_imputed (pandas.DataFrame): The panel returned by missing_value_imputation.
+    - df_cdp_new (pandas.DataFrame): The concatenated datasets of the new years, whose
+      questionnaire years must be later than the ones of the panel.
+
+    Returns:
+    - tuple: (the updated deduplicated panel, the updated imputed panel).
+    """
+    if (
+        df_cdp_new["questionnaire_year"].min()
+        <= df_deduplicated["questionnaire_year"].max()
+    ):
+        raise ValueError(
+            "Only questionnaire years later than the ones of the panel can be added"
+        )
+    # Records of the new years replace the ones of previous questionnaires
+    df_cdp_new = handle_duplicates(df_cdp_new)
+    is_kept = ~df_deduplicated["unique_id"].isin(df_cdp_new["unique_id"]).to_numpy()
+    df_deduplicated = pd.concat([df_deduplicated[is_kept], df_cdp_new])
+
+    # Missing values are imputed again for the accounts of the new years only
+    is_updated = df_deduplicated["account_id"].isin(df_cdp_new["account_id"]).to_numpy()
+    df_updated = missing_value_imputation(df_deduplicated[is_updated])
+    df_updated.index = np.flatnonzero(is_updated)
+    is_unchanged = ~df_imputed["account_id"].isin(df_cdp_new["account_id"]).to_numpy()
+    df_unchanged = df_imputed[is_unchanged]
+    df_unchanged.index = np.flatnonzero(~is_updated)
+    df_imputed = pd.concat([df_unchanged, df_updated]).sort_index()
+    df_imputed = df_imputed.reset_index(drop=True)
+    return df_deduplicated, df_imputed
+
+
 def clean_country_names(df_cdp_clean):
     """
-    Handles specific country names to use more generic equivalents.
+    Replaces the country names of the 'country' and 'covered_countries' columns with
+    canonical names (e.g. "USA" with "United States of America", see src/countries.csv),
+    and adds the ISO 3166-1 alpha-3 code of the country in a 'country_iso' column.
 
     Parameters:
     - df_cdp_clean (pandas.DataFrame): The DataFrame containing CDP data with country names.
 
     Returns:
-    - pandas.DataFrame: Returns a DataFrame with certain country names replaced with more generic ones.
+    - pandas.DataFrame: Returns a DataFrame with canonical country names and their ISO codes.
+      Other columns are left untouched.
+    """
+    df_cdp_clean = df_cdp_clean.copy()
+    if "country" in df_cdp_clean.columns:
+        df_cdp_clean["country"] = canonicalize_countries(df_cdp_clean["country"])
+        df_cdp_clean.insert(
+            df_cdp_clean.columns.get_loc("country") + 1,
+            "country_iso",
+            country_iso_codes(df_cdp_clean["country"]),
+        )
+    if "covered_countries" in df_cdp_clean.columns:
+        df_cdp_clean["covered_countries"] = canonicalize_covered_countries(
+            df_cdp_clean["covered_countries"]
+        )
+    return df_cdp_clean
+
+
+def unique_id_to_string(df_cdp_clean):
+    """
+    Materializes the "[account_id]_[accounting_year]" string ids of the records, the
+    unique_id column being an integer composite key otherwise (see composite_key).
+
+    Parameters:
+    - df_cdp_clean (pandas.DataFrame): The DataFrame containing CDP data with 'account_id'
+      and 'accounting_year' columns.
+
+    Returns:
+    - pandas.DataFrame: Returns the DataFrame with a string 'unique_id' column.
     """
-    df_cdp_clean = df_cdp_clean.replace("USA", "United States of America")
-    df_cdp_clean = df_cdp_clean.replace(
-        "United Kingdom of Great Britain and Northern Ireland", "United Kingdom"
+    df_cdp_clean["unique_id"] = (
+        df_cdp_clean["account_id"].astype("int64").astype(str)
+        + "_"
+        + df_cdp_clean["accounting_year"].astype("int64").astype(str)
     )
     return df_cdp_clean
+
+
+def format_covered_countries(df_cdp_clean, covered_countries_format="json"):
+    """
+    Stores the covered countries of each record as a list instead of a JSON-like string,
+    so that they can be filtered without parsing (e.g. accounts operating in France).
+
+    Parameters:
+    - df_cdp_clean (pandas.DataFrame): The DataFrame containing CDP data with a
+      'covered_countries' column of JSON lists (2015 to 2017) or single countries.
+    - covered_countries_format (str, optional): "json" keeps the strings, "list" stores Python
+      lists and "arrow" an Arrow list<dictionary<string>> column, where each country string is
+      stored once. Defaults to "json".
+
+    Returns:
+    - pandas.DataFrame: Returns the DataFrame with the 'covered_countries' column in the
+      requested format, missing values being kept missing.
+    """
+    if covered_countries_format not in COVERED_COUNTRIES_FORMATS:
+        raise ValueError(
+            f"Unknown covered countries format {covered_countries_format}, "
+            f"expected one of {list(COVERED_COUNTRIES_FORMATS)}"
+        )
+    if covered_countries_format == "json":
+        return df_cdp_clean
+
+    # Each distinct value is parsed once
+    codes, uniques = pd.factorize(df_cdp_clean["covered_countries"])
+    unique_lists = [
+        json.loads(value) if str(value).startswith("[") else [value]
+        for value in uniques
+    ]
+    # Rows get their own list, so that editing one record never alters another
+    covered_countries = [
+        list(unique_lists[code]) if code >= 0 else None for code in codes
+    ]
+
+    if covered_countries_format == "list":
+        covered_countries = pd.Series(
+            covered_countries, index=df_cdp_clean.index, dtype=object
+        )
+    else:
+        import pyarrow as pa  # arrow columns require pyarrow
+
+        arrow_type = pa.list_(pa.dictionary(pa.int32(), pa.string()))
+        covered_countries = pd.Series(
+            pd.arrays.ArrowExtensionArray(pa.array(covered_countries, type=arrow_type)),
+            index=df_cdp_clean.index,
+        )
+    df_cdp_clean["covered_countries"] = covered_countries
+    return df_cdp_clean
+
+
+def dataset_file_path(file_path, save_format, compression=None):
+    """
+    Gets the path of the file written by save_dataset. Compressed CSV files get the
+    extension of their codec (e.g. [file_path].csv.gz), Parquet and Feather files are
+    compressed internally and keep theirs.
+
+    Parameters:
+    - file_path (str): Path of the file, without extension.
+    - save_format (str): "csv", "xlsx", "parquet" or "feather".
+    - compression (str, optional): Compression codec. Defaults to None.
+
+    Returns:
+    - str: The path of the file, with its extension.
+    """
+    if save_format == "csv" and compression is not None:
+        return f"{file_path}.csv.{CSV_COMPRESSION_EXTENSIONS[compression]}"
+    return f"{file_path}.{save_format}"
+
+
+def save_dataset(df, file_path, save_format, compression=None, partition_cols=None):
+    """
+    Saves a dataset in CSV, EXCEL, Parquet or Feather format. Parquet and Feather preserve
+    the column dtypes, and Parquet datasets can be partitioned Hive style
+    ([file_path]/questionnaire_year=2022/...), so that a single partition can be read
+    without scanning the whole dataset.
+
+    Parameters:
+    - df (pandas.DataFrame): The dataset to save.
+    - file_path (str): Path of the file (or of the partitioned dataset directory) to write,
+      without extension.
+    - save_format (str): "csv", "xlsx", "parquet" or "feather".
+    - compression (str, optional): Compression codec, among DATASET_COMPRESSIONS[save_format].
+      Defaults to None (the format default: uncompressed, snappy for Parquet and lz4 for
+      Feather).
+    - partition_cols (list, optional): Columns the Parquet dataset is partitioned by.
+      Defaults to None (a single file is written).
+
+    Returns:
+    - str: The path of the written file (see dataset_file_path) or dataset directory.
+    """
+    if save_format not in DATASET_COMPRESSIONS:
+        raise ValueError(
+            f"Unknown save format {save_format}, expected one of {list(DATASET_COMPRESSIONS)}"
+        )
+    if compression is not None and compression not in DATASET_COMPRESSIONS[save_format]:
+        raise ValueError(
+            f"Compression {compression} is not supported for {save_format} files, "
+            f"expected one of {list(DATASET_COMPRESSIONS[save_format])}"
+        )
+    if partition_cols and save_format != "parquet":
+        raise ValueError("Only parquet datasets can be partitioned")
+
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    if partition_cols:
+        # pyarrow adds files to existing partitions, previous datasets are removed first
+        if os.path.isdir(file_path):
+            shutil.rmtree(file_path)
+        df.to_parquet(
+            file_path,
+            index=False,
+            compression=compression or "snappy",
+            partition_cols=partition_cols,
+        )
+        return file_path
+
+    file_path = dataset_file_path(file_path, save_format, compression)
+    if save_format == "csv":
+        df.to_csv(file_path, index=False, compression=compression)
+    elif save_format == "xlsx":
+        df.to_excel(file_path, index=False)
+    elif save_format == "parquet":
+        df.to_parquet(file_path, index=False, compression=compression or "snappy")
+    else:
+        # Feather files only store default indexes
+        df.reset_index(drop=True).to_feather(file_path, compression=compression)
+    return file_path
+
+
+def load_dataset(
+    file_path, save_format, filters=None, dtype_backend=None, compression=None
+):
+    """
+    Loads a dataset saved by save_dataset.
+
+    Parameters:
+    - file_path (str): Path of the file (or of the partitioned dataset directory), without
+      extension.
+    - save_format (str): "csv", "xlsx", "parquet" or "feather".
+    - filters (list, optional): Parquet filters, e.g. [("questionnaire_year", "=", 2022)],
+      only reading the matching partitions. Defaults to None.
+    - dtype_backend (str, optional): "pyarrow" reads parquet and feather columns with Arrow
+      dtypes, required for Arrow covered_countries columns. Defaults to None (numpy dtypes).
+    - compression (str, optional): Compression codec of CSV files, which sets the extension
+      of the file read (see dataset_file_path). Defaults to None.
+
+    Returns:
+    - pandas.DataFrame: The loaded dataset.
+    """
+    read_options = {"dtype_backend": dtype_backend} if dtype_backend else {}
+    if save_format == "parquet":
+        if not os.path.isdir(file_path):
+            return pd.read_parquet(
+                f"{file_path}.parquet", filters=filters, **read_options
+            )
+        return read_partitioned_parquet(file_path, filters, **read_options)
+    if save_format == "feather":
+        return pd.read_feather(f"{file_path}.feather", **read_options)
+    if save_format == "csv":
+        return pd.read_csv(dataset_file_path(file_path, "csv", compression))
+    return pd.read_excel(f"{file_path}.{save_format}")
+
+
+def read_partitioned_parquet(dir_path, filters=None, **read_options):
+    """
+    Reads a Parquet dataset partitioned Hive style. Partition values are parsed with the
+    types recorded by pandas in the partition files, instead of being inferred as
+    dictionaries, which pandas cannot read for the small integer dtypes of the schema
+    (e.g. Int16 questionnaire_year).
+
+    Parameters:
+    - dir_path (str): Path of the partitioned dataset directory.
+    - filters (list, optional): Parquet filters. Defaults to None.
+    - **read_options: Additional options forwarded to pandas.read_parquet.
+
+    Returns:
+    - pandas.DataFrame: The loaded dataset.
+    """
+    import pyarrow as pa  # partitioned datasets require pyarrow
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    file_paths = [
+        os.path.join(root, file_name)
+        for root, _, file_names in sorted(os.walk(dir_path))
+        for file_name in sorted(file_names)
+    ]
+    if not file_paths:
+        raise FileNotFoundError(f"No partition file found in {dir_path}")
+    pandas_metadata = pq.read_schema(file_paths[0]).pandas_metadata
+    dict_pandas_types = {
+        col["name"]: col["pandas_type"] for col in pandas_metadata["columns"]
+    }
+    partition_cols = [
+        directory.split("=")[0]
+        for directory in os.path.relpath(
+            os.path.dirname(file_paths[0]), dir_path
+        ).split(os.sep)
+    ]
+    fields = []
+    for col in partition_cols:
+        try:
+            arrow_type = pa.from_numpy_dtype(np.dtype(dict_pandas_types[col]))
+        except (TypeError, pa.ArrowNotImplementedError):
+            arrow_type = pa.string()
+        fields.append((col, arrow_type))
+    partitioning = ds.partitioning(pa.schema(fields), flavor="hive")
+    return pd.read_parquet(
+        dir_path, filters=filters, partitioning=partitioning, **read_options
+    )
@@ -0,0 +1,166 @@
+from dataclasses import dataclass, field
+
+# Question columns of the C-format questionnaires (2018 onwards)
+BOUNDARY_COLUMN_2018 = "C0.5_Select the option that describes the reporting boundary for which climate-related impacts on your business are being reported. Note that this option should align with your consolidation approach to your Scope 1 and Scope 2 greenhouse gas inventory."
+BOUNDARY_COLUMN_2020 = "C0.5_Select the option that describes the reporting boundary for which climate-related impacts on your business are being reported. Note that this option should align with your chosen approach for consolidating your GHG inventory."
+COUNTRIES_COLUMN_2018 = (
+    "C0.3_Select the countries/regions for which you will be supplying data."
+)
+COUNTRIES_COLUMN_2022 = "C0.3_Select the countries/areas in which you operate."
+CF1_COLUMN = "C6.1_C1_What were your organization’s gross global Scope 1 emissions in metric tons CO2e? - Gross global Scope 1 emissions (metric tons CO2e)"
+CF2_LOCATION_COLUMN = "C6.3_C1_What were your organization’s gross global Scope 2 emissions in metric tons CO2e? - Scope 2, location-based"
+CF2_MARKET_COLUMN = "C6.3_C2_What were your organization’s gross global Scope 2 emissions in metric tons CO2e? - Scope 2, market-based (if applicable)"
+CF3_COLUMNS_2018 = [
+    "C6.5_C1_Account for your organization’s Scope 3 emissions, disclosing and explaining any exclusions. - Evaluation status",
+    "C6.5_C2_Account for your organization’s Scope 3 emissions, disclosing and explaining any exclusions. - Metric tonnes CO2e",
+]
+CF3_COLUMNS_2020 = [
+    "C6.5_C1_Account for your organization’s gross global Scope 3 emissions, disclosing and explaining any exclusions. - Evaluation status",
+    "C6.5_C2_Account for your organization’s gross global Scope 3 emissions, disclosing and explaining any exclusions. - Metric tonnes CO2e",
+]
+CF3_COLUMNS_2022 = [
+    "C6.5_C1_Account for your organization’s gross global Scope 3 emissions, disclosing and explaining any exclusions. - Evaluation status",
+    "C6.5_C2_Account for your organization’s gross global Scope 3 emissions, disclosing and explaining any exclusions. - Emissions in reporting year (metric tons CO2e)",
+]
+
+
+@dataclass(frozen=True)
+class YearSpec:
+    """
+    Description of a C-format CDP questionnaire year (2018 onwards): where each piece of
+    information is found in the workbook, and the few treatments specific to the year.
+    The cleaned dataset of a year is built from its spec by GetYear (src/get_year_spec.py).
+
+    Attributes:
+    - year (int): The questionnaire year.
+    - base_sheet (str): Sheet of the accounts information.
+    - col_boundary (str): Column of the reporting boundary.
+    - col_CF3_evaluation (str): Column of the Scope 3 evaluation status (C6.5 sheet).
+    - col_CF3_metric (str): Column of the Scope 3 emissions (C6.5 sheet).
+    - boundary_sheet (str, optional): Sheet of the reporting boundary, None if it is in the
+      base sheet.
+    - countries_sheet, col_countries (str, optional): Sheet and column of the covered
+      countries, None if the questionnaire does not have them.
+    - join_base_sheet (bool, optional): If True, every column of the base sheet is joined,
+      otherwise only its boundary column.
+    - renames (dict, optional): Columns renamed after the join, before the final cleaning.
+    - missing_columns (tuple, optional): Columns missing from the questionnaire, set to NaN.
+    - CF3_not_applicable_as_zero (bool, optional): If True, 'Question not applicable'
+      Scope 3 emissions count as 0.
+    - attribute_CF3_to_last_year (bool, optional): If True, Scope 3 emissions are only kept
+      for the last accounting year of each account (see attribute_CF3_to_last_year).
+    """
+
+    year: int
+    base_sheet: str
+    col_boundary: str
+    col_CF3_evaluation: str
+    col_CF3_metric: str
+    boundary_sheet: str = None
+    countries_sheet: str = None
+    col_countries: str = None
+    join_base_sheet: bool = False
+    renames: dict = field(default_factory=dict)
+    missing_columns: tuple = ()
+    CF3_not_applicable_as_zero: bool = True
+    attribute_CF3_to_last_year: bool = True
+    years_sheet: str = "C0.2"
+    CF1_sheet: str = "C6.1"
+    CF2_sheet: str = "C6.3"
+    CF3_sheet: str = "C6.5"
+    col_CF1: str = CF1_COLUMN
+    col_CF2_location: str = CF2_LOCATION_COLUMN
+    col_CF2_market: str = CF2_MARKET_COLUMN
+
+    @property
+    def useful_sheets(self):
+        """
+        Sheets read for the year, mapped to the columns to keep (None keeps every column).
+        """
+        sheets = {
+            self.base_sheet: (
+                None if self.join_base_sheet else ["Account number", self.col_boundary]
+            ),
+            self.years_sheet: None,
+        }
+        if self.countries_sheet:
+            sheets[self.countries_sheet] = ["Account number", self.col_countries]
+        if self.boundary_sheet:
+            sheets[self.boundary_sheet] = ["Account number", self.col_boundary]
+        sheets[self.CF1_sheet] = ["Account number", "Row", self.col_CF1]
+        sheets[self.CF2_sheet] = [
+            "Account number",
+            "Row",
+            self.col_CF2_location,
+            self.col_CF2_market,
+        ]
+        sheets[self.CF3_sheet] = [
+            "Account number",
+            self.col_CF3_evaluation,
+            self.col_CF3_metric,
+        ]
+        return sheets
+
+
+YEAR_SPECS = {
+    2018: YearSpec(
+        year=2018,
+        base_sheet="C0 - Introduction",
+        col_boundary=BOUNDARY_COLUMN_2018,
+        countries_sheet="C0.3",
+        col_countries=COUNTRIES_COLUMN_2018,
+        col_CF3_evaluation=CF3_COLUMNS_2018[0],
+        col_CF3_metric=CF3_COLUMNS_2018[1],
+        CF3_not_applicable_as_zero=False,
+    ),
+    2019: YearSpec(
+        year=2019,
+        base_sheet="C0 - Introduction",
+        col_boundary=BOUNDARY_COLUMN_2018,
+        countries_sheet="C0.3",
+        col_countries=COUNTRIES_COLUMN_2018,
+        col_CF3_evaluation=CF3_COLUMNS_2018[0],
+        col_CF3_metric=CF3_COLUMNS_2018[1],
+    ),
+    2020: YearSpec(
+        year=2020,
+        base_sheet="C0 - Introduction",
+        col_boundary=BOUNDARY_COLUMN_2020,
+        col_CF3_evaluation=CF3_COLUMNS_2020[0],
+        col_CF3_metric=CF3_COLUMNS_2020[1],
+        missing_columns=("covered_countries",),
+        attribute_CF3_to_last_year=False,
+    ),
+    2021: YearSpec(
+        year=2021,
+        base_sheet="C0 - Introduction",
+        col_boundary=BOUNDARY_COLUMN_2020,
+        col_CF3_evaluation=CF3_COLUMNS_2020[0],
+        col_CF3_metric=CF3_COLUMNS_2020[1],
+        missing_columns=("covered_countries", "isin", "ticker"),
+    ),
+    2022: YearSpec(
+        year=2022,
+        base_sheet="C0 - Introduction",
+        join_base_sheet=True,
+        boundary_sheet="C0.5",
+        col_boundary=BOUNDARY_COLUMN_2020,
+        countries_sheet="C0.3",
+        col_countries=COUNTRIES_COLUMN_2022,
+        col_CF3_evaluation=CF3_COLUMNS_2022[0],
+        col_CF3_metric=CF3_COLUMNS_2022[1],
+    ),
+    2023: YearSpec(
+        year=2023,
+        base_sheet="Summary Data",
+        join_base_sheet=True,
+        boundary_sheet="C0.5",
+        col_boundary=BOUNDARY_COLUMN_2020,
+        countries_sheet="C0.3",
+        col_countries=COUNTRIES_COLUMN_2022,
+        col_CF3_evaluation=CF3_COLUMNS_2022[0],
+        col_CF3_metric=CF3_COLUMNS_2022[1],
+        renames={"Country/Area_x": "Country/Areas_x", "Primary ISIN_x": "ISINs"},
+        missing_columns=("Tickers",),
+    ),
+}
@@ -0,0 +1,190 @@
+import numpy as np
+import pandas as pd
+
+from src.get_year_functions import get_raw_file_path
+from src.sheets_manifest import (
+    USEFUL_SHEETS,
+    LEGACY_CF1_COLUMNS,
+    LEGACY_CF2_COLUMNS,
+    LEGACY_CF3_COLUMNS,
+)
+from src.year_specs import YEAR_SPECS
+
+START_DATE_COLUMN = "C0.2_C1_State the start and end date of the year for which you are reporting data. - Start date"
+END_DATE_COLUMN = "C0.2_C2_State the start and end date of the year for which you are reporting data. - End date"
+STATUSES = [
+    "Relevant, calculated",
+    "Not relevant, calculated",
+    "Not evaluated",
+    "Question not applicable",
+]
+COUNTRIES = ["France", "USA", "Canada", "United Kingdom", "Germany"]
+# Accounts of the 2018 corrections table, with the rows it drops or overrides
+CORRECTED_ACCOUNTS_2018 = {22698: 4, 8051: 4, 18436: 2}
+
+
+def make_C_format_sheets(year, rng, n_accounts):
+    """
+    Builds the useful sheets of a C-format questionnaire year (2018 onwards).
+    """
+    spec = YEAR_SPECS[year]
+    accounts = rng.choice(np.arange(1000, 9000), n_accounts, replace=False).tolist()
+    dict_n_rows = {account: int(rng.integers(1, 4)) for account in accounts}
+    if year == 2018:
+        dict_n_rows.update(CORRECTED_ACCOUNTS_2018)
+    # Accounts reporting in the previous questionnaires are duplicated in the panel
+    dict_n_rows.update({10 + i: 2 for i in range(3)})
+    rows = [
+        (account, row)
+        for account, n_rows in dict_n_rows.items()
+        for row in range(1, n_rows + 1)
+    ]
+    all_accounts = list(dict_n_rows)
+    col_country = {2022: "Country/Areas", 2023: "Country/Area"}.get(year, "Country")
+    df_accounts = pd.DataFrame(
+        {
+            "Account number": all_accounts,
+            "Organization": [f"Org {account}" for account in all_accounts],
+            col_country: rng.choice(COUNTRIES, len(all_accounts)),
+            "Primary activity": rng.choice(["A", "B"], len(all_accounts)),
+            "Primary sector": rng.choice(["S1", "S2"], len(all_accounts)),
+            "Primary industry": rng.choice(["I1", "I2"], len(all_accounts)),
+        }
+    )
+    isins = [f"ISIN{account}" for account in all_accounts]
+    tickers = [f"T{account}" for account in all_accounts]
+    if year == 2023:
+        df_accounts["Primary ISIN"] = isins
+    elif year < 2021:
+        df_accounts["ISINs"] = isins
+        df_accounts["Tickers"] = tickers
+
+    df_rows = pd.DataFrame(rows, columns=["Account number", "Row"])
+    end_dates = pd.to_datetime(
+        (year - df_rows["Row"]).astype(str) + "-12-31", format="%Y-%m-%d"
+    )
+    df_years = df_rows.merge(df_accounts, on="Account number")
+    df_years[START_DATE_COLUMN] = (end_dates - pd.Timedelta(days=364)).dt.strftime(
+        "%Y-%m-%d"
+    )
+    df_years[END_DATE_COLUMN] = end_dates.dt.strftime("%Y-%m-%d")
+
+    df_boundary = pd.DataFrame(
+        {
+            "Account number": all_accounts,
+            spec.col_boundary: rng.choice(
+                ["Operational control", "Financial control"], len(all_accounts)
+            ),
+        }
+    )
+    if year == 2022:
+        # The 2022 identifiers are only in the base sheet
+        df_base = df_accounts.assign(ISINs=isins, Tickers=tickers)
+    elif spec.join_base_sheet:
+        df_base = df_accounts
+    else:
+        df_base = df_boundary.copy()
+    sheets = {
+        spec.base_sheet: df_base,
+        spec.years_sheet: df_years,
+    }
+    if spec.countries_sheet:
+        sheets[spec.countries_sheet] = pd.DataFrame(
+            {
+                "Account number": all_accounts,
+                spec.col_countries: rng.choice(COUNTRIES, len(all_accounts)),
+            }
+        )
+    if spec.boundary_sheet:
+        sheets[spec.boundary_sheet] = df_boundary
+    sheets[spec.CF1_sheet] = df_rows.assign(
+        **{spec.col_CF1: rng.random(len(df_rows)).round(3) * 1e5}
+    )
+    sheets[spec.CF2_sheet] = df_rows.assign(
+        **{
+            spec.col_CF2_location: rng.random(len(df_rows)).round(3) * 1e4,
+            spec.col_CF2_market: rng.choice(
+                [1.5, "Question not applicable"], len(df_rows)
+            ),
+        }
+    )
+    df_CF3 = pd.DataFrame({"Account number": np.repeat(all_accounts, 4)})
+    df_CF3[spec.col_CF3_evaluation] = rng.choice(STATUSES, len(df_CF3))
+    # 'Question not applicable' Scope 3 emissions are left blank in 2018
+    not_applicable = np.nan if year == 2018 else "Question not applicable"
+    df_CF3[spec.col_CF3_metric] = rng.choice(
+        np.array([10.0, 2.5, not_applicable], dtype=object), len(df_CF3)
+    )
+    sheets[spec.CF3_sheet] = df_CF3
+    return sheets
+
+
+def make_legacy_sheets(year, rng, n_accounts):
+    """
+    Builds the useful sheets of the 2016 or 2017 questionnaire.
+    """
+    accounts = rng.choice(np.arange(1000, 9000), n_accounts, replace=False).tolist()
+    accounts += [10 + i for i in range(3)]
+    accounting_years = rng.choice([year - 2, year - 1], len(accounts))
+    df_CF1 = pd.DataFrame(
+        {
+            "account_id": accounts,
+            "account_name": [f"Org {account}" for account in accounts],
+            "incorporated_country": rng.choice(COUNTRIES, len(accounts)),
+            "ticker": [f"T{account}" for account in accounts],
+            "isin": [f"ISIN{account}" for account in accounts],
+            "accounting_year": accounting_years,
+            LEGACY_CF1_COLUMNS[6]: rng.choice(
+                ["Operational control", "Equity share"], len(accounts)
+            ),
+            LEGACY_CF1_COLUMNS[7]: rng.random(len(accounts)).round(3) * 1e5,
+        }
+    )
+    df_CF2 = pd.DataFrame(
+        {
+            "account_id": accounts,
+            "accounting_year": accounting_years,
+            LEGACY_CF2_COLUMNS[2]: rng.random(len(accounts)).round(3),
+            LEGACY_CF2_COLUMNS[3]: rng.random(len(accounts)).round(3),
+        }
+    )
+    # One account out of three has an incomplete Scope 3 submission
+    n_CF3_rows = [17 if i % 3 else 16 for i in range(len(accounts))]
+    df_CF3 = pd.DataFrame(
+        {
+            "account_id": np.repeat(accounts, n_CF3_rows),
+            "accounting_year": np.repeat(accounting_years, n_CF3_rows),
+        }
+    )
+    df_CF3[LEGACY_CF3_COLUMNS[2]] = rng.choice(STATUSES, len(df_CF3))
+    df_CF3[LEGACY_CF3_COLUMNS[3]] = rng.random(len(df_CF3)).round(3) * 1e3
+    df_countries = pd.DataFrame(
+        {
+            "account_id": np.repeat(accounts, 2),
+            "question": "CC0.3",
+            "country_1": rng.choice(COUNTRIES, 2 * len(accounts)),
+            "country_2": rng.choice(COUNTRIES + [None], 2 * len(accounts)),
+        }
+    )
+    return dict(zip(USEFUL_SHEETS[year], [df_countries, df_CF1, df_CF2, df_CF3]))
+
+
+def write_synthetic_workbooks(path_raw_data, years, n_accounts=6):
+    """
+    Writes small synthetic CDP workbooks of the given years (2016 onwards), with the
+    sheets and columns read by the year pipelines.
+
+    Parameters:
+    - path_raw_data (str): Directory where the workbooks are written.
+    - years (list): The questionnaire years.
+    - n_accounts (int, optional): Number of random accounts of each year. Defaults to 6.
+    """
+    for year in years:
+        rng = np.random.default_rng(year)
+        if year in YEAR_SPECS:
+            sheets = make_C_format_sheets(year, rng, n_accounts)
+        else:
+            sheets = make_legacy_sheets(year, rng, n_accounts)
+        with pd.ExcelWriter(get_raw_file_path(year, path_raw_data)) as writer:
+            for sheet_name, df_sheet in sheets.items():
+                df_sheet.to_excel(writer, sheet_name=sheet_name, index=False)
@@ -0,0 +1,154 @@
+import hashlib
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from pandas.testing import assert_frame_equal
+
+from src.cache import (
+    file_sha256,
+    write_frame,
+    write_absent_marker,
+    read_frame,
+    raw_sheet_cache_path,
+    clean_year_fingerprint,
+    load_clean_year,
+    save_clean_year,
+    invalidate_clean_years,
+    read_clean_years_manifest,
+    save_panel_state,
+    load_panel_state,
+)
+
+
+class TestFileSha256(unittest.TestCase):
+    def test_file_sha256(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "file.bin")
+            with open(file_path, "wb") as f:
+                f.write(b"CDP")
+            self.assertEqual(file_sha256(file_path), hashlib.sha256(b"CDP").hexdigest())
+
+
+class TestWriteReadFrame(unittest.TestCase):
+    def test_parquet_round_trip(self):
+        df = pd.DataFrame({"Account number": [1, 2], "Row": [1.0, np.nan]})
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "sheet")
+            self.assertTrue(write_frame(df, file_path).endswith(".parquet"))
+            assert_frame_equal(read_frame(file_path), df)
+
+    def test_mixed_types_round_trip(self):
+        # Mixed object columns cannot be stored in parquet and are pickled instead
+        df = pd.DataFrame({"CDP_CF1": pd.Series([1.5, "Question not applicable"])})
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "sheet")
+            self.assertTrue(write_frame(df, file_path).endswith(".pkl"))
+            assert_frame_equal(read_frame(file_path), df)
+
+    def test_missing_frame(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.assertIsNone(read_frame(os.path.join(tmp_dir, "sheet")))
+
+    def test_absent_marker(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "raw_sheets", "abc", "sheet")
+            self.assertEqual(write_absent_marker(file_path), f"{file_path}.absent")
+            self.assertTrue(os.path.exists(f"{file_path}.absent"))
+
+
+class TestRawSheetCachePath(unittest.TestCase):
+    def test_raw_sheet_cache_path(self):
+        path = raw_sheet_cache_path("cache", "abc", "C6.1", ["Row", "Account number"])
+        self.assertEqual(
+            path,
+            raw_sheet_cache_path("cache", "abc", "C6.1", ["Account number", "Row"]),
+        )
+        self.assertNotEqual(path, raw_sheet_cache_path("cache", "abc", "C6.1", None))
+        self.assertNotEqual(path, raw_sheet_cache_path("cache", "def", "C6.1", None))
+
+
+class TestCleanYearCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path_cache = self.tmp_dir.name
+        self.raw_file_path = os.path.join(self.tmp_dir.name, "raw.xlsx")
+        with open(self.raw_file_path, "wb") as f:
+            f.write(b"raw")
+        self.df = pd.DataFrame({"account_id": [1], "questionnaire_year": [2022]})
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_clean_year_fingerprint(self):
+        fingerprint = clean_year_fingerprint(self.raw_file_path, ["src.get_year"])
+        self.assertEqual(
+            fingerprint, clean_year_fingerprint(self.raw_file_path, ["src.get_year"])
+        )
+        self.assertNotEqual(
+            fingerprint, clean_year_fingerprint(self.raw_file_path, ["src.cache"])
+        )
+
+    def test_clean_year_fingerprint_data_files(self):
+        data_file_path = os.path.join(self.path_cache, "corrections_2022.csv")
+        fingerprint = clean_year_fingerprint(
+            self.raw_file_path, ["src.get_year"], data_files=[data_file_path]
+        )
+        # Missing data files are ignored
+        self.assertEqual(
+            fingerprint, clean_year_fingerprint(self.raw_file_path, ["src.get_year"])
+        )
+        with open(data_file_path, "w") as f:
+            f.write("operation,account_id,row,accounting_year,column,value\n")
+        self.assertNotEqual(
+            fingerprint,
+            clean_year_fingerprint(
+                self.raw_file_path, ["src.get_year"], data_files=[data_file_path]
+            ),
+        )
+
+    def test_hits_and_misses(self):
+        self.assertIsNone(load_clean_year(self.path_cache, 2022, "a"))
+        save_clean_year(self.path_cache, 2022, "a", self.df)
+        assert_frame_equal(load_clean_year(self.path_cache, 2022, "a"), self.df)
+        self.assertIsNone(load_clean_year(self.path_cache, 2022, "b"))
+
+        manifest = read_clean_years_manifest(self.path_cache)
+        self.assertEqual(manifest.loc[2022, "hits"], 1)
+        self.assertEqual(manifest.loc[2022, "misses"], 2)
+        self.assertEqual(manifest.loc[2022, "last_status"], "miss")
+
+    def test_invalidate_clean_years(self):
+        save_clean_year(self.path_cache, 2021, "a", self.df)
+        save_clean_year(self.path_cache, 2022, "a", self.df)
+        self.assertEqual(invalidate_clean_years(self.path_cache, [2021]), [2021])
+        self.assertIsNone(load_clean_year(self.path_cache, 2021, "a"))
+        self.assertIsNotNone(load_clean_year(self.path_cache, 2022, "a"))
+        self.assertEqual(invalidate_clean_years(self.path_cache), [2021, 2022])
+        self.assertIsNone(load_clean_year(self.path_cache, 2022, "a"))
+
+
+class TestPanelState(unittest.TestCase):
+    def test_save_load_panel_state(self):
+        df = pd.DataFrame(
+            {
+                "account_id": [1, 2],
+                "CDP_CF1": [1.5, np.nan],
+                "country": pd.Categorical(["France", None]),
+            }
+        )
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.assertIsNone(load_panel_state(tmp_dir))
+            save_panel_state(tmp_dir, {"years": {"2022": "a"}}, df, df.iloc[:1])
+            state, df_deduplicated, df_imputed = load_panel_state(tmp_dir)
+        self.assertEqual(state["years"], {"2022": "a"})
+        self.assertIn("built", state)
+        assert_frame_equal(df_deduplicated, df)
+        assert_frame_equal(df_imputed, df.iloc[:1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.corrections import (
+    CORRECTIONS_COLUMNS,
+    corrections_path,
+    load_corrections,
+    apply_corrections,
+)
+
+
+class TestLoadCorrections(unittest.TestCase):
+    def test_load_corrections(self):
+        df_corrections = load_corrections(2018)
+        self.assertEqual(df_corrections.columns.tolist(), CORRECTIONS_COLUMNS)
+        self.assertEqual((df_corrections["operation"] == "drop").sum(), 13)
+        self.assertEqual(df_corrections["account_id"].dtype, "Int64")
+
+    def test_missing_table(self):
+        df_corrections = load_corrections(2023)
+        self.assertTrue(df_corrections.empty)
+        self.assertEqual(df_corrections.columns.tolist(), CORRECTIONS_COLUMNS)
+
+    def test_unknown_operation(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with open(corrections_path(2022, tmp_dir), "w") as f:
+                f.write("operation,account_id,row,accounting_year,column,value\n")
+                f.write("delete,1,,,,\n")
+            with self.assertRaises(ValueError):
+                load_corrections(2022, tmp_dir)
+
+
+class TestApplyCorrections(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                "Account number": [1, 1, 1, 2, 2],
+                "Row": [1.0, 2.0, 3.0, 1.0, np.nan],
+                "accounting_year": [2017, 2017, 2017, 2016, 2015],
+                "account_name": ["A", "A", "A", "B", "B"],
+                "CDP_CF1": [1.0, 2.0, 3.0, 4.0, 5.0],
+            }
+        )
+        self.df_corrections = pd.DataFrame(
+            [
+                ["drop", 1, 3, None, None, None],
+                ["drop", 2, None, 2015, None, None],
+                ["override", 1, 2, None, "accounting_year", "2016"],
+                ["override", 1, 2, None, "CDP_CF1", "20.5"],
+                ["insert", 3, None, 2017, "account_name", "C"],
+                ["insert", 3, None, 2017, "CDP_CF1", "7"],
+            ],
+            columns=CORRECTIONS_COLUMNS,
+        ).astype({"account_id": "Int64", "row": "Int64", "accounting_year": "Int64"})
+        self.keys = {"account_id": "Account number", "row": "Row"}
+
+    def test_apply_corrections(self):
+        result = apply_corrections(self.df, self.df_corrections, self.keys)
+        self.assertEqual(result["Account number"].tolist(), [1, 1, 2, 3])
+        self.assertEqual(result["accounting_year"].tolist(), [2017, 2016, 2016, 2017])
+        self.assertEqual(result["CDP_CF1"].tolist(), [1.0, 20.5, 4.0, 7.0])
+        self.assertEqual(result["account_name"].tolist(), ["A", "A", "B", "C"])
+        self.assertTrue(np.isnan(result["Row"].iloc[-1]))
+        self.assertEqual(result["accounting_year"].dtype, np.int64)
+        self.assertEqual(result["CDP_CF1"].dtype, np.float64)
+        # The input dataset is not modified
+        self.assertEqual(len(self.df), 5)
+        self.assertEqual(self.df.loc[1, "CDP_CF1"], 2.0)
+
+    def test_no_corrections(self):
+        result = apply_corrections(self.df, self.df_corrections.iloc[:0], self.keys)
+        pd.testing.assert_frame_equal(result, self.df)
+
+    def test_missing_key(self):
+        with self.assertRaises(ValueError):
+            apply_corrections(self.df.drop(columns="Row"), self.df_corrections)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from src.countries import (
+    COUNTRY_NAMES,
+    COUNTRY_ISO_CODES,
+    normalize_country_name,
+    canonicalize_countries,
+    canonicalize_covered_countries,
+    country_iso_codes,
+)
+
+
+class TestCountryLookup(unittest.TestCase):
+    def test_lookup(self):
+        self.assertEqual(COUNTRY_NAMES["usa"], "United States of America")
+        self.assertEqual(COUNTRY_NAMES["us"], "United States of America")
+        self.assertEqual(COUNTRY_NAMES["na"], "Namibia")
+        self.assertEqual(
+            COUNTRY_NAMES[
+                normalize_country_name(
+                    "United Kingdom of Great Britain and  Northern Ireland"
+                )
+            ],
+            "United Kingdom",
+        )
+        # Canonical names and ISO codes are unique
+        self.assertEqual(len(set(COUNTRY_ISO_CODES.values())), len(COUNTRY_ISO_CODES))
+        self.assertTrue(set(COUNTRY_NAMES.values()) <= set(COUNTRY_ISO_CODES))
+
+
+class TestCanonicalizeCountries(unittest.TestCase):
+    def test_canonicalize_countries(self):
+        series = pd.Series(["USA", "hong kong", np.nan, "Other, please specify"])
+        result = canonicalize_countries(series)
+        self.assertEqual(result.dtype, series.dtype)
+        self.assertEqual(result.tolist()[:2], ["United States of America", "Hong Kong"])
+        self.assertTrue(pd.isna(result.iloc[2]))
+        self.assertEqual(result.iloc[3], "Other, please specify")
+
+    def test_baseline_spellings(self):
+        # Names published before the table was introduced are kept as they are
+        series = pd.Series(
+            ["Turkey", "Hong Kong", "Taiwan", "Vietnam", "United Kingdom", "France"]
+        )
+        self.assertEqual(canonicalize_countries(series).tolist(), series.tolist())
+        series = pd.Series(["Türkiye", "Viet Nam", "Taiwan, Greater China"])
+        self.assertEqual(
+            canonicalize_countries(series).tolist(), ["Turkey", "Vietnam", "Taiwan"]
+        )
+
+    def test_canonicalize_covered_countries(self):
+        series = pd.Series(
+            ['["Russia","France"]', '["France"]', "Czech Republic", None]
+        )
+        result = canonicalize_covered_countries(series)
+        self.assertEqual(
+            result.tolist()[:3],
+            ['["Russian Federation","France"]', '["France"]', "Czechia"],
+        )
+        self.assertTrue(pd.isna(result.iloc[3]))
+
+    def test_country_iso_codes(self):
+        series = pd.Series(
+            ["France", "Turkey", "France", None], dtype="category", name="country"
+        )
+        result = country_iso_codes(series)
+        self.assertEqual(result.name, "country_iso")
+        self.assertEqual(result.tolist()[:3], ["FRA", "TUR", "FRA"])
+        self.assertEqual(result.cat.categories.tolist(), ["FRA", "TUR"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,20 +1,252 @@
+import contextlib
+import io
+import os
+import tempfile
 import unittest
+import unittest.mock
 import pandas as pd
 import numpy as np
 
 from pandas.testing import assert_frame_equal, assert_series_equal
 
+from src.get_2016 import Get2016
+from src.get_year_spec import GetYear
+from src.year_specs import YEAR_SPECS
 from src.get_year_functions import (
+    read_sheets,
+    resolve_engine,
+    compare_engines,
+    stream_scope_3,
+    filter_complete_scope_3,
     str_to_accounting_year,
+    dates_to_accounting_year,
     keep_main_boundary,
     dict_to_relevance,
+    calculate_relevance,
+    counts_to_relevance,
+    scope_3_relevance,
+    join_sheets,
     preprocess_covered_countries,
     preprocess_accounting_years,
     attribute_CF3_to_last_year,
     common_final_cleaning,
+    composite_key,
 )
 
 
+class TestReadSheets(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp_dir.name, "workbook.xlsx")
+        with pd.ExcelWriter(self.file_path) as writer:
+            pd.DataFrame({"Account number": [1, 2], "Row": [1, 1]}).to_excel(
+                writer, sheet_name="C6.1", index=False
+            )
+            pd.DataFrame({"Account number": [3]}).to_excel(
+                writer, sheet_name="C6.3", index=False
+            )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_read_sheets(self):
+        result = read_sheets(self.file_path, {"C6.3": None, "C6.1": None})
+        self.assertEqual(list(result.keys()), ["C6.3", "C6.1"])
+        self.assertEqual(result["C6.1"].columns.tolist(), ["Account number", "Row"])
+        self.assertEqual(len(result["C6.3"]), 1)
+
+    def test_columns_projection(self):
+        result = read_sheets(self.file_path, {"C6.1": ["Row", "Not in sheet"]})
+        self.assertEqual(result["C6.1"].columns.tolist(), ["Row"])
+        self.assertEqual(result["C6.1"]["Row"].tolist(), [1, 1])
+
+    def test_missing_sheets(self):
+        sheets_columns = {"C6.1": None, "C0.3": None}
+        result = read_sheets(self.file_path, sheets_columns, optional_sheets=["C0.3"])
+        self.assertIsNone(result["C0.3"])
+        with self.assertRaises(ValueError):
+            read_sheets(self.file_path, sheets_columns)
+
+    def test_cached_sheets(self):
+        path_cache_data = os.path.join(self.tmp_dir.name, "cache")
+        sheets_columns = {"C6.1": ["Account number"], "C0.3": None}
+        result = read_sheets(
+            self.file_path,
+            sheets_columns,
+            optional_sheets=["C0.3"],
+            path_cache_data=path_cache_data,
+        )
+        # The workbook cannot be parsed anymore, sheets have to come from the cache
+        with unittest.mock.patch("pandas.ExcelFile", side_effect=AssertionError):
+            cached = read_sheets(
+                self.file_path,
+                sheets_columns,
+                optional_sheets=["C0.3"],
+                path_cache_data=path_cache_data,
+            )
+        assert_frame_equal(cached["C6.1"], result["C6.1"])
+        self.assertIsNone(cached["C0.3"])
+
+    def test_cached_absent_sheet_first(self):
+        # The marker of an absent sheet can be the first file cached for the workbook
+        path_cache_data = os.path.join(self.tmp_dir.name, "cache")
+        result = read_sheets(
+            self.file_path,
+            {"C0.3": None},
+            optional_sheets=["C0.3"],
+            path_cache_data=path_cache_data,
+        )
+        self.assertIsNone(result["C0.3"])
+        with unittest.mock.patch("pandas.ExcelFile", side_effect=AssertionError):
+            cached = read_sheets(
+                self.file_path,
+                {"C0.3": None},
+                optional_sheets=["C0.3"],
+                path_cache_data=path_cache_data,
+            )
+        self.assertIsNone(cached["C0.3"])
+
+    def test_concurrent_sheets(self):
+        sheets_columns = {"C6.3": None, "C0.3": None, "C6.1": ["Row"]}
+        result = read_sheets(self.file_path, sheets_columns, optional_sheets=["C0.3"])
+        concurrent = read_sheets(
+            self.file_path, sheets_columns, optional_sheets=["C0.3"], sheet_workers=2
+        )
+        self.assertEqual(list(concurrent.keys()), ["C6.3", "C0.3", "C6.1"])
+        assert_frame_equal(concurrent["C6.3"], result["C6.3"])
+        assert_frame_equal(concurrent["C6.1"], result["C6.1"])
+        self.assertIsNone(concurrent["C0.3"])
+
+
+class TestExcelEngines(unittest.TestCase):
+    def test_resolve_engine(self):
+        self.assertEqual(resolve_engine(None), "openpyxl")
+        with unittest.mock.patch("importlib.util.find_spec", return_value=None):
+            self.assertEqual(resolve_engine("calamine"), "openpyxl")
+        with self.assertRaises(ValueError):
+            resolve_engine("xlrd2")
+
+    def test_compare_engines(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "workbook.xlsx")
+            pd.DataFrame({"Account number": [1, 2]}).to_excel(
+                file_path, sheet_name="C6.1", index=False
+            )
+            result = compare_engines(
+                file_path, {"C6.1": ["Account number"], "C0.3": None}, ["openpyxl"]
+            )
+        self.assertEqual(result.index.tolist(), ["C6.1", "total"])
+        self.assertEqual(result.columns.tolist(), ["openpyxl"])
+
+
+class TestStreamScope3(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp_dir.name, "workbook.xlsx")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_stream_scope_3(self):
+        get_2019 = GetYear(YEAR_SPECS[2019])
+        df_CF3 = pd.DataFrame(
+            {
+                "Account number": [1, 1, 1, 2, 2, 3],
+                get_2019.col_CF3_evaluation: [
+                    "Relevant, calculated",
+                    "Not evaluated",
+                    None,
+                    "Question not applicable",
+                    None,
+                    "Not relevant, calculated",
+                ],
+                get_2019.col_CF3_metric: [
+                    10,
+                    "Question not applicable",
+                    5.5,
+                    None,
+                    1,
+                    2,
+                ],
+            }
+        )
+        df_CF3.to_excel(self.file_path, sheet_name="C6.5", index=False)
+
+        result = stream_scope_3(
+            self.file_path,
+            "C6.5",
+            ["Account number"],
+            get_2019.col_CF3_metric,
+            get_2019.col_CF3_evaluation,
+        )
+        result["CF3_relevance"] = result["CF3_relevance"].fillna(0)
+        ground_truth = get_2019.get_scopes_3(pd.read_excel(self.file_path))
+        assert_frame_equal(result, ground_truth, check_dtype=False)
+
+    def test_stream_scope_3_completeness_filter(self):
+        get_2016 = Get2016()
+        n_rows = 17
+        df_CF3 = pd.DataFrame(
+            {
+                "account_id": [1] * n_rows + [2] * (n_rows - 1),
+                "account_name": ["Org1"] * n_rows + ["Org2"] * (n_rows - 1),
+                "accounting_year": 2015,
+                get_2016.col_CF3_evaluation: ["Relevant, calculated", "Not evaluated"]
+                * (n_rows - 1)
+                + ["Not evaluated"],
+                get_2016.col_CF3_metric: np.arange(2 * n_rows - 1, dtype=float),
+            }
+        )
+        df_CF3.to_excel(self.file_path, sheet_name="CC14.1", index=False)
+
+        result = stream_scope_3(
+            self.file_path,
+            "CC14.1",
+            ["account_id", "accounting_year"],
+            get_2016.col_CF3_metric,
+            get_2016.col_CF3_evaluation,
+            col_count="account_id",
+        ).reset_index()
+        ground_truth = get_2016.get_scopes_3(pd.read_excel(self.file_path))
+        assert_frame_equal(result, ground_truth, check_dtype=False)
+
+
+class TestFilterCompleteScope3(unittest.TestCase):
+    def test_filter_complete_scope_3(self):
+        n_categories = 17
+        df_CF3 = pd.DataFrame(
+            {
+                # Accounts 1 and 2 share their name, account 3 has a duplicated row
+                "account_id": [1] * n_categories
+                + [2] * (n_categories - 2)
+                + [3] * (n_categories + 1)
+                + [np.nan],
+                "account_name": ["Org"] * (2 * n_categories - 2)
+                + ["Org3"] * (n_categories + 1)
+                + ["Org4"],
+            }
+        )
+        result, report = filter_complete_scope_3(df_CF3)
+        self.assertEqual(result["account_id"].unique().tolist(), [1])
+        self.assertEqual(len(result), n_categories)
+        self.assertEqual(report.index.tolist(), [2, 3])
+        self.assertEqual(report["n_rows"].tolist(), [15, 18])
+        self.assertEqual(report["missing_rows"].tolist(), [2, -1])
+
+        # The expected number of categories is a parameter
+        result, report = filter_complete_scope_3(df_CF3, n_categories=15)
+        self.assertEqual(result["account_id"].unique().tolist(), [2])
+        self.assertEqual(report.index.tolist(), [1, 3])
+
+        # The number of ignored accounts is printed with the label
+        with contextlib.redirect_stdout(io.StringIO()) as stdout:
+            filter_complete_scope_3(df_CF3, label=2016)
+        self.assertEqual(
+            stdout.getvalue(),
+            "2016 - 2 accounts with an incomplete Scope 3 submission ignored\n",
+        )
+
+
 class TestPreprocessCoveredCountries(unittest.TestCase):
     def test_preprocess_covered_countries(self):
         # Create a sample DataFrame with covered countries data
@@ -39,6 +271,15 @@ class TestPreprocessCoveredCountries(unittest.TestCase):
         ground_truth = pd.DataFrame(data)
         assert_frame_equal(result, ground_truth)
 
+    def test_preprocess_covered_countries_empty(self):
+        data = {
+            "account_id": [1, 2, 2],
+            "country_1": [None, None, "France"],
+            "country_2": [None, None, None],
+        }
+        result = preprocess_covered_countries(pd.DataFrame(data))
+        self.assertEqual(result["covered_countries"].tolist(), ["[]", '["","France"]'])
+
 
 class TestStrToAccountingYear(unittest.TestCase):
     def test_valid_dates(self):
@@ -70,6 +311,33 @@ class TestStrToAccountingYear(unittest.TestCase):
         )  # Invalid format
 
 
+class TestDatesToAccountingYear(unittest.TestCase):
+    def test_dates_to_accounting_year(self):
+        rng = np.random.default_rng(0)
+        dates = pd.Series(
+            pd.to_datetime("2008-01-01")
+            + pd.to_timedelta(rng.integers(0, 365 * 18, 1000), unit="D")
+        )
+        ground_truth = (
+            dates.dt.strftime("%Y%m%d").astype("int64").apply(str_to_accounting_year)
+        )
+        assert_series_equal(dates_to_accounting_year(dates), ground_truth)
+
+    def test_parameters(self):
+        dates = pd.Series(pd.to_datetime(["2020-03-31", "2020-04-01", pd.NaT]))
+        assert_series_equal(
+            dates_to_accounting_year(dates, cutoff_month=4, min_year=2019),
+            pd.Series([2019.0, 2020.0, np.nan]),
+        )
+        assert_series_equal(
+            dates_to_accounting_year(dates[:2], cutoff_month=4, max_year=2019),
+            pd.Series([2019.0, np.nan]),
+        )
+        assert_series_equal(
+            dates_to_accounting_year(dates[:2], cutoff_month=1), pd.Series([2020, 2020])
+        )
+
+
 class TestPreprocessAccountingYears(unittest.TestCase):
     def test_preprocess_accounting_years(self):
         # Create a sample DataFrame with accounting year data
@@ -146,6 +414,120 @@ class TestDictToRelevance(unittest.TestCase):
         self.assertEqual(dict_to_relevance(dict_test), 0)  # Invalid key format
 
 
+class TestCountsToRelevance(unittest.TestCase):
+    def test_counts_to_relevance(self):
+        rng = np.random.default_rng(0)
+        columns = [
+            "Relevant, calculated",
+            "Not relevant, calculated",
+            "Not evaluated",
+            "Question not applicable",
+            "Not relevant, explanation provided",
+        ]
+        df_counts = pd.DataFrame(
+            rng.integers(0, 3, (200, len(columns))).astype(float), columns=columns
+        )
+        # NaN counts, in the ratio terms or only in the total
+        df_counts = df_counts.mask(rng.random(df_counts.shape) < 0.05)
+        df_counts.loc[0] = 0
+        df_counts.loc[1] = [2, 0, 0, -2, 0]
+
+        result = counts_to_relevance(df_counts)
+        ground_truth = df_counts.apply(
+            lambda row: dict_to_relevance(row.to_dict()), axis=1
+        )
+        assert_series_equal(result, ground_truth, check_dtype=False)
+        self.assertEqual(result.loc[1], 0)
+
+    def test_counts_to_relevance_missing_statuses(self):
+        df_counts = pd.DataFrame({"Relevant, calculated": [1, 0]}, index=["a", "b"])
+        assert_series_equal(
+            counts_to_relevance(df_counts), pd.Series([1.0, 0.0], index=["a", "b"])
+        )
+        self.assertEqual(len(counts_to_relevance(pd.DataFrame())), 0)
+
+
+class TestScope3Relevance(unittest.TestCase):
+    def test_scope_3_relevance(self):
+        rng = np.random.default_rng(0)
+        statuses = [
+            "Relevant, calculated",
+            "Not relevant, calculated",
+            "Not evaluated",
+            "Relevant, not yet calculated",
+            "Not relevant, explanation provided",
+            "Question not applicable",
+            None,
+        ]
+        df_CF3 = pd.DataFrame(
+            {
+                "Account number": rng.integers(0, 40, 300),
+                "Evaluation status": rng.choice(statuses, 300),
+            }
+        )
+        df_CF3.loc[df_CF3["Account number"] == 0, "Evaluation status"] = None
+
+        result = scope_3_relevance(df_CF3, ["Account number"], "Evaluation status")
+        ground_truth = df_CF3.groupby("Account number").apply(
+            lambda x: calculate_relevance(x, "Evaluation status")
+        )
+        assert_series_equal(result, ground_truth, check_dtype=False)
+        self.assertEqual(result.loc[0], 0)
+
+
+class TestJoinSheets(unittest.TestCase):
+    def test_join_sheets(self):
+        rng = np.random.default_rng(0)
+        for n_rows in [0, 60]:
+            df_left = pd.DataFrame(
+                {
+                    "Account number": rng.integers(0, 20, n_rows),
+                    "Row": rng.integers(1, 4, n_rows).astype(float),
+                    "Organization": rng.choice(["Org1", "Org2"], n_rows),
+                }
+            )
+            df_left.loc[::9, "Row"] = np.nan
+            # Missing, duplicated and NaN keys, float keys and overlapping columns
+            df_base = pd.DataFrame(
+                {
+                    "Account number": np.arange(25),
+                    "Organization": rng.choice(["Org3", "Org4"], 25),
+                }
+            ).sample(frac=0.8, random_state=0)
+            df_countries = pd.DataFrame(
+                {
+                    "Account number": rng.integers(0, 20, 30).astype(float),
+                    "Country": rng.choice(["France", "Canada"], 30),
+                }
+            )
+            df_CF1 = pd.DataFrame(
+                {
+                    "Account number": rng.integers(0, 20, 40),
+                    "Row": rng.integers(1, 4, 40),
+                    "CDP_CF1": rng.integers(0, 100, 40),
+                }
+            ).drop_duplicates(["Account number", "Row"])
+            df_CF2 = pd.DataFrame(
+                {
+                    "Account number": rng.integers(0, 20, 40),
+                    "Row": rng.integers(1, 4, 40).astype(float),
+                    "CDP_CF2": rng.random(40),
+                }
+            )
+            df_CF2.loc[::7, "Row"] = np.nan
+            sources = [
+                (df_base, "Account number"),
+                (df_countries, "Account number"),
+                (df_CF1, ["Row", "Account number"]),
+                (df_CF2, ["Account number", "Row"]),
+            ]
+
+            ground_truth = df_left
+            for df_right, keys in sources:
+                ground_truth = ground_truth.merge(df_right, on=keys, how="left")
+            assert_frame_equal(join_sheets(df_left, sources), ground_truth)
+
+
 class TestAttributeCF3ToLastYear(unittest.TestCase):
     def test_attribute_CF3_to_last_year(self):
         # Create a sample DataFrame
@@ -173,6 +555,48 @@ class TestAttributeCF3ToLastYear(unittest.TestCase):
         ground_truth = pd.DataFrame(data)
         assert_frame_equal(result, ground_truth)
 
+    def test_attribute_CF3_to_last_year_random_panels(self):
+        def legacy_attribute_CF3_to_last_year(df_clean):
+            # Former row by row implementation
+            occurrences = df_clean.account_id.value_counts()
+            no_unique_corpo = df_clean[
+                df_clean.account_id.isin(occurrences[occurrences > 1].index)
+            ]
+            for idd in no_unique_corpo.account_id:
+                last_year = df_clean[df_clean.account_id == idd].accounting_year.max()
+                df_clean.loc[
+                    (df_clean.accounting_year != last_year)
+                    & (df_clean.account_id == idd),
+                    "CDP_CF3",
+                ] = np.nan
+                df_clean.loc[
+                    (df_clean.accounting_year != last_year)
+                    & (df_clean.account_id == idd),
+                    "CF3_relevance",
+                ] = np.nan
+            return df_clean
+
+        rng = np.random.default_rng(0)
+        for n_rows in [1, 50, 500]:
+            df = pd.DataFrame(
+                {
+                    "account_id": rng.integers(0, n_rows // 3 + 1, n_rows).astype(
+                        float
+                    ),
+                    "accounting_year": rng.integers(2015, 2024, n_rows).astype(float),
+                    "CDP_CF3": rng.random(n_rows) * 1000,
+                    "CF3_relevance": rng.random(n_rows),
+                },
+                index=rng.permutation(n_rows),
+            )
+            # Missing accounts and accounting years
+            df.loc[df.index[::7], "account_id"] = np.nan
+            df.loc[df.index[::5], "accounting_year"] = np.nan
+            assert_frame_equal(
+                attribute_CF3_to_last_year(df.copy()),
+                legacy_attribute_CF3_to_last_year(df.copy()),
+            )
+
 
 class TestCommonFinalCleaning(unittest.TestCase):
     def setUp(self):
@@ -251,6 +675,20 @@ class TestCommonFinalCleaning(unittest.TestCase):
         # Check index reset
         self.assertTrue(result.index.equals(pd.RangeIndex(start=0, stop=len(result))))
 
+        # Check the integer composite key
+        self.assertEqual(result["unique_id"].dtype, np.int64)
+        self.assertEqual(result["unique_id"].tolist(), [12022, 22021])
+
+
+class TestCompositeKey(unittest.TestCase):
+    def test_composite_key(self):
+        account_ids = pd.Series([1, 22698, 1])
+        years = pd.Series([2022.0, 2017.0, 2021.0])
+        result = composite_key(account_ids, years)
+        self.assertEqual(result.dtype, np.int64)
+        self.assertEqual(result.tolist(), [12022, 226982017, 12021])
+        self.assertEqual(result.nunique(), 3)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,9 +1,30 @@
+import contextlib
+import io
 import unittest
 import os
+import shutil
+import tempfile
 
 import pandas as pd
 
-from src.main_functions import clean_CDP_year, create_CDP_clean_dataset
+from unittest import mock
+from pandas.testing import assert_frame_equal
+
+from src.cache import save_panel_state, sources_sha256
+from src.main_functions import (
+    PANEL_MODULES,
+    build_CDP_pipeline,
+    clean_CDP_year,
+    clean_CDP_years,
+    create_CDP_clean_dataset,
+    load_incremental_panel,
+    load_year_sheets,
+    run_CDP_pipeline,
+)
+from src.get_year_functions import get_raw_file_path
+from src.utils import clean_country_names, save_dataset, unique_id_to_string
+from src.get_year_spec import GetStackedYears
+from test.synthetic_cdp import CORRECTED_ACCOUNTS_2018, write_synthetic_workbooks
 
 
 class TestCleanCDPYear(unittest.TestCase):
@@ -35,13 +56,87 @@ class TestCleanCDPYear(unittest.TestCase):
             "unique_id",
             "questionnaire_year",
         ]
-        
+
         df_cleaned = clean_CDP_year(path_clean_data, path_clean_data, year, save_years)
         self.assertIsInstance(df_cleaned, pd.DataFrame)
         self.assertTrue(
             all(col in df_cleaned.columns for col in expected_columns)
         )  # Check for expected columns
 
+    def test_clean_CDP_year_saved_csv(self):
+        # Without raw data, a previously saved CSV dataset is loaded
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            df_saved = pd.DataFrame({"account_id": [1], "questionnaire_year": [2018]})
+            df_saved.to_csv(os.path.join(tmp_dir, "cdp_clean_2018.csv"), index=False)
+            df_cleaned = clean_CDP_year(tmp_dir, tmp_dir, 2018, "csv")
+            self.assertEqual(df_cleaned.to_dict(), df_saved.to_dict())
+
+    def test_clean_CDP_year_saved_compressed_csv(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            df_saved = pd.DataFrame({"account_id": [1], "questionnaire_year": [2018]})
+            save_dataset(
+                df_saved,
+                os.path.join(tmp_dir, "cdp_clean_2018"),
+                "csv",
+                compression="gzip",
+            )
+            df_cleaned = clean_CDP_year(tmp_dir, tmp_dir, 2018, "csv")
+            self.assertEqual(df_cleaned.to_dict(), df_saved.to_dict())
+
+    def test_clean_CDP_year_saved_string_ids(self):
+        # Years saved with "[account_id]_[accounting_year]" ids get integer keys
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            df_saved = pd.DataFrame(
+                {
+                    "account_id": [1, 2],
+                    "accounting_year": [2017, 2016],
+                    "unique_id": ["1_2017", "2_2016"],
+                    "questionnaire_year": [2018, 2018],
+                }
+            )
+            df_saved.to_csv(os.path.join(tmp_dir, "cdp_clean_2018.csv"), index=False)
+            df_cleaned = clean_CDP_year(tmp_dir, tmp_dir, 2018, False)
+        self.assertEqual(df_cleaned["unique_id"].tolist(), [12017, 22016])
+        self.assertEqual(df_cleaned["unique_id"].dtype, "int64")
+        self.assertEqual(df_cleaned["account_id"].dtype, "Int32")
+
+    def test_clean_CDP_year_missing_raw_data(self):
+        # Without raw data nor saved dataset, nothing is looked up in the cache
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with self.assertRaises(FileNotFoundError):
+                clean_CDP_year(tmp_dir, tmp_dir, 2018, False)
+            self.assertEqual(os.listdir(tmp_dir), [])
+
+
+class TestCleanCDPYears(unittest.TestCase):
+    def test_clean_CDP_years_workers(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for year in [2018, 2019]:
+                df_saved = pd.DataFrame(
+                    {"account_id": [year], "questionnaire_year": [year]}
+                )
+                df_saved.to_csv(
+                    os.path.join(tmp_dir, f"cdp_clean_{year}.csv"), index=False
+                )
+            kwargs = dict(
+                path_raw_data=tmp_dir, path_clean_data=tmp_dir, save_years=False
+            )
+            serial = clean_CDP_years([2019, 2014, 2018], workers=1, **kwargs)
+            parallel = clean_CDP_years([2019, 2014, 2018], workers=2, **kwargs)
+        self.assertEqual(len(parallel), 3)
+        for df_serial, df_parallel in zip(serial, parallel):
+            self.assertTrue(df_serial.equals(df_parallel))
+
+    def test_clean_CDP_years_errors(self):
+        # Raw workbooks are missing, so every year fails and is reported
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            kwargs = dict(
+                path_raw_data=tmp_dir, path_clean_data=tmp_dir, save_years=False
+            )
+            with self.assertRaises(RuntimeError) as context:
+                clean_CDP_years([2018, 2014, 2019], workers=2, **kwargs)
+        self.assertIn("[2018, 2019]", str(context.exception))
+
 
 class TestCreateCDPCleanDataset(unittest.TestCase):
     def test_create_CDP_clean_dataset(self):
@@ -85,5 +180,190 @@ class TestCreateCDPCleanDataset(unittest.TestCase):
         )  # Check for expected columns
 
 
+def clean_country_names_copy(df_cdp):
+    # Same output as clean_country_names, with another source code
+    return clean_country_names(df_cdp).copy()
+
+
+class TestLoadIncrementalPanel(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path_cache = self.tmp_dir.name
+        self.df_panel = pd.DataFrame({"account_id": [1], "accounting_year": [2018]})
+        self.save_state({2018: "a", 2019: "b"})
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def save_state(self, dict_fingerprints, **state):
+        state = {
+            "years": dict_fingerprints,
+            "sources": sources_sha256(PANEL_MODULES),
+            "pandas": pd.__version__,
+            **state,
+        }
+        save_panel_state(self.path_cache, state, self.df_panel, self.df_panel)
+
+    def assert_full_build(self, dict_fingerprints, reason):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            panel = load_incremental_panel(self.path_cache, dict_fingerprints)
+        self.assertIsNone(panel)
+        self.assertIn(reason, output.getvalue())
+
+    def test_new_years(self):
+        panel = load_incremental_panel(
+            self.path_cache, {2018: "a", 2019: "b", 2022: "c"}
+        )
+        self.assertEqual(panel[0], [2018, 2019])
+        assert_frame_equal(panel[2], self.df_panel)
+
+    def test_no_panel_state(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.assertIsNone(load_incremental_panel(tmp_dir, {2018: "a"}))
+
+    def test_code_changed(self):
+        self.save_state({2018: "a", 2019: "b"}, sources="previous code")
+        self.assert_full_build({2018: "a", 2019: "b"}, "the panel code changed")
+
+    def test_pandas_changed(self):
+        self.save_state({2018: "a", 2019: "b"}, pandas="1.0.0")
+        self.assert_full_build({2018: "a", 2019: "b"}, "the panel code changed")
+
+    def test_year_not_requested(self):
+        self.assert_full_build(
+            {2018: "a", 2022: "c"}, "some years of the panel are not requested"
+        )
+
+    def test_year_changed(self):
+        self.assert_full_build(
+            {2018: "a", 2019: "c"}, "some years of the panel changed"
+        )
+
+    def test_year_without_fingerprint(self):
+        # A year loaded from a saved dataset may have changed since the panel was built
+        self.save_state({2018: "a", 2019: None})
+        self.assert_full_build(
+            {2018: "a", 2019: None}, "some years of the panel changed"
+        )
+
+    def test_new_year_not_later(self):
+        self.assert_full_build(
+            {2017: "c", 2018: "a", 2019: "b"},
+            "some new years are not later than the panel",
+        )
+
+
+class TestSyntheticCDPCleanDataset(unittest.TestCase):
+    # A legacy year, the year of the corrections table and three other C-format years
+    years = [2016, 2018, 2019, 2022, 2023]
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.path_raw_data = os.path.join(cls.tmp_dir.name, "raw_data")
+        os.makedirs(cls.path_raw_data)
+        write_synthetic_workbooks(cls.path_raw_data, cls.years)
+        cls.df_expected = create_CDP_clean_dataset(
+            path_raw_data=cls.path_raw_data,
+            path_clean_data=os.path.join(cls.tmp_dir.name, "per_year"),
+            years=cls.years,
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def test_synthetic_dataset(self):
+        self.assertEqual(
+            sorted(self.df_expected["questionnaire_year"].unique()), self.years
+        )
+        self.assertTrue(
+            self.df_expected["account_id"].isin(list(CORRECTED_ACCOUNTS_2018)).any()
+        )
+
+    def test_sheets_schema(self):
+        # The schema dtypes are applied as soon as the sheets are loaded
+        dict_sheets = load_year_sheets(2018, self.path_raw_data)
+        self.assertIsInstance(dict_sheets["C0.2"]["Country"].dtype, pd.CategoricalDtype)
+        self.assertEqual(dict_sheets["C6.3"].dtypes.iloc[-1], "float64")
+
+    def test_saved_year_string_ids(self):
+        # A year saved by a previous version, without raw workbook, is still deduplicated
+        # with the years cleaned from their workbooks
+        path_raw_data = os.path.join(self.tmp_dir.name, "raw_data_2019")
+        path_clean_data = os.path.join(self.tmp_dir.name, "saved_2018")
+        os.makedirs(path_raw_data)
+        shutil.copy(get_raw_file_path(2019, self.path_raw_data), path_raw_data)
+        df_2018 = clean_CDP_year(self.path_raw_data, path_clean_data, 2018, False)
+        save_dataset(
+            unique_id_to_string(df_2018.copy()),
+            os.path.join(path_clean_data, "cdp_clean_2018"),
+            "parquet",
+        )
+        df_saved = create_CDP_clean_dataset(
+            path_raw_data=path_raw_data,
+            path_clean_data=path_clean_data,
+            years=[2018, 2019],
+        )
+        df_expected = create_CDP_clean_dataset(
+            path_raw_data=self.path_raw_data,
+            path_clean_data=path_clean_data,
+            years=[2018, 2019],
+        )
+        assert_frame_equal(df_saved, df_expected)
+
+    def test_stack_years(self):
+        path_clean_data = os.path.join(self.tmp_dir.name, "stacked")
+        kwargs = dict(path_raw_data=self.path_raw_data, path_clean_data=path_clean_data)
+        # 2019 is cached, so only the other C-format years are stacked
+        create_CDP_clean_dataset(years=[2019], **kwargs)
+        with mock.patch(
+            "src.main_functions.GetStackedYears", wraps=GetStackedYears
+        ) as stacked_years:
+            df_stacked = create_CDP_clean_dataset(
+                years=self.years, stack_years=True, **kwargs
+            )
+        specs = stacked_years.call_args.args[0]
+        self.assertEqual([spec.year for spec in specs], [2018, 2022, 2023])
+        assert_frame_equal(df_stacked, self.df_expected)
+
+    def test_incremental(self):
+        kwargs = dict(
+            path_raw_data=self.path_raw_data,
+            path_clean_data=os.path.join(self.tmp_dir.name, "incremental"),
+            incremental=True,
+        )
+        create_CDP_clean_dataset(years=[2016, 2018, 2019], **kwargs)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            df_incremental = create_CDP_clean_dataset(years=self.years, **kwargs)
+        self.assertIn("Incremental build: adding years [2022, 2023]", output.getvalue())
+        assert_frame_equal(df_incremental, self.df_expected)
+
+    def test_pipeline(self):
+        kwargs = dict(
+            path_raw_data=self.path_raw_data,
+            path_clean_data=os.path.join(self.tmp_dir.name, "pipeline"),
+            years=self.years,
+        )
+        assert_frame_equal(run_CDP_pipeline(**kwargs), self.df_expected)
+        # Only the stages from the changed one onwards run again
+        with mock.patch(
+            "src.main_functions.clean_country_names", clean_country_names_copy
+        ):
+            pipeline = build_CDP_pipeline(**kwargs)
+            df_pipeline = pipeline.run(["format"])["format"]
+        self.assertEqual(
+            pipeline.status,
+            {
+                "missing_value_imputation": "loaded",
+                "clean_country_names": "run",
+                "format": "run",
+            },
+        )
+        assert_frame_equal(df_pipeline, self.df_expected)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,92 @@
+import tempfile
+import unittest
+
+import pandas as pd
+
+from pandas.testing import assert_frame_equal
+
+from src.pipeline import Pipeline
+
+
+def make_frame(n_rows):
+    return pd.DataFrame({"value": range(n_rows)})
+
+
+def add(df, increment):
+    return df.assign(value=df["value"] + increment)
+
+
+def total(df, scale=1):
+    return df["value"].sum() * scale
+
+
+def build_pipeline(path_cache, increment=1, scale=1):
+    pipeline = Pipeline(path_cache)
+    pipeline.add_stage("make", make_frame, params={"n_rows": 3})
+    pipeline.add_stage("add", add, inputs=["make"], params={"increment": increment})
+    pipeline.add_stage("total", total, inputs=["add"], params={"scale": scale})
+    return pipeline
+
+
+class TestPipeline(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path_cache = self.tmp_dir.name
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_run(self):
+        pipeline = build_pipeline(self.path_cache)
+        self.assertEqual(pipeline.run(), {"total": 6})
+        self.assertEqual(pipeline.status, {"make": "run", "add": "run", "total": "run"})
+        outputs = pipeline.run(["add", "total"])
+        assert_frame_equal(outputs["add"], pd.DataFrame({"value": [1, 2, 3]}))
+        self.assertEqual(
+            pipeline.report()["status"].tolist(), ["skipped"] + 2 * ["loaded"]
+        )
+
+    def test_partial_reexecution(self):
+        build_pipeline(self.path_cache).run()
+        # Only the changed stage and the stages downstream of it run again
+        pipeline = build_pipeline(self.path_cache, scale=2)
+        self.assertEqual(pipeline.run(), {"total": 12})
+        self.assertEqual(pipeline.status, {"add": "loaded", "total": "run"})
+        pipeline = build_pipeline(self.path_cache, increment=2)
+        self.assertEqual(pipeline.run(), {"total": 9})
+        self.assertEqual(
+            pipeline.status, {"make": "loaded", "add": "run", "total": "run"}
+        )
+
+    def test_stage_keys(self):
+        keys = build_pipeline(self.path_cache).stage_keys()
+        changed_keys = build_pipeline(self.path_cache, increment=2).stage_keys()
+        self.assertEqual(keys["make"], changed_keys["make"])
+        self.assertNotEqual(keys["add"], changed_keys["add"])
+        self.assertNotEqual(keys["total"], changed_keys["total"])
+
+    def test_rebuild(self):
+        pipeline = build_pipeline(self.path_cache)
+        pipeline.run()
+        pipeline.run(rebuild=["add"])
+        self.assertEqual(
+            pipeline.status, {"make": "loaded", "add": "run", "total": "run"}
+        )
+
+    def test_describe(self):
+        pipeline = build_pipeline(self.path_cache)
+        pipeline.run(["add"])
+        lines = pipeline.describe().splitlines()
+        self.assertTrue(lines[0].startswith("make <- - ["))
+        self.assertTrue(lines[1].endswith("stored"))
+        self.assertTrue(lines[2].startswith("total <- add ["))
+        self.assertTrue(lines[2].endswith("to compute"))
+
+    def test_unknown_input(self):
+        pipeline = Pipeline(self.path_cache)
+        with self.assertRaises(ValueError):
+            pipeline.add_stage("add", add, inputs=["make"])
+
+
+if __name__ == "__main__":
+    unittest.main()
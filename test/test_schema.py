@@ -0,0 +1,113 @@
+import contextlib
+import io
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from pandas.testing import assert_frame_equal
+
+from src.schema import (
+    apply_schema,
+    apply_sheet_schema,
+    coerce_emissions,
+    memory_report,
+)
+
+
+class TestApplySchema(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                "account_id": [1.0, 2.0, 3.0],
+                "country": ["France", "France", None],
+                "boundary": ["Equity share", None, "Equity share"],
+                "accounting_year": [2019, 2020, 2020],
+                "CDP_CF1": [1.5, "Question not applicable", None],
+                "CDP_CF3": [np.nan, 2.0, 3.0],
+                "questionnaire_year": [2021, 2021, 2021],
+            }
+        )
+
+    def test_apply_schema(self):
+        result = apply_schema(self.df, emissions_dtype="float32")
+        self.assertEqual(
+            result.dtypes.astype(str).tolist(),
+            ["Int32", "category", "category", "Int16", "float32", "float32", "Int16"],
+        )
+        self.assertEqual(result["country"].cat.categories.tolist(), ["France"])
+        self.assertTrue(np.isnan(result.loc[1, "CDP_CF1"]))
+        self.assertEqual(result.loc[0, "account_id"], 1)
+
+    def test_concatenated_categories(self):
+        df_first = apply_schema(self.df.iloc[:2])
+        df_second = apply_schema(self.df.iloc[2:].assign(country="Canada"))
+        result = apply_schema(pd.concat([df_first, df_second]))
+        self.assertEqual(
+            result["country"].cat.categories.tolist(), ["Canada", "France"]
+        )
+        assert_frame_equal(result, apply_schema(result))
+
+    def test_emissions_not_numbers(self):
+        # Values which are not numbers are reported and set to NaN instead of failing
+        df = self.df.assign(CDP_CF1=[1.5, "Question not applicable", "n/a"])
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            result = apply_schema(df, label=2021)
+        self.assertEqual(result["CDP_CF1"].isna().tolist(), [False, True, True])
+        self.assertIn("2021 - 1 CDP_CF1 values are not numbers", output.getvalue())
+        self.assertIn("['n/a']", output.getvalue())
+
+    def test_invalid_emissions_dtype(self):
+        with self.assertRaises(ValueError):
+            apply_schema(self.df, emissions_dtype="float16")
+
+
+class TestCoerceEmissions(unittest.TestCase):
+    def test_coerce_emissions(self):
+        emissions = pd.Series(["12.5", 3, "Question not applicable", None], name="CF1")
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            result = coerce_emissions(emissions, "float32")
+        self.assertEqual(result.dtype, "float32")
+        self.assertEqual(result.iloc[:2].tolist(), [12.5, 3.0])
+        self.assertTrue(result.iloc[2:].isna().all())
+        self.assertEqual(output.getvalue(), "")
+
+
+class TestApplySheetSchema(unittest.TestCase):
+    def test_apply_sheet_schema(self):
+        df_sheet = pd.DataFrame(
+            {
+                "Account number": [1, 2],
+                "Country": ["France", "France"],
+                "Scope 1": ["10", "Question not applicable"],
+                "Comment": ["a", "b"],
+            }
+        )
+        result = apply_sheet_schema(
+            df_sheet, {"Country": "country", "Scope 1": "CDP_CF1"}
+        )
+        self.assertEqual(
+            result.dtypes.astype(str).tolist(), ["int64", "category", "float64", "str"]
+        )
+        self.assertEqual(result["Scope 1"].tolist()[0], 10.0)
+        assert_frame_equal(
+            result[["Account number", "Comment"]],
+            df_sheet[["Account number", "Comment"]],
+        )
+
+
+class TestMemoryReport(unittest.TestCase):
+    def test_memory_report(self):
+        df = pd.DataFrame({"country": ["France"] * 100, "account_id": range(100)})
+        df_after = apply_schema(df)
+        report = memory_report(df, df_after)
+        self.assertEqual(report.index.tolist(), ["country", "account_id", "total"])
+        self.assertEqual(report.loc["account_id", "dtype_after"], "Int32")
+        self.assertLess(
+            report.loc["total", "bytes_after"], report.loc["total", "bytes_before"]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
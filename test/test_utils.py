@@ -1,20 +1,67 @@
+import importlib.util
+import os
+import numpy as np
 import pandas as pd
+import tempfile
 import unittest
 
 from pandas.testing import assert_frame_equal
-from src.utils import handle_duplicates, missing_value_imputation, clean_country_names
+from src.utils import (
+    handle_duplicates,
+    missing_value_imputation,
+    update_duplicates_and_imputation,
+    clean_country_names,
+    format_covered_countries,
+    unique_id_to_string,
+    save_dataset,
+    load_dataset,
+    DATASET_COMPRESSIONS,
+)
+from src.schema import apply_schema
+
+COLS_TO_IMPUTE = [
+    "isin",
+    "ticker",
+    "covered_countries",
+    "activity",
+    "sector",
+    "industry",
+]
+
+
+def legacy_missing_value_imputation(df_cdp_clean):
+    # Former implementation, one full-frame mask per account and column
+    df_cdp_clean = df_cdp_clean.reset_index(drop=True)
+    for acc in df_cdp_clean.account_id.unique():
+        df_acc = df_cdp_clean[df_cdp_clean.account_id == acc]
+        for col in COLS_TO_IMPUTE:
+            if df_acc[col].notna().any():
+                curr_col_value = df_acc[col].loc[df_acc[col].last_valid_index()]
+                df_cdp_clean.loc[
+                    (df_cdp_clean[col].isna()) & (df_cdp_clean.account_id == acc), col
+                ] = curr_col_value
+    return df_cdp_clean
+
+
+def make_panel(n_rows, rows_per_account=9, missing_rate=0.3, seed=0):
+    """
+    Builds a random CDP-like panel, about rows_per_account questionnaire years per account.
+    """
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(
+        {"account_id": rng.integers(0, max(n_rows // rows_per_account, 1), n_rows)}
+    )
+    for col in COLS_TO_IMPUTE:
+        values = pd.Series(rng.integers(0, 50, n_rows)).map(lambda x: f"{col}_{x}")
+        df[col] = values.where(rng.random(n_rows) > missing_rate, None)
+    return df
 
 
 class TestHandleDuplicates(unittest.TestCase):
     def test_handle_duplicates(self):
         # Create a sample DataFrame with duplicated records
         data = {
-            "unique_id": [
-                "company1_2019",
-                "company2_2019",
-                "company1_2019",
-                "company1_2020",
-            ],
+            "unique_id": [12019, 22019, 12019, 12020],
             "questionnaire_year": [
                 2020,
                 2020,
@@ -30,6 +77,23 @@ class TestHandleDuplicates(unittest.TestCase):
         # Perform assertions
         self.assertIsInstance(result, pd.DataFrame)
         self.assertEqual(len(result), 3)  # Assuming duplicates are removed correctly
+        self.assertEqual(
+            result.set_index("unique_id")["questionnaire_year"].to_dict(),
+            {22019: 2020, 12019: 2021, 12020: 2021},
+        )
+
+
+class TestUniqueIdToString(unittest.TestCase):
+    def test_unique_id_to_string(self):
+        df = pd.DataFrame(
+            {
+                "account_id": pd.array([1, 22698], dtype="Int32"),
+                "accounting_year": pd.array([2019, 2017], dtype="Int16"),
+                "unique_id": [12019, 226982017],
+            }
+        )
+        result = unique_id_to_string(df)
+        self.assertEqual(result["unique_id"].tolist(), ["1_2019", "22698_2017"])
 
 
 class TestMissingValueImputation(unittest.TestCase):
@@ -63,6 +127,47 @@ class TestMissingValueImputation(unittest.TestCase):
         ground_truth = pd.DataFrame(data)
         assert_frame_equal(result, ground_truth)
 
+    def test_missing_value_imputation_random_panel(self):
+        df = make_panel(500, rows_per_account=4, missing_rate=0.6)
+        df.loc[::25, "account_id"] = None
+        df.index = df.index[::-1]
+        assert_frame_equal(
+            missing_value_imputation(df.copy()),
+            legacy_missing_value_imputation(df.copy()),
+        )
+
+
+class TestUpdateDuplicatesAndImputation(unittest.TestCase):
+    def setUp(self):
+        # Random panel where accounts report several accounting years in several questionnaires
+        df = make_panel(600, rows_per_account=6, missing_rate=0.5)
+        rng = np.random.default_rng(1)
+        df["questionnaire_year"] = rng.integers(2015, 2021, len(df))
+        df["accounting_year"] = df["questionnaire_year"] - rng.integers(1, 3, len(df))
+        df["unique_id"] = df["account_id"] * 10000 + df["accounting_year"]
+        self.df = df.sort_values("questionnaire_year", kind="stable")
+
+    def test_update_duplicates_and_imputation(self):
+        is_previous = self.df["questionnaire_year"] < 2019
+        df_deduplicated = handle_duplicates(self.df[is_previous])
+        df_imputed = missing_value_imputation(df_deduplicated)
+        result = update_duplicates_and_imputation(
+            df_deduplicated, df_imputed, self.df[~is_previous]
+        )
+
+        ground_truth = handle_duplicates(self.df)
+        assert_frame_equal(result[0], ground_truth)
+        assert_frame_equal(result[1], missing_value_imputation(ground_truth))
+
+    def test_previous_years(self):
+        df_deduplicated = handle_duplicates(self.df)
+        with self.assertRaises(ValueError):
+            update_duplicates_and_imputation(
+                df_deduplicated,
+                missing_value_imputation(df_deduplicated),
+                self.df[self.df["questionnaire_year"] == 2020],
+            )
+
 
 class TestCleanCountryNames(unittest.TestCase):
     def test_clean_country_names(self):
@@ -85,6 +190,184 @@ class TestCleanCountryNames(unittest.TestCase):
         self.assertEqual(result["country"].iloc[0], "United States of America")
         self.assertEqual(result["country"].iloc[1], "United Kingdom")
 
+    def test_clean_country_names_categorical(self):
+        df = pd.DataFrame(
+            {"country": ["USA", "United States of America", "Canada"]},
+            dtype="category",
+        )
+        result = clean_country_names(df)
+        self.assertEqual(
+            result["country"].tolist(),
+            ["United States of America", "United States of America", "Canada"],
+        )
+        self.assertIsInstance(result["country"].dtype, pd.CategoricalDtype)
+        self.assertCountEqual(
+            result["country"].cat.categories.tolist(),
+            ["United States of America", "Canada"],
+        )
+        self.assertEqual(result["country_iso"].tolist(), ["USA", "USA", "CAN"])
+
+    def test_clean_country_names_scope(self):
+        df = pd.DataFrame(
+            {
+                "account_name": ["USA", "UK Plc"],
+                "country": ["Vietnam", "Atlantis"],
+                "covered_countries": ['["USA","Turkey"]', "UK"],
+                "CDP_CF1": [1.0, 2.0],
+            }
+        )
+        result = clean_country_names(df)
+        self.assertEqual(
+            result.columns.tolist(),
+            ["account_name", "country", "country_iso", "covered_countries", "CDP_CF1"],
+        )
+        # Only country columns are modified
+        self.assertEqual(result["account_name"].tolist(), ["USA", "UK Plc"])
+        self.assertEqual(result["country"].tolist(), ["Vietnam", "Atlantis"])
+        self.assertEqual(result["country_iso"].iloc[0], "VNM")
+        self.assertTrue(pd.isna(result["country_iso"].iloc[1]))
+        self.assertEqual(
+            result["covered_countries"].tolist(),
+            ['["United States of America","Turkey"]', "United Kingdom"],
+        )
+        self.assertNotIn("country_iso", df.columns)
+
+
+class TestFormatCoveredCountries(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                "account_id": [1, 2, 3, 4, 5],
+                "covered_countries": [
+                    '["UK","Canada"]',
+                    "France",
+                    None,
+                    "[]",
+                    '["UK","Canada"]',
+                ],
+            }
+        )
+        self.ground_truth = [["UK", "Canada"], ["France"], None, [], ["UK", "Canada"]]
+
+    def test_list_format(self):
+        result = format_covered_countries(self.df.copy(), "list")
+        self.assertEqual(result["covered_countries"].tolist(), self.ground_truth)
+        self.assertIsNot(result["covered_countries"][0], result["covered_countries"][4])
+
+    def test_arrow_format(self):
+        result = format_covered_countries(self.df.copy(), "arrow")
+        self.assertEqual(
+            str(result["covered_countries"].dtype.pyarrow_dtype),
+            "list<item: dictionary<values=string, indices=int32, ordered=0>>",
+        )
+        self.assertEqual(
+            result["covered_countries"].list.len().tolist(), [2, 1, pd.NA, 0, 2]
+        )
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_path = os.path.join(tmp_dir, "cdp_clean_dataset")
+            save_dataset(result, file_path, "parquet")
+            df_loaded = load_dataset(file_path, "parquet", dtype_backend="pyarrow")
+        self.assertEqual(
+            df_loaded["covered_countries"].list.flatten().astype(str).tolist(),
+            ["UK", "Canada", "France", "UK", "Canada"],
+        )
+
+    def test_json_format(self):
+        assert_frame_equal(format_covered_countries(self.df.copy()), self.df)
+        with self.assertRaises(ValueError):
+            format_covered_countries(self.df.copy(), "csv")
+
+
+class TestSaveDataset(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmp_dir.name, "cdp_clean_dataset")
+        self.df = pd.DataFrame(
+            {
+                "account_id": [1, 2, 1],
+                "CDP_CF1": [1.5, None, 3.0],
+                "country": ["France", None, "France"],
+                "questionnaire_year": [2021, 2022, 2022],
+            }
+        )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_binary_formats(self):
+        for save_format, compression in [("parquet", "zstd"), ("feather", "lz4")]:
+            file_path = save_dataset(
+                self.df, self.file_path, save_format, compression=compression
+            )
+            self.assertTrue(file_path.endswith(f".{save_format}"))
+            assert_frame_equal(load_dataset(self.file_path, save_format), self.df)
+
+    def test_compressions_round_trip(self):
+        for save_format, compressions in DATASET_COMPRESSIONS.items():
+            for compression in (None,) + compressions:
+                with self.subTest(save_format=save_format, compression=compression):
+                    if compression == "zstd" and save_format == "csv":
+                        if importlib.util.find_spec("zstandard") is None:
+                            self.skipTest("zstandard is not installed")
+                    save_dataset(
+                        self.df, self.file_path, save_format, compression=compression
+                    )
+                    df_loaded = load_dataset(
+                        self.file_path, save_format, compression=compression
+                    )
+                    assert_frame_equal(df_loaded, self.df)
+
+    def test_compressed_csv_extension(self):
+        file_path = save_dataset(self.df, self.file_path, "csv", compression="gzip")
+        self.assertTrue(file_path.endswith(".csv.gz"))
+
+    def test_partitioned_dataset(self):
+        for _ in range(2):
+            save_dataset(
+                self.df,
+                self.file_path,
+                "parquet",
+                partition_cols=["questionnaire_year"],
+            )
+        self.assertEqual(
+            sorted(os.listdir(self.file_path)),
+            ["questionnaire_year=2021", "questionnaire_year=2022"],
+        )
+        df_2022 = load_dataset(
+            self.file_path, "parquet", filters=[("questionnaire_year", "=", 2022)]
+        )
+        assert_frame_equal(df_2022, self.df.iloc[1:].reset_index(drop=True))
+
+    def test_partitioned_schema(self):
+        # Partition values keep the small integer dtypes of the output schema
+        df = apply_schema(self.df)
+        save_dataset(
+            df, self.file_path, "parquet", partition_cols=["questionnaire_year"]
+        )
+        assert_frame_equal(load_dataset(self.file_path, "parquet"), df)
+        df_2022 = load_dataset(
+            self.file_path, "parquet", filters=[("questionnaire_year", "=", 2022)]
+        )
+        assert_frame_equal(df_2022, df.iloc[1:].reset_index(drop=True))
+
+    def test_empty_partitioned_dataset(self):
+        os.makedirs(self.file_path)
+        with self.assertRaises(FileNotFoundError):
+            load_dataset(self.file_path, "parquet")
+
+    def test_invalid_options(self):
+        with self.assertRaises(ValueError):
+            save_dataset(self.df, self.file_path, "json")
+        with self.assertRaises(ValueError):
+            save_dataset(self.df, self.file_path, "xlsx", compression="gzip")
+        with self.assertRaises(ValueError):
+            save_dataset(
+                self.df,
+                self.file_path,
+                "feather",
+                partition_cols=["questionnaire_year"],
+            )
+
 
 if __name__ == "__main__":
     unittest.main()
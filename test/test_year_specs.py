@@ -0,0 +1,224 @@
+import unittest
+import unittest.mock
+
+import numpy as np
+import pandas as pd
+
+from pandas.testing import assert_frame_equal
+
+from src.get_year_spec import GetYear, GetStackedYears
+from src.sheets_manifest import USEFUL_SHEETS
+from src.year_specs import (
+    YEAR_SPECS,
+    YearSpec,
+    BOUNDARY_COLUMN_2020,
+    COUNTRIES_COLUMN_2022,
+    CF1_COLUMN,
+    CF2_LOCATION_COLUMN,
+    CF2_MARKET_COLUMN,
+    CF3_COLUMNS_2022,
+)
+
+
+class TestYearSpec(unittest.TestCase):
+    def test_useful_sheets(self):
+        self.assertEqual(
+            YEAR_SPECS[2022].useful_sheets,
+            {
+                "C0 - Introduction": None,
+                "C0.2": None,
+                "C0.3": ["Account number", COUNTRIES_COLUMN_2022],
+                "C0.5": ["Account number", BOUNDARY_COLUMN_2020],
+                "C6.1": ["Account number", "Row", CF1_COLUMN],
+                "C6.3": [
+                    "Account number",
+                    "Row",
+                    CF2_LOCATION_COLUMN,
+                    CF2_MARKET_COLUMN,
+                ],
+                "C6.5": ["Account number"] + CF3_COLUMNS_2022,
+            },
+        )
+        self.assertEqual(
+            list(YEAR_SPECS[2020].useful_sheets),
+            ["C0 - Introduction", "C0.2", "C6.1", "C6.3", "C6.5"],
+        )
+
+    def test_manifest(self):
+        for year, spec in YEAR_SPECS.items():
+            self.assertEqual(USEFUL_SHEETS[year], spec.useful_sheets)
+
+
+class TestGetYear(unittest.TestCase):
+    def setUp(self):
+        self.spec = YearSpec(
+            year=2024,
+            base_sheet="Summary Data",
+            join_base_sheet=True,
+            col_boundary="boundary",
+            col_CF3_evaluation="evaluation",
+            col_CF3_metric="metric",
+            renames={"Organization_x": "Organization"},
+            missing_columns=("Country",),
+        )
+        self.get_year = GetYear(self.spec)
+        self.dict_sheets = {
+            "Summary Data": pd.DataFrame(
+                {"Account number": [1, 2], "Organization": ["A", "B"]}
+            ),
+            "C6.1": pd.DataFrame(
+                {
+                    "Account number": [1, 1, 2],
+                    "Row": [1, 2, 1],
+                    CF1_COLUMN: [10.0, 20.0, 30.0],
+                }
+            ),
+            "C6.3": pd.DataFrame(
+                {
+                    "Account number": [2],
+                    "Row": [1],
+                    CF2_LOCATION_COLUMN: [3.0],
+                    CF2_MARKET_COLUMN: [4.0],
+                }
+            ),
+        }
+
+    def test_get_join_sources(self):
+        df_CF3_calc = pd.DataFrame(
+            {"CDP_CF3": [5.0], "CF3_relevance": [1.0]},
+            index=pd.Index([1], name="Account number"),
+        )
+        sources = self.get_year.get_join_sources(self.dict_sheets, df_CF3_calc)
+        self.assertEqual(
+            [keys for _, keys in sources],
+            [
+                "Account number",
+                ["Account number", "Row"],
+                ["Account number", "Row"],
+                "Account number",
+            ],
+        )
+        self.assertIs(sources[0][0], self.dict_sheets["Summary Data"])
+        self.assertEqual(
+            sources[-1][0].columns.tolist(),
+            ["Account number", "CDP_CF3", "CF3_relevance"],
+        )
+
+    def test_get_scopes_3(self):
+        df_CF3 = pd.DataFrame(
+            {
+                "Account number": [1, 1, 2],
+                "evaluation": ["Relevant, calculated", "Not evaluated", None],
+                "metric": [1.0, "Question not applicable", 2.0],
+            }
+        )
+        result = self.get_year.get_scopes_3(df_CF3)
+        self.assertEqual(result["CDP_CF3"].tolist(), [1.0, 2.0])
+        self.assertEqual(result["CF3_relevance"].tolist(), [0.5, 0.0])
+
+
+class TestGetStackedYears(unittest.TestCase):
+    def make_sheets(self, spec, n_accounts):
+        # Two reporting rows per account, the second one of the previous year
+        accounts = np.repeat(np.arange(1, n_accounts + 1), 2)
+        rows = np.tile([1, 2], n_accounts)
+        years = np.where(rows == 1, spec.year - 1, spec.year - 2)
+        df_base = pd.DataFrame(
+            {
+                "Account number": np.arange(1, n_accounts + 1),
+                spec.col_boundary: "Operational control",
+            }
+        )
+        return {
+            spec.base_sheet: df_base,
+            spec.years_sheet: pd.DataFrame(
+                {
+                    "Account number": accounts,
+                    "Row": rows,
+                    "Organization": [f"Org {account}" for account in accounts],
+                    "Country": "France",
+                    "Primary activity": "Banks",
+                    "Primary sector": "Banks",
+                    "Primary industry": "Financial services",
+                    "C0.2_C1_State the start and end date of the year for which you are reporting data. - Start date": [
+                        f"{year}-01-01" for year in years
+                    ],
+                    "C0.2_C2_State the start and end date of the year for which you are reporting data. - End date": [
+                        f"{year}-12-31" for year in years
+                    ],
+                }
+            ),
+            spec.CF1_sheet: pd.DataFrame(
+                {
+                    "Account number": accounts,
+                    "Row": rows,
+                    CF1_COLUMN: np.arange(len(accounts), dtype=float),
+                }
+            ),
+            spec.CF2_sheet: pd.DataFrame(
+                {
+                    "Account number": accounts,
+                    "Row": rows,
+                    CF2_LOCATION_COLUMN: 1.0,
+                    CF2_MARKET_COLUMN: "Question not applicable",
+                }
+            ),
+            spec.CF3_sheet: pd.DataFrame(
+                {
+                    "Account number": accounts,
+                    spec.col_CF3_evaluation: "Relevant, calculated",
+                    spec.col_CF3_metric: np.where(
+                        rows == 1, "Question not applicable", "2.5"
+                    ).astype(object),
+                }
+            ),
+        }
+
+    def test_get_years_dataset(self):
+        specs = [
+            YearSpec(
+                year=2022,
+                base_sheet="Summary Data",
+                col_boundary="boundary",
+                col_CF3_evaluation="evaluation",
+                col_CF3_metric="metric",
+                missing_columns=("covered_countries", "isin", "ticker"),
+            ),
+            YearSpec(
+                year=2023,
+                base_sheet="Summary Data",
+                col_boundary="boundary",
+                col_CF3_evaluation="evaluation",
+                col_CF3_metric="metric",
+                missing_columns=("covered_countries", "ISINs", "Tickers"),
+                attribute_CF3_to_last_year=False,
+            ),
+        ]
+        dict_sheets = {
+            2022: self.make_sheets(specs[0], 3),
+            2023: self.make_sheets(specs[1], 2),
+        }
+
+        def get_useful_sheets(getter, path_raw_data):
+            return {
+                name: df.copy() for name, df in dict_sheets[getter.spec.year].items()
+            }
+
+        with unittest.mock.patch.object(
+            GetYear, "get_useful_sheets", get_useful_sheets
+        ):
+            expected = {
+                spec.year: GetYear(spec).get_year_dataset("raw") for spec in specs
+            }
+            result = GetStackedYears(specs).get_years_dataset("raw")
+
+        self.assertEqual(list(result), [2022, 2023])
+        for year in expected:
+            assert_frame_equal(result[year], expected[year])
+        # Scope 3 is only attributed to the last accounting year in 2022
+        self.assertEqual(result[2022]["CDP_CF3"].isna().sum(), 3)
+        self.assertEqual(result[2023]["CDP_CF3"].isna().sum(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()